@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Eviction benchmark for PhiCache.
+
+Replays Zipf, loop, scan-polluted and uniform key traces through PhiCache
+and through the original implementation, which scored every entry on each
+eviction, and reports the hit ratio and operations per second of both. The
+hit ratios are expected to be identical: the bucketed eviction picks the
+same victims as the full scan.
+
+    python benchmarks/run_cache_benchmark.py --capacities 1000,10000,100000 --json cache.json
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from collections import OrderedDict
+
+try:
+    from phiresearch_systems import PhiCache
+except ImportError:
+    print("Error: could not import 'phiresearch_systems'; run 'pip install .' from the project root.",
+          file=sys.stderr)
+    sys.exit(1)
+
+
+class ReferencePhiCache:
+    """The original cache, which scans every entry to choose a victim."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.phi = (1 + math.sqrt(5)) / 2
+        self.fib_weights = [0, 1]
+        while len(self.fib_weights) < 30:
+            self.fib_weights.append(self.fib_weights[-1] + self.fib_weights[-2])
+
+    def get(self, key):
+        if key not in self.cache:
+            return None
+        value, count = self.cache[key]
+        self.cache[key] = (value, count + 1)
+        self.cache.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self.cache:
+            _, count = self.cache[key]
+            self.cache[key] = (value, count + 1)
+            self.cache.move_to_end(key)
+        else:
+            self.cache[key] = (value, 1)
+            if len(self.cache) > self.capacity:
+                self._evict()
+
+    def _evict(self):
+        min_score = float('inf')
+        key_to_evict = None
+        for i, (key, (_, count)) in enumerate(self.cache.items()):
+            weight = self.fib_weights[min(count, len(self.fib_weights) - 1)]
+            score = weight / math.pow(i + 1, self.phi - 1)
+            if score < min_score:
+                min_score = score
+                key_to_evict = key
+        if key_to_evict is not None:
+            del self.cache[key_to_evict]
+
+
+def zipf_trace(universe, length, alpha, rng):
+    cumulative = list(itertools.accumulate(1 / (rank ** alpha) for rank in range(1, universe + 1)))
+    total = cumulative[-1]
+    return [f"k{bisect.bisect_left(cumulative, rng.random() * total)}" for _ in range(length)]
+
+
+def loop_trace(universe, length):
+    return [f"k{i % universe}" for i in range(length)]
+
+
+def scan_trace(universe, length, alpha, rng):
+    """A Zipf workload interrupted by long one-off scans."""
+    trace = zipf_trace(universe, length, alpha, rng)
+    scan = itertools.count()
+    for start in range(0, length, length // 8 or 1):
+        for i in range(start, min(start + universe // 4, length)):
+            if i % 2:
+                trace[i] = f"scan{next(scan)}"
+    return trace
+
+
+def uniform_trace(universe, length, rng):
+    return [f"k{rng.randrange(universe)}" for _ in range(length)]
+
+
+def replay(cache, trace):
+    """Read-through replay: a miss loads the key into the cache."""
+    hits = 0
+    start = time.perf_counter()
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, key)
+        else:
+            hits += 1
+    return hits, time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PhiCache eviction benchmark.")
+    parser.add_argument("--capacities", default="1000,10000,100000",
+                        help="comma-separated cache capacities")
+    parser.add_argument("--length", type=int, default=200000, help="requests per trace")
+    parser.add_argument("--universe", type=float, default=5.0,
+                        help="distinct keys per trace, as a multiple of the capacity")
+    parser.add_argument("--reference-max-capacity", type=int, default=10000,
+                        help="skip the O(n)-per-eviction reference above this capacity")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for capacity in (int(c) for c in args.capacities.split(",")):
+        universe = max(int(capacity * args.universe), capacity + 1)
+        rng = random.Random(args.seed)
+        workloads = [
+            ("zipf 0.8", zipf_trace(universe, args.length, 0.8, rng)),
+            ("zipf 1.0", zipf_trace(universe, args.length, 1.0, rng)),
+            ("zipf 1.0 + scans", scan_trace(universe, args.length, 1.0, rng)),
+            ("loop", loop_trace(capacity + capacity // 10, args.length)),
+            ("uniform", uniform_trace(universe, args.length, rng)),
+        ]
+        for workload, trace in workloads:
+            hits, seconds = replay(PhiCache(capacity), trace)
+            result = {"capacity": capacity, "workload": workload, "requests": len(trace),
+                      "hit_ratio": hits / len(trace), "ops_per_s": len(trace) / seconds,
+                      "reference_hit_ratio": None, "reference_ops_per_s": None}
+            if capacity <= args.reference_max_capacity:
+                reference_hits, reference_seconds = replay(ReferencePhiCache(capacity), trace)
+                result["reference_hit_ratio"] = reference_hits / len(trace)
+                result["reference_ops_per_s"] = len(trace) / reference_seconds
+            results.append(result)
+
+    width = max(len(r["workload"]) for r in results)
+    print(f"{'capacity':>8}  {'workload':<{width}}  {'hit ratio':>9}  {'ref hit':>9}  {'ops/s':>10}"
+          f"  {'ref ops/s':>10}  {'speedup':>8}")
+    for r in results:
+        if r["reference_hit_ratio"] is None:
+            reference, reference_ops, speedup = "-", "-", "-"
+        else:
+            reference = f"{r['reference_hit_ratio']:.4f}"
+            reference_ops = f"{r['reference_ops_per_s']:,.0f}"
+            speedup = f"{r['ops_per_s'] / r['reference_ops_per_s']:.1f}x"
+        print(f"{r['capacity']:>8}  {r['workload']:<{width}}  {r['hit_ratio']:>9.4f}  {reference:>9}"
+              f"  {r['ops_per_s']:>10,.0f}  {reference_ops:>10}  {speedup:>8}")
+
+    mismatches = [r for r in results
+                  if r["reference_hit_ratio"] is not None and r["reference_hit_ratio"] != r["hit_ratio"]]
+    if mismatches:
+        print(f"Hit ratios differ from the reference in {len(mismatches)} case(s).", file=sys.stderr)
+
+    if args.json:
+        report = {
+            "metadata": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "arguments": {k: v for k, v in vars(args).items() if k != "json"},
+            },
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
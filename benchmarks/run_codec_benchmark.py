@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Offline codec benchmark for PhiComp against zlib, lzma and bz2.
+
+Corpora are generated deterministically from a seed (text, JSON, binary,
+random, zeros) or taken from the bundled Calgary files, at any sizes from
+bytes to gigabytes. Each case is compressed and decompressed `--repeat`
+times and reports median/min/stdev times, MB/s, ratio, ratio against the
+other codecs and peak RSS. Results print as a table and, with `--json`,
+are written as machine-readable JSON for regression tracking.
+
+    python benchmarks/run_codec_benchmark.py --sizes 100,10K,1M --repeat 5 --json out.json
+    python benchmarks/run_codec_benchmark.py --corpora text,random --sizes 64M --threads 1,2,4
+
+No network access or third-party packages are needed.
+"""
+
+import argparse
+import bz2
+import datetime
+import json
+import lzma
+import math
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import time
+import zlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import phiresearch_compression as phicomp
+except ImportError:
+    print("Error: could not import 'phiresearch_compression'; run 'pip install .' from the project root.",
+          file=sys.stderr)
+    sys.exit(1)
+
+SCHEMA_VERSION = 1
+CALGARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calgary_corpus")
+CORPORA = ("text", "json", "binary", "random", "zeros", "calgary")
+CODECS = ("phicomp", "zlib", "lzma", "bz2")
+UNITS = {"": 1, "B": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+# Each generated chunk uses its own seed, so corpora of different sizes share
+# a prefix and large corpora are not one repeated block.
+CHUNK_SIZE = 1 << 20
+
+WORDS = ("the of and to in is was that for on with as by at from this be are or have an which one all "
+         "were there their been has more when will would who so no if out up into than them can only "
+         "other new some could time these two may then first any like now my such make over our even "
+         "most me state after also made many did must before back through years where much your way "
+         "down should because each just those people how too little us good very well world phi golden "
+         "ratio fibonacci context model entropy coder block stream frame server cache request").split()
+
+
+# --- Corpora ---
+def _text_chunk(rng: random.Random) -> bytes:
+    # Zipf-like word frequencies with sentence and paragraph structure.
+    weights = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+    out, size = [], 0
+    while size < CHUNK_SIZE:
+        words = rng.choices(WORDS, weights, k=rng.randint(6, 24))
+        sentence = " ".join(words).capitalize() + (".\n\n" if rng.random() < 0.1 else ". ")
+        out.append(sentence)
+        size += len(sentence)
+    return "".join(out).encode()
+
+
+def _json_chunk(rng: random.Random) -> bytes:
+    out, size = [], 0
+    while size < CHUNK_SIZE:
+        record = json.dumps({
+            "id": rng.randrange(1 << 32),
+            "user": "user%05d" % rng.randrange(5000),
+            "event": rng.choice(("click", "view", "purchase", "login", "logout")),
+            "latency_ms": round(rng.lognormvariate(3, 0.8), 2),
+            "tags": rng.sample(WORDS[:40], rng.randint(0, 4)),
+            "ok": rng.random() < 0.97,
+        }, separators=(",", ":")) + "\n"
+        out.append(record)
+        size += len(record)
+    return "".join(out).encode()
+
+
+def _binary_chunk(rng: random.Random) -> bytes:
+    # Fixed-width records: counter, timestamp, noisy float sensor, small enum.
+    record = struct.Struct("<IQdB3x")
+    base = rng.randrange(1 << 40)
+    count = CHUNK_SIZE // record.size + 1
+    return b"".join(record.pack(i, base + i * 1000 + rng.randrange(50),
+                                math.sin(i / 100.0) + rng.gauss(0, 0.01), rng.randrange(4))
+                    for i in range(count))
+
+
+def _random_chunk(rng: random.Random) -> bytes:
+    return rng.getrandbits(CHUNK_SIZE * 8).to_bytes(CHUNK_SIZE, "little")
+
+
+GENERATORS = {"text": _text_chunk, "json": _json_chunk, "binary": _binary_chunk, "random": _random_chunk}
+
+
+def make_corpus(name: str, size: int, seed: int) -> bytes:
+    """Returns exactly `size` bytes of the named corpus."""
+    if name == "zeros":
+        return bytes(size)
+    if name == "calgary":
+        data = b"".join(open(os.path.join(CALGARY_DIR, f), "rb").read() for f in sorted(os.listdir(CALGARY_DIR)))
+        if size > len(data):
+            raise ValueError(f"the bundled Calgary corpus has only {len(data)} bytes")
+        return data[:size]
+    generate = GENERATORS[name]
+    out = bytearray()
+    chunk = 0
+    while len(out) < size:
+        out += generate(random.Random(f"{seed}:{name}:{chunk}"))
+        chunk += 1
+    del out[size:]
+    return bytes(out)
+
+
+# --- Codecs ---
+def codec_functions(codec: str, level, threads: int):
+    if codec == "phicomp":
+        # 0 means all cores, which PhiComp spells as threads=None.
+        threads = threads or None
+        return (lambda data: phicomp.compress(data, level=level, threads=threads),
+                lambda data: phicomp.decompress(data, threads=threads))
+    if codec == "zlib":
+        return (lambda data: zlib.compress(data, 6 if level is None else level), zlib.decompress)
+    if codec == "lzma":
+        return (lambda data: lzma.compress(data, preset=6 if level is None else level), lzma.decompress)
+    if codec == "bz2":
+        return (lambda data: bz2.compress(data, 9 if level is None else level), bz2.decompress)
+    raise ValueError(f"unknown codec {codec!r}")
+
+
+# --- Measurement ---
+def _max_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _timing(times, size: int) -> dict:
+    median = statistics.median(times)
+    return {
+        "times_s": times,
+        "median_s": median,
+        "min_s": min(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "mb_per_s": size / median / 1e6 if median > 0 else None,
+    }
+
+
+def run_case(case: dict) -> dict:
+    """Benchmarks one (corpus, size, codec, threads) case; runs in its own process when isolated."""
+    data = make_corpus(case["corpus"], case["size"], case["seed"])
+    baseline_rss = _max_rss_bytes()
+    compress, decompress = codec_functions(case["codec"], case["level"], case["threads"])
+
+    compress_times, decompress_times = [], []
+    for _ in range(case["warmup"] + case["repeat"]):
+        start = time.perf_counter()
+        compressed = compress(data)
+        compress_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        restored = decompress(compressed)
+        decompress_times.append(time.perf_counter() - start)
+        if restored != data:
+            raise RuntimeError(f"{case['codec']} failed to round-trip {case['corpus']} at {case['size']} bytes")
+        del restored
+    compress_times = compress_times[case["warmup"]:]
+    decompress_times = decompress_times[case["warmup"]:]
+
+    peak_rss = _max_rss_bytes()
+    size = len(data)
+    return {
+        "corpus": case["corpus"],
+        "size": size,
+        "codec": case["codec"],
+        "level": case["level"],
+        "threads": case["threads"],
+        "compressed_size": len(compressed),
+        "ratio": size / len(compressed) if compressed else None,
+        "bits_per_byte": 8 * len(compressed) / size if size else None,
+        "compress": _timing(compress_times, size),
+        "decompress": _timing(decompress_times, size),
+        # High-water mark of the process, and its growth over the mark after
+        # the input was generated (roughly the codec's own working memory).
+        "peak_rss_bytes": peak_rss,
+        "rss_growth_bytes": max(0, peak_rss - baseline_rss),
+    }
+
+
+def add_relative_ratios(results) -> None:
+    """Adds ratio_vs: how many times smaller each result is than every other codec's output."""
+    sizes = {}
+    for r in results:
+        sizes.setdefault((r["corpus"], r["size"]), {}).setdefault(r["codec"], r["compressed_size"])
+    for r in results:
+        others = sizes[(r["corpus"], r["size"])]
+        r["ratio_vs"] = {codec: others[codec] / r["compressed_size"]
+                         for codec in others if codec != r["codec"] and r["compressed_size"]}
+
+
+# --- Reporting ---
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    unit = text[-1] if text[-1:] in UNITS and not text[-1:].isdigit() else ""
+    number = text[:-1] if unit else text
+    if not number.isdigit():
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}")
+    return int(number) * UNITS[unit]
+
+
+def format_size(size: int) -> str:
+    for unit in ("G", "M", "K"):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return str(size)
+
+
+def print_table(results) -> None:
+    headers = ("corpus", "size", "codec", "thr", "ratio", "bpb", "comp MB/s", "decomp MB/s",
+               "vs zlib", "vs lzma", "vs bz2", "RSS MiB")
+    rows = []
+    for r in results:
+        def speed(t):
+            return "-" if t["mb_per_s"] is None else f"{t['mb_per_s']:.2f}"
+
+        def versus(codec):
+            value = r["ratio_vs"].get(codec)
+            return "-" if value is None else f"{value:.2f}x"
+
+        rows.append((r["corpus"], format_size(r["size"]), r["codec"], str(r["threads"]),
+                     "-" if r["ratio"] is None else f"{r['ratio']:.2f}",
+                     "-" if r["bits_per_byte"] is None else f"{r['bits_per_byte']:.3f}",
+                     speed(r["compress"]), speed(r["decompress"]),
+                     versus("zlib"), versus("lzma"), versus("bz2"), f"{r['peak_rss_bytes'] / 2 ** 20:.0f}"))
+    widths = [max(len(str(row[i])) for row in rows + [headers]) for i in range(len(headers))]
+    for row in [headers] + rows:
+        print("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))
+
+
+def _list(value: str):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline PhiComp codec benchmark.")
+    parser.add_argument("--corpora", type=_list, default=list(CORPORA[:-1]),
+                        help=f"comma-separated corpora from {', '.join(CORPORA)}")
+    parser.add_argument("--sizes", type=lambda v: [parse_size(s) for s in _list(v)],
+                        default=[100, 10 << 10, 1 << 20], help="comma-separated sizes, e.g. 100,10K,1M,1G")
+    parser.add_argument("--codecs", type=_list, default=list(CODECS), help="comma-separated codecs")
+    parser.add_argument("--level", type=int, default=None, help="level passed to every codec (codec default)")
+    parser.add_argument("--threads", type=lambda v: [int(t) for t in _list(v)], default=[0],
+                        help="PhiComp thread counts to compare, e.g. 1,2,4 (0 = all cores)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated corpora")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run every case in this process (faster, but peak RSS is cumulative)")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    for corpus in args.corpora:
+        if corpus not in CORPORA:
+            parser.error(f"unknown corpus {corpus!r}")
+    for codec in args.codecs:
+        if codec not in CODECS:
+            parser.error(f"unknown codec {codec!r}")
+    if args.repeat < 1 or args.warmup < 0:
+        parser.error("--repeat must be at least 1 and --warmup at least 0")
+
+    cases = []
+    for corpus in args.corpora:
+        for size in args.sizes:
+            for codec in args.codecs:
+                for threads in (args.threads if codec == "phicomp" else [1]):
+                    cases.append({"corpus": corpus, "size": size, "codec": codec, "level": args.level,
+                                  "threads": threads, "repeat": args.repeat, "warmup": args.warmup,
+                                  "seed": args.seed})
+
+    results = []
+    started = time.time()
+    if args.no_isolate:
+        for case in cases:
+            results.append(run_case(case))
+    else:
+        # A fresh process per case keeps peak RSS and allocator state independent.
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            for result in pool.imap(run_case, cases):
+                results.append(result)
+                print(f"  {result['corpus']:>8} {format_size(result['size']):>6} {result['codec']:>8}"
+                      f" threads={result['threads']}: done", file=sys.stderr)
+    add_relative_ratios(results)
+
+    print_table(results)
+    if args.json:
+        report = {
+            "schema": SCHEMA_VERSION,
+            "metadata": {
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "duration_s": time.time() - started,
+                "phicomp_version": phicomp.__version__,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "zlib_version": zlib.ZLIB_RUNTIME_VERSION,
+                "arguments": {k: v for k, v in vars(args).items() if k != "json"},
+            },
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
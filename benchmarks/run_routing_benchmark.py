@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Routing throughput benchmark for PhiBalancer.
+
+Reports operations per second and nanoseconds per lookup for single-key
+routing (with and without the memo, for every hash function), batch routing,
+weighted routing with a server down, and bounded-load acquire/release. The
+original pure-Python SHA-256 routing is measured as a baseline.
+
+    python benchmarks/run_routing_benchmark.py --servers 100 --keys 200000 --json routing.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+try:
+    from phiresearch_systems import PhiBalancer, HASH_FUNCTIONS
+except ImportError:
+    print("Error: could not import 'phiresearch_systems'; run 'pip install .' from the project root.",
+          file=sys.stderr)
+    sys.exit(1)
+
+
+def reference_router(servers):
+    """The original per-request implementation: SHA-256, hex and Python bigints."""
+    multiplier = 11400714819323198485
+    num_servers = len(servers)
+
+    def route(request_id):
+        request_hash = int(hashlib.sha256(request_id.encode('utf-8')).hexdigest()[:16], 16)
+        scaled_hash = (request_hash * multiplier) & (2**64 - 1)
+        return servers[(scaled_hash * num_servers) >> 64]
+    return route
+
+
+def measure(function, keys, repeat):
+    """Best-of-`repeat` seconds for calling `function` on every key."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for key in keys:
+            function(key)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="PhiBalancer routing benchmark.")
+    parser.add_argument("--servers", type=int, default=100, help="number of servers")
+    parser.add_argument("--keys", type=int, default=200000, help="distinct request IDs")
+    parser.add_argument("--hot-keys", type=int, default=1000,
+                        help="distinct IDs in the repeating workload (e.g. client IPs)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs; the best is reported")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON to PATH ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    servers = [f"server{i}" for i in range(args.servers)]
+    keys = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.keys)]
+    hot = [keys[i % args.hot_keys] for i in range(args.keys)]
+
+    cases = [("reference (pure Python sha256)", "distinct", reference_router(servers), keys)]
+    for hash_function in HASH_FUNCTIONS:
+        uncached = PhiBalancer(servers, hash_function, memo_size=0).get_server_for_request
+        cached = PhiBalancer(servers, hash_function).get_server_for_request
+        cases.append((f"get_server_for_request {hash_function}, no memo", "distinct", uncached, keys))
+        cases.append((f"get_server_for_request {hash_function}, memo", "repeating", cached, hot))
+
+    weighted = PhiBalancer(servers, "xxhash64", weights=[1 + i % 4 for i in range(args.servers)], memo_size=0)
+    weighted.mark_down(servers[0])
+    cases.append(("weighted, one server down, xxhash64", "distinct", weighted.get_server_for_request, keys))
+
+    bounded = PhiBalancer(servers, "xxhash64", load_factor=0.25)
+    cases.append(("acquire + release, xxhash64", "repeating",
+                  lambda key: bounded.release(bounded.acquire(key)), hot))
+
+    results = []
+    for name, workload, function, case_keys in cases:
+        seconds = measure(function, case_keys, args.repeat)
+        results.append({"case": name, "workload": workload, "operations": len(case_keys), "seconds": seconds,
+                        "ops_per_s": len(case_keys) / seconds, "ns_per_op": seconds / len(case_keys) * 1e9})
+
+    for hash_function in HASH_FUNCTIONS:
+        balancer = PhiBalancer(servers, hash_function)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            balancer.route_indices(keys)
+            best = min(best, time.perf_counter() - start)
+        results.append({"case": f"route_indices batch {hash_function}", "workload": "distinct",
+                        "operations": len(keys), "seconds": best, "ops_per_s": len(keys) / best,
+                        "ns_per_op": best / len(keys) * 1e9})
+
+    baseline = results[0]["ns_per_op"]
+    width = max(len(r["case"]) for r in results)
+    print(f"{'case':<{width}}  {'workload':>9}  {'ops/s':>12}  {'ns/op':>8}  {'speedup':>8}")
+    for r in results:
+        r["speedup"] = baseline / r["ns_per_op"]
+        print(f"{r['case']:<{width}}  {r['workload']:>9}  {r['ops_per_s']:>12,.0f}  {r['ns_per_op']:>8.0f}"
+              f"  {r['speedup']:>7.1f}x")
+
+    if args.json:
+        report = {
+            "metadata": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "arguments": {k: v for k, v in vars(args).items() if k != "json"},
+            },
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
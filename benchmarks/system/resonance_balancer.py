@@ -1,7 +1,9 @@
 # benchmarks/system/resonance_balancer.py
 import os
 import requests
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import sys
 
 # Add project root to path to import our library
@@ -17,26 +19,68 @@ BACKEND_HOSTS = [host.strip() for host in backend_hosts_env.split(',') if host.s
 if not BACKEND_HOSTS:
     raise ValueError("No valid backend hosts found in BACKEND_HOSTS environment variable")
 
-BALANCER = PhiBalancer([f"http://{host}" for host in BACKEND_HOSTS])
+# Optional capacity weights, one per backend, e.g. BACKEND_WEIGHTS="2,1,1"
+backend_weights_env = os.getenv("BACKEND_WEIGHTS", "").strip()
+BACKEND_WEIGHTS = [float(w) for w in backend_weights_env.split(',')] if backend_weights_env else None
+
+# Bounded-load routing: no backend takes more than (1 + LOAD_FACTOR) times
+# its share of the requests in flight, so one busy client cannot overload it
+LOAD_FACTOR = float(os.getenv("LOAD_FACTOR", "0.25"))
+
+# Seconds between health checks of backends that failed a request
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "2"))
+
+BALANCER = PhiBalancer([f"http://{host}" for host in BACKEND_HOSTS], weights=BACKEND_WEIGHTS,
+                       load_factor=LOAD_FACTOR)
+
+def health_check_loop():
+    """Returns failed backends to rotation once they answer again."""
+    while True:
+        time.sleep(HEALTH_CHECK_INTERVAL)
+        for backend_url in BALANCER.servers:
+            if BALANCER.is_available(backend_url):
+                continue
+            try:
+                requests.get(backend_url, timeout=1)
+                BALANCER.mark_up(backend_url)
+            except requests.exceptions.RequestException:
+                pass
 
 class ResonanceProxy(BaseHTTPRequestHandler):
     def do_GET(self):
         # Use the client's IP address as the request ID for routing
         request_id = self.client_address[0]
-        backend_url = BALANCER.get_server_for_request(request_id)
-        
-        try:
-            res = requests.get(f"{backend_url}{self.path}", timeout=5)
+
+        # A backend that fails is marked down, which moves only its clients
+        # to their fallback backend; try again there before giving up.
+        error = None
+        for _ in range(len(BALANCER.servers)):
+            try:
+                backend_url = BALANCER.acquire(request_id)
+            except RuntimeError as e:
+                error = e
+                break
+            try:
+                res = requests.get(f"{backend_url}{self.path}", timeout=5)
+            except requests.exceptions.RequestException as e:
+                error = e
+                BALANCER.mark_down(backend_url)
+                continue
+            finally:
+                BALANCER.release(backend_url)
             self.send_response(res.status_code)
             for key, value in res.headers.items():
                 self.send_header(key, value)
             self.end_headers()
             self.wfile.write(res.content)
-        except requests.exceptions.RequestException as e:
-            self.send_error(503, f"Service Unavailable: {e}")
+            return
+        self.send_error(503, f"Service Unavailable: {error}")
 
 if __name__ == "__main__":
     server_address = ('', 80)
-    httpd = HTTPServer(server_address, ResonanceProxy)
+    threading.Thread(target=health_check_loop, daemon=True).start()
+    # Requests are proxied concurrently, one thread each, so that in-flight
+    # counts reflect real backend load.
+    httpd = ThreadingHTTPServer(server_address, ResonanceProxy)
     print(f"Resonance Balancer running on port 80, routing to: {BACKEND_HOSTS}")
     httpd.serve_forever()
\ No newline at end of file
@@ -2,10 +2,21 @@
 __version__ = "1.0.1"
 __author__ = "Bradley Clonan"
 
-from .compressor import compress, decompress
-from .utils import calculate_shannon_entropy, verify_efficiency
+from .compressor import (
+    compress, decompress, decompress_into, decompressed_size,
+    compress_many, decompress_many, read_range,
+    Compressor, Decompressor, FLUSH_SYNC, FLUSH_FINISH, METHOD_BINARY, METHOD_FIXED_POINT,
+    Dictionary, train_dictionary, dictionary_id,
+)
+from .files import PhiCompFile, open, compress_file, decompress_file, read_file_range
+from .utils import calculate_shannon_entropy, calculate_context_entropy, EntropyEstimator, verify_efficiency
 
 __all__ = [
-    'compress', 'decompress', 'calculate_shannon_entropy', 'verify_efficiency',
+    'compress', 'decompress', 'decompress_into', 'decompressed_size',
+    'compress_many', 'decompress_many', 'read_range',
+    'Compressor', 'Decompressor', 'FLUSH_SYNC', 'FLUSH_FINISH', 'METHOD_BINARY', 'METHOD_FIXED_POINT',
+    'Dictionary', 'train_dictionary', 'dictionary_id',
+    'PhiCompFile', 'open', 'compress_file', 'decompress_file', 'read_file_range',
+    'calculate_shannon_entropy', 'calculate_context_entropy', 'EntropyEstimator', 'verify_efficiency',
     '__version__'
 ]
\ No newline at end of file
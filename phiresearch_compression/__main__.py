@@ -0,0 +1,132 @@
+# phiresearch_compression/__main__.py
+"""
+Command line interface, modelled on `python -m gzip`:
+
+    python -m phiresearch_compression [-d] [-c] [-f] [-l LEVEL] [--seekable] [file ...]
+
+Each file is compressed to `file.phic` (or decompressed back with -d).
+With no files, or "-", stdin is streamed to stdout. --seekable writes files
+with a block index for random-access reads.
+"""
+import argparse
+import os
+import sys
+
+from .compressor import MIN_LEVEL, MAX_LEVEL, decompress
+from .files import FILE_SUFFIX, PhiCompFile, READ_CHUNK_SIZE, compress_file, decompress_file
+
+
+def _copy(src, dst):
+    while True:
+        chunk = src.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        dst.write(chunk)
+
+
+# Format version byte of framed streams, the only ones decoded incrementally.
+_FRAMED_VERSION = 5
+
+
+class _Prefixed:
+    """Reads `head` and then the rest of `fp`, for inputs whose header was peeked."""
+    def __init__(self, head, fp):
+        self._head = head
+        self._fp = fp
+
+    def read(self, size=-1):
+        if self._head:
+            data, self._head = self._head, b""
+            return data
+        return self._fp.read(size)
+
+
+def _decompress_to(src, dst, threads):
+    """Decodes `src` to `dst`: framed streams frame by frame, other formats whole."""
+    head = src.read(5)
+    if head and not b"PHIC".startswith(head[:4]):
+        raise ValueError("Input is not PhiComp data (missing PHIC magic number).")
+    if len(head) == 5 and head[4] != _FRAMED_VERSION:
+        # One-shot, block and seekable streams need their whole body.
+        dst.write(decompress(head + src.read(), threads))
+        return
+    with PhiCompFile(_Prefixed(head, src), "rb") as reader:
+        _copy(reader, dst)
+
+
+def _process_stdio(args):
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    if args.decompress:
+        _decompress_to(stdin, stdout, args.threads)
+    else:
+        with PhiCompFile(stdout, "wb", memory_budget=args.memory_budget, frame_size=args.frame_size,
+                         level=args.level) as writer:
+            _copy(stdin, writer)
+    stdout.flush()
+
+
+def _process_file(args, name):
+    if args.stdout:
+        with open(name, "rb") as fin:
+            if args.decompress:
+                _decompress_to(fin, sys.stdout.buffer, args.threads)
+            else:
+                with PhiCompFile(sys.stdout.buffer, "wb", memory_budget=args.memory_budget,
+                                 frame_size=args.frame_size, level=args.level) as writer:
+                    _copy(fin, writer)
+        sys.stdout.buffer.flush()
+        return
+
+    if args.decompress:
+        if not name.endswith(FILE_SUFFIX):
+            raise ValueError(f"{name}: unknown suffix, expected {FILE_SUFFIX}")
+        target = name[:-len(FILE_SUFFIX)]
+    else:
+        target = name + FILE_SUFFIX
+    if os.path.exists(target) and not args.force:
+        raise FileExistsError(f"{target} already exists; use -f to overwrite")
+    if args.decompress:
+        decompress_file(name, target, threads=args.threads)
+    elif args.seekable:
+        compress_file(name, target, memory_budget=args.memory_budget, level=args.level, seekable=True,
+                      block_size=args.block_size, threads=args.threads)
+    else:
+        compress_file(name, target, memory_budget=args.memory_budget, frame_size=args.frame_size, level=args.level)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m phiresearch_compression",
+        description="Compress or decompress files with PhiComp (constant memory, streamed frames).",
+    )
+    parser.add_argument("files", nargs="*", metavar="file", help='files to process ("-" or none for stdin)')
+    parser.add_argument("-d", "--decompress", action="store_true", help="decompress instead of compressing")
+    parser.add_argument("-c", "--stdout", action="store_true", help="write to stdout and keep input files")
+    parser.add_argument("-f", "--force", action="store_true", help="overwrite existing output files")
+    parser.add_argument("-l", "--level", type=int, default=None,
+                        help=f"compression level, {MIN_LEVEL} (fastest) to {MAX_LEVEL} (best)")
+    parser.add_argument("--memory-budget", type=int, default=None, help="model memory budget in bytes")
+    parser.add_argument("--frame-size", type=int, default=None, help="frame size in bytes")
+    parser.add_argument("--threads", type=int, default=None, help="threads for coding block streams")
+    parser.add_argument("--seekable", action="store_true",
+                        help="write files with a block index for random-access reads")
+    parser.add_argument("--block-size", type=int, default=None, help="block size of seekable files in bytes")
+    args = parser.parse_args(argv)
+    if args.seekable and (args.stdout or not args.files or "-" in args.files):
+        parser.error("--seekable needs file arguments and cannot write to stdout")
+
+    status = 0
+    for name in args.files or ["-"]:
+        try:
+            if name == "-":
+                _process_stdio(args)
+            else:
+                _process_file(args, name)
+        except (OSError, ValueError, RuntimeError, EOFError) as e:
+            print(f"{parser.prog}: {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,11 @@
 # phiresearch_compression/compressor.py
-from typing import Union
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+import mmap
+import threading
+
+# Anything exporting a C-contiguous buffer is accepted without copying,
+# e.g. bytes, bytearray, memoryview, mmap or a NumPy uint8 array.
+BytesLike = Union[bytes, bytearray, memoryview, mmap.mmap]
 
 # This imports the *real*, compiled C++ extension.
 # The 'core_bindings.so' (or .pyd) file is created when you run 'pip install .'.
@@ -13,25 +19,346 @@ except ImportError as e:
         "and run 'pip install .' from the project root."
     ) from e
 
-def compress(data: Union[bytes, bytearray]) -> bytes:
+DEFAULT_MEMORY_BUDGET = core_bindings.DEFAULT_MEMORY_BUDGET
+DEFAULT_BLOCK_SIZE = core_bindings.DEFAULT_BLOCK_SIZE
+DEFAULT_STREAM_MEMORY_BUDGET = core_bindings.DEFAULT_STREAM_MEMORY_BUDGET
+DEFAULT_FRAME_SIZE = core_bindings.DEFAULT_FRAME_SIZE
+DEFAULT_DICTIONARY_BUDGET = core_bindings.DEFAULT_DICTIONARY_BUDGET
+DEFAULT_SEEKABLE_BLOCK_SIZE = core_bindings.DEFAULT_SEEKABLE_BLOCK_SIZE
+
+# Compression levels trade speed for ratio by choosing the context orders:
+# 1 is fastest, 5 compresses best. The orders are recorded in the stream.
+MIN_LEVEL = core_bindings.MIN_LEVEL
+DEFAULT_LEVEL = core_bindings.DEFAULT_LEVEL
+MAX_LEVEL = core_bindings.MAX_LEVEL
+
+# Coding methods for compress(). METHOD_BINARY (the default) codes bits and
+# compresses best; METHOD_FIXED_POINT codes whole symbols from integer-only
+# frequency tables, so its output is bit-exact across compilers and
+# platforms. Both are read by decompress(), which finds the method in the
+# stream header.
+METHOD_BINARY = core_bindings.METHOD_BINARY
+METHOD_FIXED_POINT = core_bindings.METHOD_FIXED_POINT
+
+# Flush modes for Compressor.flush(), numbered like their zlib counterparts.
+FLUSH_SYNC = 2
+FLUSH_FINISH = 4
+
+def _check_int(name: str, value: Optional[int], default: int, minimum: int) -> int:
+    """Validates an optional integer tuning parameter."""
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"{name} must be an integer.")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}.")
+    return value
+
+def _check_level(level: Optional[int]) -> int:
+    """Validates an optional compression level."""
+    level = _check_int("level", level, DEFAULT_LEVEL, MIN_LEVEL)
+    if level > MAX_LEVEL:
+        raise ValueError(f"level must be at most {MAX_LEVEL}.")
+    return level
+
+def _check_method(method: Optional[int], dictionary) -> int:
+    """Validates an optional coding method."""
+    if method is None:
+        return METHOD_BINARY
+    if isinstance(method, bool) or not isinstance(method, int):
+        raise TypeError("method must be an integer.")
+    if method not in (METHOD_BINARY, METHOD_FIXED_POINT):
+        raise ValueError("method must be METHOD_BINARY or METHOD_FIXED_POINT.")
+    if dictionary is not None and method != METHOD_BINARY:
+        raise ValueError("Dictionaries require METHOD_BINARY.")
+    return method
+
+def _check_buffer(data) -> None:
+    """Rejects objects that do not support the buffer protocol."""
+    if isinstance(data, str):
+        raise TypeError("Input data must be a bytes-like object, not str.")
+    try:
+        memoryview(data).release()
+    except TypeError:
+        raise TypeError("Input data must be a bytes-like object.") from None
+
+class Dictionary:
+    """
+    A model snapshot trained on sample messages, used as the starting state
+    when compressing small inputs so they do not pay the cold-start cost of
+    an empty model. Create one with `train_dictionary`, store it with
+    `as_bytes()` and load it back with `Dictionary(data)`. Streams record the
+    dictionary `id`, and the same dictionary is required to decompress them.
+    """
+    def __init__(self, data: BytesLike):
+        _check_buffer(data)
+        self._dictionary = core_bindings.Dictionary(data)
+
+    @classmethod
+    def _wrap(cls, dictionary) -> "Dictionary":
+        instance = cls.__new__(cls)
+        instance._dictionary = dictionary
+        return instance
+
+    @property
+    def id(self) -> int:
+        """Non-zero identifier recorded in streams compressed with this dictionary."""
+        return self._dictionary.id
+
+    def as_bytes(self) -> bytes:
+        """Serialises the dictionary for storage or distribution."""
+        return self._dictionary.as_bytes()
+
+    def __repr__(self) -> str:
+        return f"Dictionary(id={self.id:#010x})"
+
+def train_dictionary(samples: Iterable[BytesLike], memory_budget: Optional[int] = None,
+                     level: Optional[int] = None) -> Dictionary:
+    """
+    Trains a Dictionary on representative sample messages. Each sample is
+    learned as a separate message. `memory_budget` caps the model tables
+    (default: DEFAULT_DICTIONARY_BUDGET), which is also roughly the size of
+    the serialised dictionary and the per-call cost of starting from it.
+    `level` picks the context orders, which streams using it inherit.
+    """
+    samples = list(samples)
+    for sample in samples:
+        _check_buffer(sample)
+    memory_budget = _check_int("memory_budget", memory_budget, DEFAULT_DICTIONARY_BUDGET, 1)
+    level = _check_level(level)
+    return Dictionary._wrap(core_bindings.Dictionary.train(samples, memory_budget, level))
+
+def _check_dictionary(dictionary: Optional[Dictionary]):
+    """Returns the native dictionary, or None."""
+    if dictionary is None:
+        return None
+    if not isinstance(dictionary, Dictionary):
+        raise TypeError("dictionary must be a Dictionary.")
+    return dictionary._dictionary
+
+def compress(data: BytesLike, memory_budget: Optional[int] = None,
+             block_size: Optional[int] = None, threads: Optional[int] = None,
+             dictionary: Optional[Dictionary] = None, level: Optional[int] = None,
+             method: Optional[int] = None) -> bytes:
     """
     Compresses data using the C++ Fibonacci Context Modeling core.
     This is a direct wrapper to the high-performance, adaptive implementation.
+
+    `memory_budget` caps the bytes used by each block's context tables
+    (default: DEFAULT_MEMORY_BUDGET). Inputs larger than `block_size`
+    (default: DEFAULT_BLOCK_SIZE, 0 for a single block) are split into
+    independently modelled blocks compressed on `threads` OpenMP threads
+    (default: all cores).
+
+    The input buffer is read in place and the GIL is released while coding,
+    so several threads can compress concurrently.
+
+    `level` (MIN_LEVEL..MAX_LEVEL, default DEFAULT_LEVEL) trades speed for
+    ratio: level 1 models three short contexts and is the fastest, level 5
+    models seven and compresses best.
+
+    With a trained `dictionary` every block starts from the dictionary's
+    model instead of an empty one (its size and orders replace
+    `memory_budget` and `level`).
+
+    `method` is METHOD_BINARY (default) or METHOD_FIXED_POINT, the symbol
+    coder whose output is bit-exact on every platform. Dictionaries and the
+    streaming Compressor always use METHOD_BINARY.
     """
-    if not isinstance(data, (bytes, bytearray)):
-        raise TypeError("Input data must be bytes or bytearray.")
+    _check_buffer(data)
+    memory_budget = _check_int("memory_budget", memory_budget, DEFAULT_MEMORY_BUDGET, 1)
+    block_size = _check_int("block_size", block_size, DEFAULT_BLOCK_SIZE, 0)
+    threads = _check_int("threads", threads, 0, 1)
+    level = _check_level(level)
+    method = _check_method(method, dictionary)
     
-    # The pybind11 wrapper automatically handles converting Python bytes
-    # to a std::string and the result back to bytes.
-    return core_bindings.compress_main(data)
+    return core_bindings.compress_main(data, memory_budget, method,
+                                       block_size, threads, _check_dictionary(dictionary), level)
 
-def decompress(data: Union[bytes, bytearray]) -> bytes:
+def decompress(data: BytesLike, threads: Optional[int] = None,
+               dictionary: Optional[Dictionary] = None) -> bytes:
     """
     Decompresses data using the C++ core. This function calls the
-    fully implemented adaptive decompressor.
+    fully implemented adaptive decompressor. Block-parallel streams are
+    decoded on `threads` OpenMP threads (default: all cores). Streams
+    compressed with a dictionary need the same `dictionary` (ValueError
+    otherwise).
     """
-    if not isinstance(data, (bytes, bytearray)):
-        raise TypeError("Input data must be bytes or bytearray.")
+    _check_buffer(data)
+    threads = _check_int("threads", threads, 0, 1)
     
     # Call the C++ decompressor, which will raise a std::runtime_error on failure.
-    return core_bindings.decompress_main(data)
\ No newline at end of file
+    return core_bindings.decompress_main(data, threads, _check_dictionary(dictionary))
+
+def decompress_into(data: BytesLike, out, threads: Optional[int] = None,
+                    dictionary: Optional[Dictionary] = None) -> int:
+    """
+    Decompresses `data` directly into the writable buffer `out` (for example
+    a bytearray, a writable mmap or a NumPy array) and returns the number of
+    bytes written. Raises ValueError if `out` is smaller than the original
+    data; use `decompressed_size` to size it.
+    """
+    _check_buffer(data)
+    threads = _check_int("threads", threads, 0, 1)
+    return core_bindings.decompress_into(data, out, threads, _check_dictionary(dictionary))
+
+def read_range(data: BytesLike, offset: int, length: int, threads: Optional[int] = None,
+               dictionary: Optional[Dictionary] = None) -> bytes:
+    """
+    Returns original bytes [offset, offset + length) of a compressed stream,
+    decoding only the blocks that overlap them (on `threads` threads). Block
+    streams written by `compress` and seekable files written by
+    `compress_file(..., seekable=True)` support this; other streams are
+    decoded whole. As with slicing, a range past the end is truncated.
+    """
+    _check_buffer(data)
+    offset = _check_int("offset", offset, 0, 0)
+    length = _check_int("length", length, 0, 0)
+    threads = _check_int("threads", threads, 0, 1)
+    return core_bindings.decompress_range(data, offset, length, threads, _check_dictionary(dictionary))
+
+def _batch_inputs(data, offsets: Optional[Sequence[int]]):
+    """Normalises batch input to (list of buffers, None) or (buffer, offsets)."""
+    if offsets is None:
+        if isinstance(data, (str, bytes, bytearray, memoryview, mmap.mmap)):
+            raise TypeError("Batch input must be a sequence of bytes-like objects, or a buffer with offsets.")
+        return (data if isinstance(data, list) else list(data)), None
+    _check_buffer(data)
+    offsets = offsets if isinstance(offsets, list) else list(offsets)
+    size = memoryview(data).nbytes
+    for offset in offsets:
+        if isinstance(offset, bool) or not isinstance(offset, int):
+            raise TypeError("Offsets must be integers.")
+        if offset < 0 or offset > size:
+            raise ValueError("Offsets must be non-negative and within the data.")
+    return data, offsets
+
+def compress_many(data: Union[Iterable[BytesLike], BytesLike], offsets: Optional[Sequence[int]] = None,
+                  memory_budget: Optional[int] = None, block_size: Optional[int] = None,
+                  threads: Optional[int] = None, dictionary: Optional[Dictionary] = None,
+                  level: Optional[int] = None) -> Tuple[bytes, List[int]]:
+    """
+    Compresses many independent payloads in a single native call, in
+    parallel on `threads` OpenMP threads (default: all cores).
+
+    `data` is a sequence of bytes-like objects, or a single buffer split by
+    `offsets` (len(payloads) + 1 boundaries). Returns `(output, offsets)`:
+    payload i compresses to `output[offsets[i]:offsets[i + 1]]`, which
+    `decompress` reads like any other stream. The other arguments behave as
+    in `compress`.
+    """
+    data, offsets = _batch_inputs(data, offsets)
+    memory_budget = _check_int("memory_budget", memory_budget, DEFAULT_MEMORY_BUDGET, 1)
+    block_size = _check_int("block_size", block_size, DEFAULT_BLOCK_SIZE, 0)
+    threads = _check_int("threads", threads, 0, 1)
+    level = _check_level(level)
+    output, output_offsets = core_bindings.compress_batch(data, offsets, memory_budget, block_size, threads,
+                                                          _check_dictionary(dictionary), level)
+    return output, output_offsets
+
+def decompress_many(data: Union[Iterable[BytesLike], BytesLike], offsets: Optional[Sequence[int]] = None,
+                    threads: Optional[int] = None,
+                    dictionary: Optional[Dictionary] = None) -> Tuple[bytes, List[int]]:
+    """
+    Decompresses many streams in a single native call, in parallel on
+    `threads` OpenMP threads (default: all cores).
+
+    Accepts the same input shapes as `compress_many` (so its result can be
+    passed straight back) and returns `(output, offsets)` in the same form.
+    All streams must use the same `dictionary`, or none.
+    """
+    data, offsets = _batch_inputs(data, offsets)
+    threads = _check_int("threads", threads, 0, 1)
+    output, output_offsets = core_bindings.decompress_batch(data, offsets, threads, _check_dictionary(dictionary))
+    return output, output_offsets
+
+def decompressed_size(data: BytesLike) -> int:
+    """
+    Returns the original size recorded in a compressed stream's header.
+    Raises ValueError for framed streams written by `Compressor`, whose
+    size is not known up front.
+    """
+    _check_buffer(data)
+    size = core_bindings.decompressed_size(data)
+    if size == core_bindings.UNKNOWN_SIZE:
+        raise ValueError("Framed streams do not record their decompressed size.")
+    return size
+
+def dictionary_id(data: BytesLike) -> int:
+    """Returns the id of the dictionary needed to decompress `data`, or 0 if none."""
+    _check_buffer(data)
+    return core_bindings.dictionary_id(data)
+
+
+class Compressor:
+    """
+    Incremental compressor in the style of zlib.compressobj().
+
+    Data passed to `compress` is buffered up to `frame_size` bytes and coded
+    as self-contained frames that share one adaptive model, so memory stays
+    bounded no matter how long the stream runs. The output is a framed
+    PhiComp stream readable by `Decompressor` or `decompress`. A `dictionary`
+    primes the shared model, which helps most with short messages; `level`
+    works as in `compress`.
+    """
+    def __init__(self, memory_budget: Optional[int] = None, frame_size: Optional[int] = None,
+                 dictionary: Optional[Dictionary] = None, level: Optional[int] = None):
+        memory_budget = _check_int("memory_budget", memory_budget, DEFAULT_STREAM_MEMORY_BUDGET, 1)
+        frame_size = _check_int("frame_size", frame_size, DEFAULT_FRAME_SIZE, 1)
+        level = _check_level(level)
+        self._encoder = core_bindings.StreamEncoder(memory_budget, frame_size, _check_dictionary(dictionary), level)
+        self._lock = threading.Lock()
+
+    def compress(self, data: BytesLike) -> bytes:
+        """Feeds `data` and returns any compressed bytes that are ready."""
+        _check_buffer(data)
+        with self._lock:
+            return self._encoder.compress(data)
+
+    def flush(self, mode: int = FLUSH_FINISH) -> bytes:
+        """
+        Codes all buffered data. FLUSH_SYNC keeps the stream open so that a
+        complete message can be handed to the reader; FLUSH_FINISH ends it.
+        """
+        if mode not in (FLUSH_SYNC, FLUSH_FINISH):
+            raise ValueError("mode must be FLUSH_SYNC or FLUSH_FINISH.")
+        with self._lock:
+            return self._encoder.flush(mode == FLUSH_FINISH)
+
+
+class Decompressor:
+    """
+    Incremental decompressor for framed streams, with the interface of
+    lzma.LZMADecompressor: `decompress(data, max_length)`, `needs_input`,
+    `eof` and `unused_data`. Decoded bytes beyond `max_length` are held
+    back and returned by later calls (pass b"" to drain them). Streams
+    compressed with a dictionary need the same `dictionary`.
+    """
+    def __init__(self, dictionary: Optional[Dictionary] = None):
+        self._decoder = core_bindings.StreamDecoder(_check_dictionary(dictionary))
+        self._lock = threading.Lock()
+
+    def decompress(self, data: BytesLike, max_length: int = -1) -> bytes:
+        """Feeds `data` and returns up to `max_length` decoded bytes (all if negative)."""
+        _check_buffer(data)
+        if isinstance(max_length, bool) or not isinstance(max_length, int):
+            raise TypeError("max_length must be an integer.")
+        with self._lock:
+            if self._decoder.eof:
+                raise EOFError("Already at end of stream.")
+            return self._decoder.decompress(data, max_length)
+
+    @property
+    def eof(self) -> bool:
+        """True once the end-of-stream marker has been reached."""
+        return self._decoder.eof
+
+    @property
+    def needs_input(self) -> bool:
+        """False while more output can be produced without further input."""
+        return self._decoder.needs_input
+
+    @property
+    def unused_data(self) -> bytes:
+        """Bytes found after the end of the stream."""
+        return self._decoder.unused_data
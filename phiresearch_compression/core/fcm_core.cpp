@@ -2,7 +2,14 @@
 #include <cmath>
 #include <numeric>
 #include <algorithm>
+#include <array>
 #include <stdexcept>
+#include <cstring>
+#include <exception>
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
 
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
@@ -14,30 +21,208 @@ namespace phicomp
 
         const double GOLDEN_RATIO = (1.0 + std::sqrt(5.0)) / 2.0;
 
-        // --- FibonacciContextModel Implementation ---
-        FibonacciContextModel::FibonacciContextModel(const std::vector<size_t> &orders)
-            : phi(GOLDEN_RATIO), fib_orders(orders)
+        // Base of the polynomial rolling hash over the context window.
+        constexpr uint64_t ROLLING_HASH_BASE = 0x100000001B3ULL;
+
+        static inline uint64_t mix_context_hash(ContextHash hash) noexcept
+        {
+            hash ^= hash >> 31;
+            hash *= GOLDEN_MULTIPLIER;
+            hash ^= hash >> 29;
+            return hash;
+        }
+
+        const std::vector<size_t> &default_orders()
+        {
+            static const std::vector<size_t> orders = {2, 3, 5, 8, 13};
+            return orders;
+        }
+
+        const std::vector<size_t> &orders_for_level(int level)
+        {
+            // On the Calgary corpus: 2.22, 2.11, 2.12, 2.07 and 2.05 bits per
+            // byte, with level 1 coding about 1.6x as fast as level 3.
+            static const std::vector<size_t> presets[MAX_LEVEL] = {
+                {1, 2, 3},
+                {2, 3, 5},
+                default_orders(),
+                {1, 2, 3, 5, 8, 13},
+                {1, 2, 3, 4, 6, 8, 13},
+            };
+            if (level < MIN_LEVEL || level > MAX_LEVEL)
+                throw std::invalid_argument("Compression level must be between " + std::to_string(MIN_LEVEL) +
+                                            " and " + std::to_string(MAX_LEVEL) + ".");
+            return presets[level - 1];
+        }
+
+        // --- ContextTable Implementation ---
+        ContextTable::ContextTable(unsigned table_bits)
+            : slots(size_t(1) << table_bits), bits(table_bits)
+        {
+            if (table_bits < MIN_TABLE_BITS || table_bits > MAX_TABLE_BITS)
+                throw std::invalid_argument("Context table size out of range.");
+        }
+
+        const ContextSlot *ContextTable::find(ContextHash hash) const noexcept
+        {
+            uint64_t mixed = mix_context_hash(hash);
+            size_t index = static_cast<size_t>(mixed >> (64 - bits));
+            uint32_t check = static_cast<uint32_t>(mixed) | 1u;
+            const ContextSlot &first = slots[index];
+            if (first.check == check)
+                return &first;
+            const ContextSlot &second = slots[index ^ 1];
+            if (second.check == check)
+                return &second;
+            return nullptr;
+        }
+
+        ContextSlot &ContextTable::find_or_insert(ContextHash hash) noexcept
+        {
+            uint64_t mixed = mix_context_hash(hash);
+            size_t index = static_cast<size_t>(mixed >> (64 - bits));
+            uint32_t check = static_cast<uint32_t>(mixed) | 1u;
+            ContextSlot &first = slots[index];
+            if (first.check == check)
+                return first;
+            ContextSlot &second = slots[index ^ 1];
+            if (second.check == check)
+                return second;
+            ContextSlot &victim = (second.total < first.total) ? second : first;
+            victim.check = check;
+            victim.total = 0;
+            victim.used = 0;
+            return victim;
+        }
+
+        static void add_symbol(ContextSlot &slot, Symbol symbol) noexcept
+        {
+            size_t k = 0;
+            while (k < slot.used && slot.symbols[k] != symbol)
+                ++k;
+            if (k == slot.used)
+            {
+                if (slot.used < ContextSlot::MAX_SYMBOLS)
+                {
+                    slot.used++;
+                }
+                else
+                {
+                    // Slot is full: the least frequent successor gives way.
+                    k = 0;
+                    for (size_t j = 1; j < ContextSlot::MAX_SYMBOLS; ++j)
+                        if (slot.counts[j] < slot.counts[k])
+                            k = j;
+                    slot.total -= slot.counts[k];
+                }
+                slot.symbols[k] = symbol;
+                slot.counts[k] = 0;
+            }
+            if (slot.counts[k] == ContextSlot::MAX_COUNT)
+            {
+                slot.total = 0;
+                for (size_t j = 0; j < slot.used; ++j)
+                {
+                    slot.counts[j] = static_cast<uint16_t>((slot.counts[j] + 1) / 2);
+                    slot.total += slot.counts[j];
+                }
+            }
+            slot.counts[k]++;
+            slot.total++;
+        }
+
+        // --- ContextHasher Implementation ---
+        ContextHasher::ContextHasher(const std::vector<size_t> &orders)
+            : orders(orders), history_pos(0), history_length(0)
         {
             if (orders.empty())
                 throw std::invalid_argument("Fibonacci orders cannot be empty.");
-            context_models.resize(fib_orders.size());
-            max_order = fib_orders.back();
+            if (!std::is_sorted(orders.begin(), orders.end()) || orders.front() == 0)
+                throw std::invalid_argument("Fibonacci orders must be positive and ascending.");
+            max_order = orders.back();
+            for (size_t order : orders)
+            {
+                uint64_t factor = 1;
+                for (size_t j = 1; j < order; ++j)
+                    factor *= ROLLING_HASH_BASE;
+                drop_factors.push_back(factor);
+            }
+            hashes.assign(orders.size(), 0);
+            size_t ring_size = 1;
+            while (ring_size < max_order)
+                ring_size <<= 1;
+            history.assign(ring_size, 0);
+            history_mask = ring_size - 1;
         }
 
-        void FibonacciContextModel::update(Symbol symbol) noexcept
+        void ContextHasher::push(Symbol symbol) noexcept
         {
-            for (size_t i = 0; i < fib_orders.size(); ++i)
+            for (size_t i = 0; i < orders.size(); ++i)
             {
-                size_t order = fib_orders[i];
-                if (history.size() >= order)
+                if (history_length >= orders[i])
                 {
-                    ContextKey context(history.begin() + (history.size() - order), history.end());
-                    context_models[i][context][symbol]++;
+                    // Roll the oldest symbol out of this order's window.
+                    Symbol oldest = history[(history_pos - orders[i]) & history_mask];
+                    hashes[i] -= (uint64_t(oldest) + 1) * drop_factors[i];
                 }
+                hashes[i] = hashes[i] * ROLLING_HASH_BASE + (uint64_t(symbol) + 1);
+            }
+            history[history_pos & history_mask] = symbol;
+            history_pos++;
+            if (history_length < max_order)
+                history_length++;
+        }
+
+        void ContextHasher::reset() noexcept
+        {
+            std::fill(hashes.begin(), hashes.end(), 0);
+            std::fill(history.begin(), history.end(), 0);
+            history_pos = 0;
+            history_length = 0;
+        }
+
+        // --- FibonacciContextModel Implementation ---
+        // phi with 12 fractional bits. Integer powers follow from the identity
+        // phi^i = F(i) * phi + F(i - 1), so the weight tables never depend on
+        // the platform's floating-point pow().
+        constexpr unsigned PHI_FIXED_BITS = 12;
+        constexpr uint64_t PHI_FIXED = 6627;
+
+        static uint32_t fixed_phi_power(size_t i) noexcept
+        {
+            uint64_t fib_prev = 1, fib = 0; // F(-1), F(0)
+            for (size_t k = 0; k < i; ++k)
+            {
+                uint64_t next = fib + fib_prev;
+                fib_prev = fib;
+                fib = next;
             }
-            history.push_back(symbol);
-            if (history.size() > max_order)
-                history.pop_front();
+            return static_cast<uint32_t>(fib * PHI_FIXED + (fib_prev << PHI_FIXED_BITS));
+        }
+
+        FibonacciContextModel::FibonacciContextModel(const std::vector<size_t> &orders, unsigned table_bits)
+            : fib_orders(orders), contexts(orders), phi(GOLDEN_RATIO)
+        {
+            context_models.reserve(fib_orders.size());
+            order_weights.reserve(fib_orders.size());
+            for (size_t i = 0; i < fib_orders.size(); ++i)
+            {
+                context_models.emplace_back(table_bits);
+                order_weights.push_back(fixed_phi_power(i));
+            }
+            // Escape share phi^-n of the frequency total, spread over all symbols.
+            uint64_t escape = (uint64_t(FREQUENCY_TOTAL) << PHI_FIXED_BITS) / fixed_phi_power(fib_orders.size());
+            escape_base = std::max<uint32_t>(1, static_cast<uint32_t>(escape / 256));
+        }
+
+        void FibonacciContextModel::update(Symbol symbol) noexcept
+        {
+            for (size_t i = 0; i < fib_orders.size(); ++i)
+            {
+                if (contexts.ready(i))
+                    add_symbol(context_models[i].find_or_insert(contexts.hash(i)), symbol);
+            }
+            contexts.push(symbol);
         }
 
         std::vector<double> FibonacciContextModel::get_probabilities() const
@@ -46,26 +231,17 @@ namespace phicomp
             double total_weight = 0.0;
             for (int i = fib_orders.size() - 1; i >= 0; --i)
             {
-                size_t order = fib_orders[i];
-                if (history.size() < order)
+                if (!contexts.ready(i))
                     continue;
-                ContextKey context(history.begin() + (history.size() - order), history.end());
-                auto model_it = context_models[i].find(context);
-                if (model_it != context_models[i].end())
+                const ContextSlot *slot = context_models[i].find(contexts.hash(i));
+                if (slot != nullptr && slot->total > 0)
                 {
                     double weight = std::pow(phi, (double)i);
-                    const SymbolCounts &counts = model_it->second;
-                    uint32_t context_total = 0;
-                    for (const auto &pair : counts)
-                        context_total += pair.second;
-                    if (context_total > 0)
+                    for (size_t k = 0; k < slot->used; ++k)
                     {
-                        for (const auto &pair : counts)
-                        {
-                            final_probabilities[pair.first] += weight * ((double)pair.second / context_total);
-                        }
-                        total_weight += weight;
+                        final_probabilities[slot->symbols[k]] += weight * ((double)slot->counts[k] / slot->total);
                     }
+                    total_weight += weight;
                 }
             }
             double escape_prob = std::pow(phi, -(double)fib_orders.size());
@@ -87,236 +263,2350 @@ namespace phicomp
             return final_probabilities;
         }
 
+        void FibonacciContextModel::get_frequencies(SymbolFrequencies &frequencies) const noexcept
+        {
+            for (size_t k = 0; k < frequencies.count; ++k)
+                frequencies.extra[frequencies.symbols[k]] = 0;
+            frequencies.count = 0;
+
+            // Each order contributes weight * count / total per symbol, scaled
+            // by 2^16. Slots cap their counts, so the sum cannot overflow.
+            uint64_t mixed_total = 0;
+            for (size_t i = 0; i < fib_orders.size(); ++i)
+            {
+                if (!contexts.ready(i))
+                    continue;
+                const ContextSlot *slot = context_models[i].find(contexts.hash(i));
+                if (slot == nullptr || slot->total == 0)
+                    continue;
+                uint64_t factor = (uint64_t(order_weights[i]) << 16) / slot->total;
+                for (size_t k = 0; k < slot->used; ++k)
+                {
+                    Symbol s = slot->symbols[k];
+                    uint64_t contribution = slot->counts[k] * factor;
+                    if (frequencies.mixed[s] == 0)
+                        frequencies.symbols[frequencies.count++] = s;
+                    frequencies.mixed[s] += contribution;
+                    mixed_total += contribution;
+                }
+            }
+
+            if (mixed_total == 0)
+            {
+                frequencies.base = FREQUENCY_TOTAL / 256;
+                frequencies.total = FREQUENCY_TOTAL;
+                return;
+            }
+            frequencies.base = escape_base;
+            uint64_t remaining = FREQUENCY_TOTAL - 256 * escape_base;
+            uint32_t total = 256 * escape_base;
+            for (size_t k = 0; k < frequencies.count; ++k)
+            {
+                Symbol s = frequencies.symbols[k];
+                uint32_t extra = static_cast<uint32_t>(frequencies.mixed[s] * remaining / mixed_total);
+                frequencies.extra[s] = extra;
+                frequencies.mixed[s] = 0;
+                total += extra;
+            }
+            frequencies.total = total;
+        }
+
+        // --- Logistic helpers (integer-only) ---
+        // squash(x) = 4096 / (1 + e^(-x/256)), interpolated from a 33-point table.
+        static inline int squash(int x) noexcept
+        {
+            static const int table[33] = {1, 2, 3, 6, 10, 16, 27, 45, 73, 120, 194, 310, 488, 747, 1101, 1546,
+                                          2047, 2549, 2994, 3348, 3607, 3785, 3901, 3975, 4022, 4050, 4068, 4079,
+                                          4085, 4089, 4092, 4093, 4094};
+            if (x > 2047)
+                return 4095;
+            if (x < -2047)
+                return 1;
+            int w = x & 127;
+            int i = (x >> 7) + 16;
+            return (table[i] * (128 - w) + table[i + 1] * w + 64) >> 7;
+        }
+
+        // stretch(p) = ln(p / (1 - p)), the inverse of squash, over 12-bit p.
+        static const std::array<int16_t, 4096> STRETCH_TABLE = []
+        {
+            std::array<int16_t, 4096> table{};
+            int pi = 0;
+            for (int x = -2047; x <= 2047; ++x)
+            {
+                int v = squash(x);
+                for (int j = pi; j <= v; ++j)
+                    table[j] = static_cast<int16_t>(x);
+                pi = v + 1;
+            }
+            for (int j = pi; j < 4096; ++j)
+                table[j] = 2047;
+            return table;
+        }();
+
+        static inline int stretch(int p) noexcept { return STRETCH_TABLE[p]; }
+
+        // --- BinaryContextModel Implementation ---
+        static const int MIXER_SHIFT = 16;
+        static const int MIXER_LEARNING_SHIFT = 10;
+        static const int32_t MIXER_WEIGHT_LIMIT = 1 << 22;
+        // Bit probabilities are stored as a 22-bit probability over a 10-bit hit
+        // count; the adaptation rate is 1/(count + 1.5) until the count saturates.
+        static const uint32_t PROBABILITY_INIT = 1u << 31;
+        static const uint32_t COUNT_LIMIT = 127;
+
+        // Index of the first cache-line aligned entry of a table allocation.
+        static inline size_t aligned_offset(const uint32_t *entries) noexcept
+        {
+            return (64 - reinterpret_cast<uintptr_t>(entries) % 64) % 64 / sizeof(uint32_t);
+        }
+
+        BinaryContextModel::BinaryContextModel(const std::vector<size_t> &orders, unsigned table_bits)
+            : contexts(orders), bits(table_bits), probability(2048), partial_byte(1), nibble_node(1), bit_count(0)
+        {
+            if (table_bits < MIN_TABLE_BITS || table_bits > MAX_TABLE_BITS)
+                throw std::invalid_argument("Context table size out of range.");
+            tables.resize(orders.size() * (size_t(16) << table_bits) + 16);
+            table_offset = aligned_offset(tables.data());
+            order0.resize(256);
+            buckets.assign(orders.size(), 0);
+            inputs.assign(orders.size() + 1, 0);
+            slots.assign(orders.size() + 1, 0);
+            weights.resize((orders.size() + 1) * 256);
+            reset();
+        }
+
+        BinaryContextModel::BinaryContextModel(const BinaryContextModel &other) : contexts(other.contexts)
+        {
+            *this = other;
+        }
+
+        BinaryContextModel &BinaryContextModel::operator=(const BinaryContextModel &other)
+        {
+            if (this == &other)
+                return *this;
+            contexts = other.contexts;
+            order0 = other.order0;
+            buckets = other.buckets;
+            weights = other.weights;
+            inputs = other.inputs;
+            slots = other.slots;
+            bits = other.bits;
+            probability = other.probability;
+            partial_byte = other.partial_byte;
+            nibble_node = other.nibble_node;
+            bit_count = other.bit_count;
+            tables.resize(other.tables.size());
+            table_offset = aligned_offset(tables.data());
+            std::copy(other.tables.begin() + other.table_offset, other.tables.end() - (16 - other.table_offset),
+                      tables.begin() + table_offset);
+            // Bucket and slot indices include the table offset.
+            for (size_t i = 0; i < buckets.size(); ++i)
+            {
+                buckets[i] = buckets[i] - other.table_offset + table_offset;
+                slots[i] = slots[i] - other.table_offset + table_offset;
+            }
+            return *this;
+        }
+
+        void BinaryContextModel::reset() noexcept
+        {
+            std::fill(tables.begin(), tables.end(), PROBABILITY_INIT);
+            std::fill(order0.begin(), order0.end(), PROBABILITY_INIT);
+            size_t num_inputs = buckets.size() + 1;
+            // Initial mixer weights follow the Fibonacci sequence (order-0 gets
+            // F(1), the highest order the largest term), normalised to one.
+            // The sum of F(1)..F(n) is F(n + 2) - 1.
+            int64_t a = 1, b = 1;
+            for (size_t i = 0; i < num_inputs; ++i)
+            {
+                int64_t next = a + b;
+                a = b;
+                b = next;
+            }
+            int64_t fib_total = b - 1;
+            a = 1;
+            b = 1;
+            for (size_t i = 0; i < num_inputs; ++i)
+            {
+                weights[i] = static_cast<int32_t>((a << MIXER_SHIFT) / fib_total);
+                int64_t next = a + b;
+                a = b;
+                b = next;
+            }
+            for (size_t c = 1; c < 256; ++c)
+                std::copy(weights.begin(), weights.begin() + num_inputs, weights.begin() + c * num_inputs);
+            reset_history();
+        }
+
+        void BinaryContextModel::select_buckets() noexcept
+        {
+            // One bucket per (context, nibble position): the partial byte seen
+            // so far is folded into the hash at bit 0 and again at bit 4.
+            for (size_t i = 0; i < buckets.size(); ++i)
+            {
+                uint64_t mixed = mix_context_hash(contexts.hash(i) + uint64_t(partial_byte) * GOLDEN_MULTIPLIER);
+                buckets[i] = table_offset + (i << (bits + 4)) + (static_cast<size_t>(mixed >> (64 - bits)) << 4);
+            }
+        }
+
+        int BinaryContextModel::predict() noexcept
+        {
+            size_t n = buckets.size();
+            const int32_t *w = &weights[partial_byte * (n + 1)];
+            int64_t dot = 0;
+            for (size_t i = 0; i < n; ++i)
+            {
+                slots[i] = buckets[i] + nibble_node;
+                inputs[i] = stretch(tables[slots[i]] >> 20);
+                dot += int64_t(inputs[i]) * w[i];
+            }
+            slots[n] = partial_byte;
+            inputs[n] = stretch(order0[partial_byte] >> 20);
+            dot += int64_t(inputs[n]) * w[n];
+            probability = std::min(4095, std::max(1, squash(static_cast<int>(dot >> MIXER_SHIFT))));
+            return probability;
+        }
+
+        // 65536 / (count + 1.5) for every count below the limit.
+        static const std::array<int32_t, COUNT_LIMIT + 1> ADAPT_RECIPROCALS = []
+        {
+            std::array<int32_t, COUNT_LIMIT + 1> reciprocals{};
+            for (uint32_t n = 0; n <= COUNT_LIMIT; ++n)
+                reciprocals[n] = static_cast<int32_t>(131072 / (2 * n + 3));
+            return reciprocals;
+        }();
+
+        static inline void adapt(uint32_t &entry, int bit) noexcept
+        {
+            uint32_t count = entry & 1023;
+            int64_t p = entry >> 10;
+            p += (((int64_t(bit) << 22) - p) * ADAPT_RECIPROCALS[count]) >> 16;
+            p = std::min<int64_t>(std::max<int64_t>(p, 0), (1 << 22) - 1);
+            entry = (static_cast<uint32_t>(p) << 10) | std::min(count + 1, COUNT_LIMIT);
+        }
+
+        void BinaryContextModel::update(int bit) noexcept
+        {
+            size_t n = buckets.size();
+            int32_t *w = &weights[partial_byte * (n + 1)];
+            int err = (bit << 12) - probability;
+            for (size_t i = 0; i <= n; ++i)
+            {
+                int32_t updated = w[i] + ((inputs[i] * err) >> MIXER_LEARNING_SHIFT);
+                w[i] = std::min(MIXER_WEIGHT_LIMIT, std::max(-MIXER_WEIGHT_LIMIT, updated));
+            }
+            for (size_t i = 0; i < n; ++i)
+                adapt(tables[slots[i]], bit);
+            adapt(order0[slots[n]], bit);
+
+            partial_byte = (partial_byte << 1) | bit;
+            nibble_node = (nibble_node << 1) | bit;
+            if (++bit_count == 8)
+            {
+                contexts.push(static_cast<Symbol>(partial_byte & 0xFF));
+                partial_byte = 1;
+                nibble_node = 1;
+                bit_count = 0;
+                select_buckets();
+            }
+            else if (bit_count == 4)
+            {
+                nibble_node = 1;
+                select_buckets();
+            }
+        }
+
+        void BinaryContextModel::learn(const Symbol *data, size_t size) noexcept
+        {
+            for (size_t n = 0; n < size; ++n)
+                for (int j = 7; j >= 0; --j)
+                {
+                    predict();
+                    update((data[n] >> j) & 1);
+                }
+        }
+
+        void BinaryContextModel::reset_history() noexcept
+        {
+            contexts.reset();
+            partial_byte = 1;
+            nibble_node = 1;
+            bit_count = 0;
+            probability = 2048;
+            select_buckets();
+        }
+
+        size_t BinaryContextModel::saved_size() const noexcept
+        {
+            return (buckets.size() * (size_t(16) << bits) + order0.size() + weights.size()) * sizeof(uint32_t);
+        }
+
+        void BinaryContextModel::save(std::vector<Symbol> &out) const
+        {
+            out.reserve(out.size() + saved_size());
+            auto put = [&](uint32_t value)
+            {
+                for (int i = 0; i < 4; ++i)
+                    out.push_back(static_cast<Symbol>((value >> (i * 8)) & 0xFF));
+            };
+            size_t table_words = buckets.size() * (size_t(16) << bits);
+            for (size_t i = 0; i < table_words; ++i)
+                put(tables[table_offset + i]);
+            for (uint32_t entry : order0)
+                put(entry);
+            for (int32_t weight : weights)
+                put(static_cast<uint32_t>(weight));
+        }
+
+        void BinaryContextModel::load(const Symbol *data, size_t size)
+        {
+            if (size != saved_size())
+                throw std::invalid_argument("Model statistics do not match the model shape.");
+            auto get = [&]()
+            {
+                uint32_t value = uint32_t(data[0]) | (uint32_t(data[1]) << 8) | (uint32_t(data[2]) << 16) |
+                                 (uint32_t(data[3]) << 24);
+                data += 4;
+                return value;
+            };
+            // Hit counts index the adaptation table, so they must be in range.
+            auto get_entry = [&]()
+            {
+                uint32_t entry = get();
+                if ((entry & 1023) > COUNT_LIMIT)
+                    throw std::invalid_argument("Model statistics are corrupt.");
+                return entry;
+            };
+            size_t table_words = buckets.size() * (size_t(16) << bits);
+            for (size_t i = 0; i < table_words; ++i)
+                tables[table_offset + i] = get_entry();
+            for (uint32_t &entry : order0)
+                entry = get_entry();
+            for (int32_t &weight : weights)
+            {
+                int32_t value = static_cast<int32_t>(get());
+                if (value > MIXER_WEIGHT_LIMIT || value < -MIXER_WEIGHT_LIMIT)
+                    throw std::invalid_argument("Model statistics are corrupt.");
+                weight = value;
+            }
+            reset_history();
+        }
+
+        unsigned table_bits_for(size_t memory_budget, size_t slot_bytes, uint64_t slots_wanted)
+        {
+            size_t budget_slots = memory_budget / std::max<size_t>(slot_bytes, 1);
+            unsigned budget_bits = MIN_TABLE_BITS;
+            while (budget_bits < MAX_TABLE_BITS && (size_t(2) << budget_bits) <= budget_slots)
+                budget_bits++;
+            unsigned size_bits = MIN_TABLE_BITS;
+            while (size_bits < budget_bits && (uint64_t(1) << (size_bits - 1)) < slots_wanted)
+                size_bits++;
+            return size_bits;
+        }
+
         // --- ArithmeticCoder Implementation ---
-        void ArithmeticCoder::write_bit(uint8_t bit) { bit_buffer.push_back(bit); }
+        // The coder keeps 32 bits of precision in 64-bit registers so that
+        // `range` (at most 2^32) and `range * probability` never overflow.
+        static const uint64_t TOP_VALUE = 0xFFFFFFFFULL;
+        static const uint64_t HALF = 1ULL << 31;
+        static const uint64_t FIRST_QUARTER = 1ULL << 30;
+        static const uint64_t THIRD_QUARTER = 3ULL << 30;
+
+        // Writes `bit` followed by the opposite bits deferred by underflow.
+        void ArithmeticCoder::write_bit(BitWriter &writer, uint8_t bit)
+        {
+            writer.write(bit);
+            for (; pending_bits > 0; --pending_bits)
+                writer.write(bit ^ 1);
+        }
 
-        void ArithmeticCoder::flush_encoder()
+        void ArithmeticCoder::flush_encoder(BitWriter &writer)
         {
             pending_bits++;
-            write_bit((low < (1ULL << 62)) ? 0 : 1);
-            for (uint64_t i = 0; i < pending_bits - 1; ++i)
+            write_bit(writer, (low < FIRST_QUARTER) ? 0 : 1);
+            writer.flush();
+        }
+
+        // Upper bound of the sub-interval ending at cumulative probability
+        // `cum_prob_high`, shared by encoder and decoder so both sides compute
+        // bit-identical intervals.
+        static inline uint64_t interval_high(uint64_t low, uint64_t high, uint64_t range, double cum_prob_high)
+        {
+            return std::min(high, low + static_cast<uint64_t>(range * cum_prob_high) - 1);
+        }
+
+        void ArithmeticCoder::encoder_renormalize(BitWriter &writer)
+        {
+            while (true)
+            {
+                if (high < HALF)
+                {
+                    write_bit(writer, 0);
+                }
+                else if (low >= HALF)
+                {
+                    write_bit(writer, 1);
+                    low -= HALF;
+                    high -= HALF;
+                }
+                else if (low >= FIRST_QUARTER && high < THIRD_QUARTER)
+                {
+                    pending_bits++;
+                    low -= FIRST_QUARTER;
+                    high -= FIRST_QUARTER;
+                }
+                else
+                {
+                    break;
+                }
+                low <<= 1;
+                high <<= 1;
+                high |= 1;
+            }
+        }
+
+        void ArithmeticCoder::decoder_renormalize(BitReader &reader)
+        {
+            while (true)
             {
-                write_bit(~((low < (1ULL << 62)) ? 0 : 1) & 1);
+                if (high < HALF)
+                {
+                }
+                else if (low >= HALF)
+                {
+                    low -= HALF;
+                    high -= HALF;
+                    code_value -= HALF;
+                }
+                else if (low >= FIRST_QUARTER && high < THIRD_QUARTER)
+                {
+                    low -= FIRST_QUARTER;
+                    high -= FIRST_QUARTER;
+                    code_value -= FIRST_QUARTER;
+                }
+                else
+                {
+                    break;
+                }
+                low <<= 1;
+                high <<= 1;
+                high |= 1;
+                code_value <<= 1;
+                code_value |= reader.read();
             }
         }
 
-        uint8_t ArithmeticCoder::read_bit()
+        // Cumulative frequency below `symbol`: the escape floor of every
+        // smaller symbol plus the extra frequency of predicted ones.
+        static inline uint64_t cumulative_frequency(const SymbolFrequencies &frequencies, Symbol symbol) noexcept
         {
-            if (bit_idx >= input_buffer_ptr->size() * 8)
-                return 0;
-            size_t byte_pos = bit_idx / 8;
-            size_t bit_pos_in_byte = 7 - (bit_idx % 8);
-            bit_idx++;
-            return ((*input_buffer_ptr)[byte_pos] >> bit_pos_in_byte) & 1;
+            uint64_t cumulative = uint64_t(frequencies.base) * symbol;
+            for (size_t k = 0; k < frequencies.count; ++k)
+            {
+                if (frequencies.symbols[k] < symbol)
+                    cumulative += frequencies.extra[frequencies.symbols[k]];
+            }
+            return cumulative;
         }
 
-        std::vector<Symbol> ArithmeticCoder::encode(const std::vector<Symbol> &data)
+        // Finds the symbol whose frequency range contains `target` and stores
+        // the cumulative frequency below it in `cumulative`.
+        static inline Symbol find_symbol(SymbolFrequencies &frequencies, uint64_t target, uint64_t &cumulative)
+        {
+            std::sort(frequencies.symbols.begin(), frequencies.symbols.begin() + frequencies.count);
+            const uint64_t base = frequencies.base;
+            uint64_t below = 0;
+            size_t next = 0; // first symbol not yet passed
+            for (size_t k = 0; k < frequencies.count; ++k)
+            {
+                Symbol s = frequencies.symbols[k];
+                uint64_t gap = base * (s - next);
+                if (target < below + gap)
+                    break;
+                below += gap;
+                uint64_t width = base + frequencies.extra[s];
+                if (target < below + width)
+                {
+                    cumulative = below;
+                    return s;
+                }
+                below += width;
+                next = size_t(s) + 1;
+            }
+            // Inside a run of symbols that only carry the escape floor.
+            size_t s = std::min<size_t>(255, next + (target - below) / base);
+            cumulative = below + base * (s - next);
+            return static_cast<Symbol>(s);
+        }
+
+        void ArithmeticCoder::encode(const Symbol *data, size_t size, std::vector<Symbol> &out)
         {
-            static const uint64_t TOP_VALUE = ~0ULL;
-            static const uint64_t HALF = 1ULL << 63;
-            static const uint64_t FIRST_QUARTER = 1ULL << 62;
-            static const uint64_t THIRD_QUARTER = 3ULL << 62;
             low = 0;
             high = TOP_VALUE;
             pending_bits = 0;
-            bit_buffer.clear();
-            FibonacciContextModel model;
-            for (Symbol symbol : data)
+            BitWriter writer(out);
+            FibonacciContextModel model(orders, table_bits);
+            SymbolFrequencies frequencies;
+            for (size_t n = 0; n < size; ++n)
             {
+                Symbol symbol = data[n];
                 uint64_t range = high - low + 1;
-                std::vector<double> probabilities = model.get_probabilities();
-                double cum_prob_low = 0.0;
-                for (int i = 0; i < symbol; ++i)
-                    cum_prob_low += probabilities[i];
-                high = low + static_cast<uint64_t>(range * (cum_prob_low + probabilities[symbol])) - 1;
-                low = low + static_cast<uint64_t>(range * cum_prob_low);
-                while (true)
-                {
-                    if (high < HALF)
-                    {
-                        write_bit(0);
-                        while (pending_bits > 0)
-                        {
-                            write_bit(1);
-                            pending_bits--;
-                        }
-                    }
-                    else if (low >= HALF)
-                    {
-                        write_bit(1);
-                        while (pending_bits > 0)
-                        {
-                            write_bit(0);
-                            pending_bits--;
-                        }
-                        low -= HALF;
-                        high -= HALF;
-                    }
-                    else if (low >= FIRST_QUARTER && high < THIRD_QUARTER)
-                    {
-                        pending_bits++;
-                        low -= FIRST_QUARTER;
-                        high -= FIRST_QUARTER;
-                    }
-                    else
-                    {
-                        break;
-                    }
-                    low <<= 1;
-                    high <<= 1;
-                    high |= 1;
+                if (fixed_point)
+                {
+                    model.get_frequencies(frequencies);
+                    uint64_t cum_low = cumulative_frequency(frequencies, symbol);
+                    uint64_t cum_high = cum_low + frequencies.base + frequencies.extra[symbol];
+                    high = low + range * cum_high / frequencies.total - 1;
+                    low = low + range * cum_low / frequencies.total;
                 }
-                model.update(symbol);
-            }
-            flush_encoder();
-            std::vector<Symbol> byte_output;
-            byte_output.reserve(bit_buffer.size() / 8 + 1);
-            for (size_t i = 0; i < bit_buffer.size(); i += 8)
-            {
-                Symbol byte = 0;
-                for (size_t j = 0; j < 8; ++j)
+                else
                 {
-                    byte <<= 1;
-                    if (i + j < bit_buffer.size())
-                        byte |= bit_buffer[i + j];
+                    std::vector<double> probabilities = model.get_probabilities();
+                    double cum_prob_low = 0.0;
+                    for (int i = 0; i < symbol; ++i)
+                        cum_prob_low += probabilities[i];
+                    high = interval_high(low, high, range, cum_prob_low + probabilities[symbol]);
+                    low = low + static_cast<uint64_t>(range * cum_prob_low);
                 }
-                byte_output.push_back(byte);
+                encoder_renormalize(writer);
+                model.update(symbol);
             }
-            return byte_output;
+            flush_encoder(writer);
         }
 
-        std::vector<Symbol> ArithmeticCoder::decode(const std::vector<Symbol> &compressed_data, size_t original_size)
+        void ArithmeticCoder::decode(const Symbol *compressed_data, size_t compressed_size, Symbol *out,
+                                     size_t original_size)
         {
             if (original_size == 0)
-                return {};
-            static const uint64_t TOP_VALUE = ~0ULL;
-            static const uint64_t HALF = 1ULL << 63;
-            static const uint64_t FIRST_QUARTER = 1ULL << 62;
-            static const uint64_t THIRD_QUARTER = 3ULL << 62;
-            input_buffer_ptr = &compressed_data;
-            bit_idx = 0;
+                return;
+            BitReader reader(compressed_data, compressed_size);
             code_value = 0;
-            for (size_t i = 0; i < 64; ++i)
-                code_value = (code_value << 1) | read_bit();
+            for (size_t i = 0; i < 32; ++i)
+                code_value = (code_value << 1) | reader.read();
             low = 0;
             high = TOP_VALUE;
-            FibonacciContextModel model;
-            std::vector<Symbol> output_data;
-            output_data.reserve(original_size);
+            FibonacciContextModel model(orders, table_bits);
+            SymbolFrequencies frequencies;
             for (size_t i = 0; i < original_size; ++i)
             {
                 uint64_t range = high - low + 1;
-                std::vector<double> probabilities = model.get_probabilities();
-                uint64_t total_freq = 1ULL << 32;
-                uint64_t scaled_value = ((code_value - low + 1) * total_freq - 1) / range;
-                double cum_prob = 0.0;
                 Symbol decoded_symbol = 255;
-                for (size_t s = 0; s < 256; ++s)
+                if (fixed_point)
                 {
-                    cum_prob += probabilities[s];
-                    if (scaled_value < static_cast<uint64_t>(cum_prob * total_freq))
-                    {
-                        decoded_symbol = static_cast<Symbol>(s);
-                        break;
-                    }
+                    model.get_frequencies(frequencies);
+                    uint64_t target = ((code_value - low + 1) * frequencies.total - 1) / range;
+                    uint64_t cum_low = 0;
+                    decoded_symbol = find_symbol(frequencies, target, cum_low);
+                    uint64_t cum_high = cum_low + frequencies.base + frequencies.extra[decoded_symbol];
+                    high = low + range * cum_high / frequencies.total - 1;
+                    low = low + range * cum_low / frequencies.total;
                 }
-                output_data.push_back(decoded_symbol);
-                double cum_prob_low = 0.0;
-                for (int k = 0; k < decoded_symbol; ++k)
-                    cum_prob_low += probabilities[k];
-                high = low + static_cast<uint64_t>(range * (cum_prob_low + probabilities[decoded_symbol])) - 1;
-                low = low + static_cast<uint64_t>(range * cum_prob_low);
-                while (true)
+                else
                 {
-                    if (high < HALF)
-                    {
-                    }
-                    else if (low >= HALF)
+                    std::vector<double> probabilities = model.get_probabilities();
+                    // Walk the same cumulative sums the encoder used until the
+                    // sub-interval containing code_value is found.
+                    double cum_prob_low = 0.0;
+                    for (size_t s = 0; s < 255; ++s)
                     {
-                        low -= HALF;
-                        high -= HALF;
-                        code_value -= HALF;
+                        if (code_value <= interval_high(low, high, range, cum_prob_low + probabilities[s]))
+                        {
+                            decoded_symbol = static_cast<Symbol>(s);
+                            break;
+                        }
+                        cum_prob_low += probabilities[s];
                     }
-                    else if (low >= FIRST_QUARTER && high < THIRD_QUARTER)
+                    high = interval_high(low, high, range, cum_prob_low + probabilities[decoded_symbol]);
+                    low = low + static_cast<uint64_t>(range * cum_prob_low);
+                }
+                out[i] = decoded_symbol;
+                decoder_renormalize(reader);
+                model.update(decoded_symbol);
+            }
+        }
+
+        // --- BinaryArithmeticCoder Implementation ---
+        // Bytes a coded block may be read past its end; see decode().
+        static const size_t MAX_DECODER_OVERRUN = 4;
+
+        // Carry-less binary arithmetic coder over a 32-bit interval that emits
+        // whole bytes as soon as the top byte of the interval is settled.
+        void BinaryArithmeticCoder::encode(const Symbol *data, size_t size, std::vector<Symbol> &output)
+        {
+            uint32_t x1 = 0, x2 = 0xFFFFFFFF;
+            for (size_t n = 0; n < size; ++n)
+            {
+                Symbol symbol = data[n];
+                for (int j = 7; j >= 0; --j)
+                {
+                    int bit = (symbol >> j) & 1;
+                    uint32_t xmid = x1 + ((x2 - x1) >> 12) * static_cast<uint32_t>(model.predict());
+                    if (bit)
+                        x2 = xmid;
+                    else
+                        x1 = xmid + 1;
+                    model.update(bit);
+                    while (((x1 ^ x2) & 0xFF000000) == 0)
                     {
-                        low -= FIRST_QUARTER;
-                        high -= FIRST_QUARTER;
-                        code_value -= FIRST_QUARTER;
+                        output.push_back(static_cast<Symbol>(x2 >> 24));
+                        x1 <<= 8;
+                        x2 = (x2 << 8) | 255;
                     }
+                }
+            }
+            // Any value whose top byte lies strictly above x1's identifies the
+            // final interval; the decoder pads the stream with zero bytes.
+            output.push_back(static_cast<Symbol>((x1 >> 24) + 1));
+        }
+
+        void BinaryArithmeticCoder::decode(const Symbol *compressed_data, size_t compressed_size, Symbol *out,
+                                           size_t original_size)
+        {
+            if (original_size == 0)
+                return;
+            // The decoder looks four bytes ahead of the encoder, which ends on
+            // one byte, so a valid block is read at most three bytes past its
+            // end. Reading further means the block is truncated or its
+            // declared length is inflated; stop instead of decoding zeros.
+            size_t pos = 0;
+            auto next_byte = [&]() -> uint32_t
+            {
+                if (pos < compressed_size)
+                    return compressed_data[pos++];
+                if (++pos > compressed_size + MAX_DECODER_OVERRUN)
+                    throw std::runtime_error("Invalid PhiComp data: truncated block data.");
+                return 0;
+            };
+            uint32_t x1 = 0, x2 = 0xFFFFFFFF, x = 0;
+            for (int i = 0; i < 4; ++i)
+                x = (x << 8) | next_byte();
+            for (size_t i = 0; i < original_size; ++i)
+            {
+                uint32_t symbol = 0;
+                for (int j = 0; j < 8; ++j)
+                {
+                    uint32_t xmid = x1 + ((x2 - x1) >> 12) * static_cast<uint32_t>(model.predict());
+                    int bit = x <= xmid;
+                    if (bit)
+                        x2 = xmid;
                     else
+                        x1 = xmid + 1;
+                    model.update(bit);
+                    symbol = (symbol << 1) | bit;
+                    while (((x1 ^ x2) & 0xFF000000) == 0)
                     {
-                        break;
+                        x1 <<= 8;
+                        x2 = (x2 << 8) | 255;
+                        x = (x << 8) | next_byte();
                     }
-                    low <<= 1;
-                    high <<= 1;
-                    high |= 1;
-                    code_value <<= 1;
-                    code_value |= read_bit();
                 }
-                model.update(decoded_symbol);
+                out[i] = static_cast<Symbol>(symbol);
             }
-            return output_data;
         }
 
-        // --- Internal C++ API Functions ---
-        std::vector<Symbol> compress_internal(const std::vector<Symbol> &data)
+        // --- Stream Header ---
+        // Version 1 predates the hashed context tables; only its empty
+        // stream, whose body is never read, can still be decoded.
+        static const uint8_t LEGACY_FORMAT_VERSION = 1;
+        static const uint8_t MIN_FORMAT_VERSION = 2;
+        static const uint8_t MAX_FORMAT_VERSION = 6;
+        static const uint8_t BLOCK_FORMAT_VERSION = 4;
+        static const uint8_t STREAM_FORMAT_VERSION = 5;
+        static const uint8_t SEEKABLE_FORMAT_VERSION = 6;
+        // Block size, block count, original size, footer size and magic.
+        static const size_t MIN_FOOTER_SIZE = 24;
+        static const size_t FRAME_HEADER_SIZE = 8;
+        static const size_t PREFIX_SIZE = 15;
+
+        static void put_u32(std::vector<Symbol> &out, uint32_t value)
         {
-            ArithmeticCoder coder;
-            return coder.encode(data);
+            for (int i = 0; i < 4; ++i)
+                out.push_back(static_cast<Symbol>((value >> (i * 8)) & 0xFF));
         }
 
-        std::vector<Symbol> decompress_internal(const std::vector<Symbol> &data, uint64_t original_size)
+        static uint32_t get_u32(const Symbol *data)
         {
-            ArithmeticCoder coder;
-            auto decompressed_data = coder.decode(data, original_size);
-            if (decompressed_data.size() != original_size)
-            {
-                throw std::runtime_error("Decompression failed: size mismatch.");
-            }
-            return decompressed_data;
+            return uint32_t(data[0]) | (uint32_t(data[1]) << 8) | (uint32_t(data[2]) << 16) | (uint32_t(data[3]) << 24);
         }
 
-    } // namespace core
-} // namespace phicomp
+        // --- Dictionary Implementation ---
+        static const uint8_t DICTIONARY_FORMAT_VERSION = 1;
+
+        // FNV-1a over the serialised statistics, folded to 32 bits; 0 is
+        // reserved for "no dictionary".
+        static uint32_t dictionary_hash(const Symbol *data, size_t size)
+        {
+            uint64_t hash = 0xCBF29CE484222325ULL;
+            for (size_t i = 0; i < size; ++i)
+                hash = (hash ^ data[i]) * 0x100000001B3ULL;
+            uint32_t folded = static_cast<uint32_t>(hash ^ (hash >> 32));
+            return folded != 0 ? folded : 1;
+        }
+
+        // Order sets must be usable by ContextHasher and fit the header.
+        static void check_orders(const std::vector<size_t> &orders)
+        {
+            if (orders.empty() || orders.size() > MAX_CONTEXT_ORDERS)
+                throw std::invalid_argument("Between 1 and " + std::to_string(MAX_CONTEXT_ORDERS) +
+                                            " context orders are required.");
+            for (size_t i = 0; i < orders.size(); ++i)
+                if (orders[i] == 0 || orders[i] > MAX_CONTEXT_ORDER || (i > 0 && orders[i] <= orders[i - 1]))
+                    throw std::invalid_argument("Context orders must be ascending and between 1 and " +
+                                                std::to_string(MAX_CONTEXT_ORDER) + ".");
+        }
+
+        Dictionary Dictionary::train(const std::vector<std::pair<const Symbol *, size_t>> &samples,
+                                     size_t memory_budget, const std::vector<size_t> &orders)
+        {
+            check_orders(orders);
+            uint64_t total = 0;
+            for (const auto &sample : samples)
+                total += sample.second;
+            if (total == 0)
+                throw std::invalid_argument("Dictionary training needs non-empty samples.");
+            unsigned table_bits = table_bits_for(memory_budget, orders.size() * 64, total * 2);
+            Dictionary dictionary(BinaryContextModel(orders, table_bits));
+            // Every sample is learned as a separate message, the way the
+            // dictionary will be used.
+            for (const auto &sample : samples)
+            {
+                dictionary.trained.reset_history();
+                dictionary.trained.learn(sample.first, sample.second);
+            }
+            dictionary.trained.reset_history();
+            std::vector<Symbol> statistics;
+            dictionary.trained.save(statistics);
+            dictionary.dictionary_id = dictionary_hash(statistics.data(), statistics.size());
+            return dictionary;
+        }
+
+        Dictionary Dictionary::load(const Symbol *data, size_t size)
+        {
+            if (size < 7 || data[0] != 'P' || data[1] != 'H' || data[2] != 'I' || data[3] != 'D')
+                throw std::invalid_argument("Invalid PhiComp dictionary: magic number mismatch.");
+            if (data[4] != DICTIONARY_FORMAT_VERSION)
+                throw std::invalid_argument("Invalid PhiComp dictionary: unsupported format version.");
+            unsigned table_bits = data[5];
+            size_t order_count = data[6];
+            if (table_bits < MIN_TABLE_BITS || table_bits > MAX_TABLE_BITS || size < 7 + order_count + 4)
+                throw std::invalid_argument("Invalid PhiComp dictionary: malformed header.");
+            std::vector<size_t> orders(data + 7, data + 7 + order_count);
+            check_orders(orders);
+            const Symbol *statistics = data + 7 + order_count + 4;
+            size_t statistics_size = size - (7 + order_count + 4);
+            Dictionary dictionary(BinaryContextModel(orders, table_bits));
+            dictionary.trained.load(statistics, statistics_size);
+            dictionary.dictionary_id = get_u32(data + 7 + order_count);
+            if (dictionary.dictionary_id != dictionary_hash(statistics, statistics_size))
+                throw std::invalid_argument("Invalid PhiComp dictionary: checksum mismatch.");
+            return dictionary;
+        }
+
+        std::vector<Symbol> Dictionary::serialize() const
+        {
+            std::vector<Symbol> out{'P', 'H', 'I', 'D', DICTIONARY_FORMAT_VERSION,
+                                    static_cast<Symbol>(trained.table_bits()),
+                                    static_cast<Symbol>(trained.orders().size())};
+            for (size_t order : trained.orders())
+                out.push_back(static_cast<Symbol>(order));
+            put_u32(out, dictionary_id);
+            trained.save(out);
+            return out;
+        }
+
+        void check_dictionary(const StreamHeader &header, const Dictionary *dictionary)
+        {
+            if (header.dictionary_id == 0)
+                return;
+            if (dictionary == nullptr)
+                throw std::invalid_argument("Stream was compressed with dictionary " +
+                                            std::to_string(header.dictionary_id) + "; pass it to decompress.");
+            if (dictionary->id() != header.dictionary_id || dictionary->model().table_bits() != header.table_bits ||
+                dictionary->model().orders() != header.orders)
+                throw std::invalid_argument("Stream was compressed with dictionary " +
+                                            std::to_string(header.dictionary_id) + ", not " +
+                                            std::to_string(dictionary->id()) + ".");
+        }
+
+        // Length of the fixed header fields given the first `size` >= PREFIX_SIZE
+        // bytes; larger than `size` while more bytes are needed to tell.
+        static size_t header_prefix_size(const Symbol *data, size_t size)
+        {
+            size_t length = PREFIX_SIZE + ((data[5] & DICTIONARY_FLAG) ? 4 : 0) + ((data[5] & FRAME_SIZE_FLAG) ? 4 : 0);
+            if (data[5] & ORDERS_FLAG)
+                length = size > length ? length + 1 + data[length] : length + 1;
+            return length;
+        }
+
+        StreamHeader make_header(const CompressOptions &options, uint64_t original_size)
+        {
+            if (options.block_size > MAX_BLOCK_SIZE)
+                throw std::invalid_argument("Block size exceeds the 1 GiB limit.");
+            StreamHeader header;
+            header.method = options.method;
+            header.original_size = original_size;
+            header.dictionary_id = 0;
+            header.orders = options.dictionary ? options.dictionary->model().orders() : options.orders;
+            check_orders(header.orders);
+            header.block_size = 0;
+            header.body_offset = 0;
+            bool blocked = options.block_size > 0 && original_size > options.block_size;
+            uint64_t model_size = blocked ? options.block_size : original_size;
+            if (options.method == CodingMethod::Binary)
+            {
+                // Two 64-byte probability buckets (one per nibble) per byte and order.
+                header.version = 3;
+                header.table_bits = table_bits_for(options.memory_budget, header.orders.size() * 64, model_size * 2);
+            }
+            else if (options.method == CodingMethod::Arithmetic || options.method == CodingMethod::FixedPoint)
+            {
+                header.version = 2;
+                header.table_bits = table_bits_for(options.memory_budget, header.orders.size() * sizeof(ContextSlot),
+                                                   model_size);
+            }
+            else
+            {
+                throw std::invalid_argument("Unknown coding method.");
+            }
+            if (options.dictionary != nullptr)
+            {
+                if (options.method != CodingMethod::Binary)
+                    throw std::invalid_argument("Dictionaries require the binary coding method.");
+                header.table_bits = options.dictionary->model().table_bits();
+                header.dictionary_id = options.dictionary->id();
+            }
+            if (blocked)
+            {
+                header.version = BLOCK_FORMAT_VERSION;
+                header.block_size = static_cast<uint32_t>(options.block_size);
+                header.block_lengths.assign((original_size + options.block_size - 1) / options.block_size, 0);
+            }
+            return header;
+        }
+
+        void write_header(const StreamHeader &header, std::vector<Symbol> &out)
+        {
+            out.insert(out.end(), {'P', 'H', 'I', 'C'});
+            out.push_back(header.version);
+            bool custom_orders = header.orders != default_orders();
+            out.push_back(static_cast<Symbol>(static_cast<uint8_t>(header.method) |
+                                              (header.dictionary_id != 0 ? DICTIONARY_FLAG : 0) |
+                                              (custom_orders ? ORDERS_FLAG : 0) |
+                                              (header.block_types ? BLOCK_TYPES_FLAG : 0) |
+                                              (header.version == STREAM_FORMAT_VERSION && header.block_size
+                                                   ? FRAME_SIZE_FLAG : 0)));
+            for (int i = 0; i < 8; ++i)
+                out.push_back(static_cast<Symbol>((header.original_size >> (i * 8)) & 0xFF));
+            out.push_back(static_cast<Symbol>(header.table_bits));
+            if (header.dictionary_id != 0)
+                put_u32(out, header.dictionary_id);
+            if (header.version == STREAM_FORMAT_VERSION && header.block_size)
+                put_u32(out, header.block_size);
+            if (custom_orders)
+            {
+                out.push_back(static_cast<Symbol>(header.orders.size()));
+                for (size_t order : header.orders)
+                    out.push_back(static_cast<Symbol>(order));
+            }
+            if (header.version == BLOCK_FORMAT_VERSION)
+            {
+                put_u32(out, header.block_size);
+                put_u32(out, static_cast<uint32_t>(header.block_lengths.size()));
+                for (uint32_t length : header.block_lengths)
+                    put_u32(out, length);
+            }
+        }
+
+        // Reads block size | block count | coded length of each block at `index`
+        // and checks them against the original size and the `body_size`
+        // bytes available for the blocks.
+        static void read_block_index(const Symbol *index, StreamHeader &header, size_t body_size)
+        {
+            header.block_size = get_u32(index);
+            uint64_t count = get_u32(index + 4);
+            if (header.block_size == 0 || header.block_size > MAX_BLOCK_SIZE || header.original_size == UNKNOWN_SIZE ||
+                count != (header.original_size + header.block_size - 1) / header.block_size)
+                throw std::runtime_error("Invalid PhiComp data: inconsistent block index.");
+            header.block_lengths.resize(count);
+            uint64_t total = 0;
+            for (size_t i = 0; i < count; ++i)
+            {
+                header.block_lengths[i] = get_u32(index + 8 + i * 4);
+                total += header.block_lengths[i];
+            }
+            if (total > body_size)
+                throw std::runtime_error("Invalid PhiComp data: truncated block data.");
+        }
+
+        // "PHIC" | 1 | 1 | original size (8) | body, as written before
+        // version 2. Only zero-length streams are accepted.
+        static StreamHeader read_legacy_header(const Symbol *data, size_t size)
+        {
+            StreamHeader header;
+            header.version = LEGACY_FORMAT_VERSION;
+            header.method = CodingMethod::Arithmetic;
+            header.original_size = 0;
+            for (int i = 0; i < 8; ++i)
+                header.original_size |= static_cast<uint64_t>(data[6 + i]) << (i * 8);
+            if (data[5] != 1 || header.original_size != 0)
+                throw std::runtime_error("Invalid PhiComp data: unsupported format version.");
+            header.table_bits = MIN_TABLE_BITS;
+            header.block_size = 0;
+            header.dictionary_id = 0;
+            header.orders = default_orders();
+            header.body_offset = size;
+            return header;
+        }
+
+        StreamHeader read_header(const Symbol *data, size_t size)
+        {
+            if (size < 14)
+                throw std::runtime_error("Invalid PhiComp data: header too short.");
+            if (data[0] != 'P' || data[1] != 'H' || data[2] != 'I' || data[3] != 'C')
+                throw std::runtime_error("Invalid PhiComp data: magic number mismatch.");
+            StreamHeader header;
+            header.version = data[4];
+            if (header.version == LEGACY_FORMAT_VERSION)
+                return read_legacy_header(data, size);
+            if (header.version < MIN_FORMAT_VERSION || header.version > MAX_FORMAT_VERSION)
+                throw std::runtime_error("Invalid PhiComp data: unsupported format version.");
+            if (size < PREFIX_SIZE)
+                throw std::runtime_error("Invalid PhiComp data: header too short.");
+            header.method = static_cast<CodingMethod>(data[5] & ~(DICTIONARY_FLAG | ORDERS_FLAG | BLOCK_TYPES_FLAG |
+                                                                  FRAME_SIZE_FLAG));
+            header.block_types = (data[5] & BLOCK_TYPES_FLAG) != 0;
+            if (header.method != CodingMethod::Arithmetic && header.method != CodingMethod::Binary &&
+                header.method != CodingMethod::FixedPoint)
+                throw std::runtime_error("Invalid PhiComp data: unknown coding method.");
+            if ((data[5] & DICTIONARY_FLAG) && header.method != CodingMethod::Binary)
+                throw std::runtime_error("Invalid PhiComp data: malformed stream header.");
+            if ((data[5] & FRAME_SIZE_FLAG) && header.version != STREAM_FORMAT_VERSION)
+                throw std::runtime_error("Invalid PhiComp data: malformed stream header.");
+            header.original_size = 0;
+            for (int i = 0; i < 8; ++i)
+                header.original_size |= static_cast<uint64_t>(data[6 + i]) << (i * 8);
+            header.table_bits = data[14];
+            if (header.table_bits < MIN_TABLE_BITS || header.table_bits > MAX_TABLE_BITS)
+                throw std::runtime_error("Invalid PhiComp data: context table size out of range.");
+            header.block_size = 0;
+            header.dictionary_id = 0;
+            header.orders = default_orders();
+            header.body_offset = header_prefix_size(data, size);
+            if (size < header.body_offset)
+                throw std::runtime_error("Invalid PhiComp data: header too short.");
+            size_t field = PREFIX_SIZE;
+            if (data[5] & DICTIONARY_FLAG)
+            {
+                header.dictionary_id = get_u32(data + field);
+                if (header.dictionary_id == 0)
+                    throw std::runtime_error("Invalid PhiComp data: malformed stream header.");
+                field += 4;
+            }
+            if (data[5] & FRAME_SIZE_FLAG)
+            {
+                header.block_size = get_u32(data + field);
+                if (header.block_size == 0 || header.block_size > MAX_BLOCK_SIZE)
+                    throw std::runtime_error("Invalid PhiComp data: malformed stream header.");
+                field += 4;
+            }
+            if (data[5] & ORDERS_FLAG)
+            {
+                header.orders.assign(data + field + 1, data + header.body_offset);
+                try
+                {
+                    check_orders(header.orders);
+                }
+                catch (const std::invalid_argument &)
+                {
+                    throw std::runtime_error("Invalid PhiComp data: malformed context orders.");
+                }
+            }
+            if (header.version == STREAM_FORMAT_VERSION &&
+                (header.method != CodingMethod::Binary || header.original_size != UNKNOWN_SIZE))
+                throw std::runtime_error("Invalid PhiComp data: malformed stream header.");
+            if (header.version == BLOCK_FORMAT_VERSION)
+            {
+                size_t index_offset = header.body_offset;
+                if (size < index_offset + 8)
+                    throw std::runtime_error("Invalid PhiComp data: header too short.");
+                uint64_t count = get_u32(data + index_offset + 4);
+                header.body_offset = index_offset + 8 + count * 4;
+                if (size < header.body_offset)
+                    throw std::runtime_error("Invalid PhiComp data: header too short.");
+                read_block_index(data + index_offset, header, size - header.body_offset);
+            }
+            else if (header.version == SEEKABLE_FORMAT_VERSION)
+            {
+                // The index sits in a footer that ends the stream.
+                if (header.method != CodingMethod::Binary || header.original_size != UNKNOWN_SIZE)
+                    throw std::runtime_error("Invalid PhiComp data: malformed stream header.");
+                if (size < header.body_offset + MIN_FOOTER_SIZE || std::memcmp(data + size - 4, "PHIX", 4) != 0)
+                    throw std::runtime_error("Invalid PhiComp data: missing seekable index.");
+                uint64_t footer_size = get_u32(data + size - 8);
+                if (footer_size < MIN_FOOTER_SIZE || footer_size > size - header.body_offset)
+                    throw std::runtime_error("Invalid PhiComp data: malformed seekable index.");
+                const Symbol *footer = data + size - footer_size;
+                uint64_t count = get_u32(footer + 4);
+                if (footer_size != MIN_FOOTER_SIZE + count * 4)
+                    throw std::runtime_error("Invalid PhiComp data: malformed seekable index.");
+                header.original_size = 0;
+                for (int i = 0; i < 8; ++i)
+                    header.original_size |= static_cast<uint64_t>(footer[8 + count * 4 + i]) << (i * 8);
+                read_block_index(footer, header, size - footer_size - header.body_offset);
+            }
+            return header;
+        }
+
+        // --- Block Fast Paths ---
+        // Blocks below this size always go through the model: it is cheap for
+        // them, and small messages keep the plain format.
+        static const size_t MIN_FAST_PATH_SIZE = 4096;
+        // Shortest run of one byte value that gets its own token.
+        static const size_t MIN_RUN_LENGTH = 32;
+        // Literal bytes trial-coded to confirm they are incompressible.
+        static const size_t TRIAL_SIZE = 16 << 10;
+        static const unsigned TRIAL_TABLE_BITS = 12;
+
+        struct ByteRun
+        {
+            size_t offset;
+            size_t length;
+            Symbol value;
+        };
+
+        struct BlockPlan
+        {
+            BlockType type = BlockType::Modelled;
+            // How the bytes outside runs are coded (Runs only).
+            BlockType literals = BlockType::Modelled;
+            std::vector<ByteRun> runs;
+            std::vector<Symbol> literal_bytes;
+        };
+
+        static void put_varint(std::vector<Symbol> &out, uint64_t value)
+        {
+            while (value >= 0x80)
+            {
+                out.push_back(static_cast<Symbol>(value | 0x80));
+                value >>= 7;
+            }
+            out.push_back(static_cast<Symbol>(value));
+        }
+
+        static uint64_t get_varint(const Symbol *data, size_t size, size_t &pos)
+        {
+            uint64_t value = 0;
+            for (unsigned shift = 0; shift < 64; shift += 7)
+            {
+                if (pos >= size)
+                    throw std::runtime_error("Invalid PhiComp data: truncated block.");
+                Symbol byte = data[pos++];
+                value |= static_cast<uint64_t>(byte & 0x7F) << shift;
+                if (!(byte & 0x80))
+                    return value;
+            }
+            throw std::runtime_error("Invalid PhiComp data: malformed block.");
+        }
+
+        // True when the model is not expected to shrink `data`: its histogram
+        // is close to flat and a trial coding of a sample saves under 3%.
+        // Integer-only, so every platform makes the same decision.
+        static bool looks_incompressible(const Symbol *data, size_t size, const std::vector<size_t> &orders)
+        {
+            // Up to four slices spread over the data, so a compressible header
+            // or trailer does not decide for the whole block.
+            std::vector<Symbol> sample;
+            if (size <= TRIAL_SIZE)
+            {
+                sample.assign(data, data + size);
+            }
+            else
+            {
+                const size_t slice = TRIAL_SIZE / 4;
+                for (size_t k = 0; k < 4; ++k)
+                {
+                    const Symbol *start = data + k * (size - slice) / 3;
+                    sample.insert(sample.end(), start, start + slice);
+                }
+            }
+            std::array<uint64_t, 256> histogram{};
+            for (Symbol s : sample)
+                histogram[s]++;
+            // A flat histogram has sum(c^2) close to n^2 / 256 + n.
+            uint64_t n = sample.size(), squares = 0;
+            for (uint64_t count : histogram)
+                squares += count * count;
+            if (squares * 256 > n * n / 4 * 5 + 512 * n)
+                return false;
+            BinaryArithmeticCoder trial(TRIAL_TABLE_BITS, orders);
+            std::vector<Symbol> coded;
+            trial.encode(sample.data(), sample.size(), coded);
+            return coded.size() * 32 >= n * 31;
+        }
+
+        // Picks the coding for one block. Incompressible bytes are stored raw,
+        // with runs of one byte value split out as tokens. Compressible bytes
+        // stay with the model, which codes runs almost for free, unless runs
+        // cover nearly the whole block and skipping them saves most of the time.
+        static BlockPlan plan_block(const Symbol *data, size_t size, const std::vector<size_t> &orders)
+        {
+            BlockPlan plan;
+            if (size < MIN_FAST_PATH_SIZE)
+                return plan;
+            size_t run_bytes = 0;
+            for (size_t i = 0; i < size;)
+            {
+                size_t j = i + 1;
+                while (j < size && data[j] == data[i])
+                    ++j;
+                if (j - i >= MIN_RUN_LENGTH)
+                {
+                    plan.runs.push_back({i, j - i, data[i]});
+                    run_bytes += j - i;
+                }
+                i = j;
+            }
+            if (plan.runs.empty())
+            {
+                plan.type = looks_incompressible(data, size, orders) ? BlockType::Stored : BlockType::Modelled;
+                return plan;
+            }
+            plan.literal_bytes.reserve(size - run_bytes);
+            size_t pos = 0;
+            for (const ByteRun &run : plan.runs)
+            {
+                plan.literal_bytes.insert(plan.literal_bytes.end(), data + pos, data + run.offset);
+                pos = run.offset + run.length;
+            }
+            plan.literal_bytes.insert(plan.literal_bytes.end(), data + pos, data + size);
+            if (plan.literal_bytes.empty() ||
+                looks_incompressible(plan.literal_bytes.data(), plan.literal_bytes.size(), orders))
+            {
+                plan.type = BlockType::Runs;
+                plan.literals = BlockType::Stored;
+            }
+            else if (run_bytes >= size - size / 8)
+            {
+                plan.type = BlockType::Runs;
+                plan.literals = BlockType::Modelled;
+            }
+            else
+            {
+                plan.runs.clear();
+                plan.literal_bytes.clear();
+            }
+            return plan;
+        }
+
+        // Appends the block type byte and the block coded as planned;
+        // encode_modelled(data, size, out) codes bytes with the model.
+        template <typename Encode>
+        static void encode_block(const BlockPlan &plan, const Symbol *data, size_t size, std::vector<Symbol> &out,
+                                 Encode encode_modelled)
+        {
+            out.push_back(static_cast<Symbol>(plan.type));
+            if (plan.type == BlockType::Modelled)
+            {
+                encode_modelled(data, size, out);
+                return;
+            }
+            if (plan.type == BlockType::Stored)
+            {
+                out.insert(out.end(), data, data + size);
+                return;
+            }
+            std::vector<Symbol> tokens;
+            size_t pos = 0;
+            for (const ByteRun &run : plan.runs)
+            {
+                if (run.offset > pos)
+                    put_varint(tokens, static_cast<uint64_t>(run.offset - pos) << 1);
+                put_varint(tokens, static_cast<uint64_t>(run.length) << 1 | 1);
+                tokens.push_back(run.value);
+                pos = run.offset + run.length;
+            }
+            if (size > pos)
+                put_varint(tokens, static_cast<uint64_t>(size - pos) << 1);
+            put_varint(out, tokens.size());
+            out.insert(out.end(), tokens.begin(), tokens.end());
+            out.push_back(static_cast<Symbol>(plan.literals));
+            if (plan.literals == BlockType::Stored)
+                out.insert(out.end(), plan.literal_bytes.begin(), plan.literal_bytes.end());
+            else
+                encode_modelled(plan.literal_bytes.data(), plan.literal_bytes.size(), out);
+        }
+
+        // Decodes a block written by encode_block into `out`;
+        // decode_modelled(data, size, out, original_size) runs the model.
+        template <typename Decode>
+        static void decode_block(const Symbol *data, size_t size, Symbol *out, size_t original_size,
+                                 Decode decode_modelled)
+        {
+            if (size == 0)
+                throw std::runtime_error("Invalid PhiComp data: truncated block.");
+            BlockType type = static_cast<BlockType>(data[0]);
+            data++;
+            size--;
+            if (type == BlockType::Modelled)
+            {
+                decode_modelled(data, size, out, original_size);
+                return;
+            }
+            if (type == BlockType::Stored)
+            {
+                if (size < original_size)
+                    throw std::runtime_error("Invalid PhiComp data: truncated block.");
+                std::memcpy(out, data, original_size);
+                return;
+            }
+            if (type != BlockType::Runs)
+                throw std::runtime_error("Invalid PhiComp data: unknown block type.");
+
+            size_t pos = 0;
+            uint64_t token_size = get_varint(data, size, pos);
+            if (token_size >= size - pos)
+                throw std::runtime_error("Invalid PhiComp data: truncated block.");
+            const size_t tokens_end = pos + token_size;
+            // First pass: validate the tokens and count the literal bytes.
+            uint64_t covered = 0, literal_count = 0;
+            for (size_t t = pos; t < tokens_end;)
+            {
+                uint64_t token = get_varint(data, tokens_end, t);
+                uint64_t length = token >> 1;
+                if (token & 1)
+                {
+                    if (t >= tokens_end)
+                        throw std::runtime_error("Invalid PhiComp data: truncated block.");
+                    t++;
+                }
+                else
+                {
+                    literal_count += length;
+                }
+                covered += length;
+                if (length == 0 || covered > original_size)
+                    throw std::runtime_error("Invalid PhiComp data: malformed block.");
+            }
+            if (covered != original_size)
+                throw std::runtime_error("Invalid PhiComp data: malformed block.");
+
+            BlockType literal_type = static_cast<BlockType>(data[tokens_end]);
+            const Symbol *literal_data = data + tokens_end + 1;
+            size_t literal_size = size - tokens_end - 1;
+            std::vector<Symbol> decoded_literals;
+            if (literal_type == BlockType::Stored)
+            {
+                if (literal_size < literal_count)
+                    throw std::runtime_error("Invalid PhiComp data: truncated block.");
+            }
+            else if (literal_type == BlockType::Modelled)
+            {
+                decoded_literals.resize(literal_count);
+                decode_modelled(literal_data, literal_size, decoded_literals.data(), decoded_literals.size());
+                literal_data = decoded_literals.data();
+            }
+            else
+            {
+                throw std::runtime_error("Invalid PhiComp data: unknown block type.");
+            }
+            // Second pass: expand runs and copy literals into place.
+            for (size_t t = pos; t < tokens_end;)
+            {
+                uint64_t token = get_varint(data, tokens_end, t);
+                size_t length = static_cast<size_t>(token >> 1);
+                if (token & 1)
+                {
+                    std::memset(out, data[t++], length);
+                }
+                else
+                {
+                    std::memcpy(out, literal_data, length);
+                    literal_data += length;
+                }
+                out += length;
+            }
+        }
+
+        // --- Internal C++ API Functions ---
+        // Short messages spend most of their time setting up the model, so
+        // coders with small tables are kept per thread and rewound between
+        // calls instead of being reallocated and faulted in again.
+        static const unsigned RECYCLED_TABLE_BITS = 11;
+
+        template <typename Fn>
+        static void with_binary_coder(const StreamHeader &header, const Dictionary *dictionary, Fn fn)
+        {
+            const BinaryContextModel *trained = header.dictionary_id != 0 ? &dictionary->model() : nullptr;
+            if (header.table_bits > RECYCLED_TABLE_BITS)
+            {
+                BinaryArithmeticCoder coder = trained ? BinaryArithmeticCoder(*trained)
+                                                      : BinaryArithmeticCoder(header.table_bits, header.orders);
+                fn(coder);
+                return;
+            }
+            thread_local std::unique_ptr<BinaryArithmeticCoder> recycled;
+            if (recycled && recycled->state().table_bits() == header.table_bits &&
+                recycled->state().orders() == header.orders)
+            {
+                if (trained)
+                    recycled->restart(*trained);
+                else
+                    recycled->restart();
+            }
+            else
+            {
+                recycled.reset(trained ? new BinaryArithmeticCoder(*trained)
+                                       : new BinaryArithmeticCoder(header.table_bits, header.orders));
+            }
+            fn(*recycled);
+        }
+
+        void compress_internal(const Symbol *data, size_t size, const StreamHeader &header, std::vector<Symbol> &out,
+                               const Dictionary *dictionary)
+        {
+            if (header.method == CodingMethod::Binary)
+            {
+                with_binary_coder(header, dictionary, [&](BinaryArithmeticCoder &coder)
+                                  { coder.encode(data, size, out); });
+                return;
+            }
+            ArithmeticCoder coder(header.table_bits, header.orders, header.method == CodingMethod::FixedPoint);
+            coder.encode(data, size, out);
+        }
+
+        void decompress_internal(const Symbol *data, size_t size, const StreamHeader &header, Symbol *out,
+                                 size_t original_size, const Dictionary *dictionary)
+        {
+            if (header.method == CodingMethod::Binary)
+            {
+                with_binary_coder(header, dictionary, [&](BinaryArithmeticCoder &coder)
+                                  { coder.decode(data, size, out, original_size); });
+                return;
+            }
+            ArithmeticCoder coder(header.table_bits, header.orders, header.method == CodingMethod::FixedPoint);
+            coder.decode(data, size, out, original_size);
+        }
+
+        // Runs fn(i) for every block on the OpenMP pool. Exceptions cannot
+        // cross the parallel region, so the first one is captured and rethrown.
+        template <typename Fn>
+        static void for_each_block(size_t count, int threads, Fn fn)
+        {
+            std::exception_ptr error;
+#ifdef _OPENMP
+            int num_threads = threads > 0 ? threads : omp_get_max_threads();
+#pragma omp parallel for schedule(dynamic, 1) num_threads(num_threads) if (count > 1)
+#endif
+            for (long long i = 0; i < static_cast<long long>(count); ++i)
+            {
+                try
+                {
+                    fn(static_cast<size_t>(i));
+                }
+                catch (...)
+                {
+#ifdef _OPENMP
+#pragma omp critical(phicomp_block_error)
+#endif
+                    if (!error)
+                        error = std::current_exception();
+                }
+            }
+            if (error)
+                std::rethrow_exception(error);
+        }
+
+        std::vector<Symbol> compress_stream(const Symbol *data, size_t size, const CompressOptions &options)
+        {
+            StreamHeader header = make_header(options, size);
+            std::vector<Symbol> output;
+            auto encode_modelled = [&](const Symbol *block, size_t length, std::vector<Symbol> &out)
+            { compress_internal(block, length, header, out, options.dictionary); };
+            if (header.version < BLOCK_FORMAT_VERSION)
+            {
+                BlockPlan plan = plan_block(data, size, header.orders);
+                header.block_types = plan.type != BlockType::Modelled;
+                output.reserve(PREFIX_SIZE + 4 + size / 4 + 16);
+                write_header(header, output);
+                if (header.block_types)
+                    encode_block(plan, data, size, output, encode_modelled);
+                else
+                    compress_internal(data, size, header, output, options.dictionary);
+                return output;
+            }
+            size_t count = header.block_lengths.size();
+            std::vector<std::vector<Symbol>> blocks(count);
+            std::vector<BlockType> types(count);
+            for_each_block(count, options.threads, [&](size_t i)
+                           {
+                size_t offset = i * header.block_size;
+                size_t length = std::min<size_t>(header.block_size, size - offset);
+                BlockPlan plan = plan_block(data + offset, length, header.orders);
+                types[i] = plan.type;
+                encode_block(plan, data + offset, length, blocks[i], encode_modelled); });
+            // Containers whose blocks were all modelled keep the plain format.
+            header.block_types = std::any_of(types.begin(), types.end(), [](BlockType type)
+                                             { return type != BlockType::Modelled; });
+            if (!header.block_types)
+            {
+                for (auto &block : blocks)
+                    block.erase(block.begin());
+            }
+            size_t body_size = 0;
+            for (size_t i = 0; i < count; ++i)
+            {
+                if (blocks[i].size() > UINT32_MAX)
+                    throw std::runtime_error("Compression failed: block too large.");
+                header.block_lengths[i] = static_cast<uint32_t>(blocks[i].size());
+                body_size += blocks[i].size();
+            }
+            output.reserve(PREFIX_SIZE + 4 + 8 + count * 4 + body_size);
+            write_header(header, output);
+            for (auto &block : blocks)
+            {
+                output.insert(output.end(), block.begin(), block.end());
+                std::vector<Symbol>().swap(block);
+            }
+            return output;
+        }
+
+        // Decodes one single body or container block, typed or not.
+        static void decompress_body(const Symbol *data, size_t size, const StreamHeader &header, Symbol *out,
+                                    size_t original_size, const Dictionary *dictionary)
+        {
+            if (!header.block_types)
+            {
+                decompress_internal(data, size, header, out, original_size, dictionary);
+                return;
+            }
+            decode_block(data, size, out, original_size,
+                         [&](const Symbol *block, size_t length, Symbol *block_out, size_t block_size)
+                         { decompress_internal(block, length, header, block_out, block_size, dictionary); });
+        }
+
+        void decompress_stream(const Symbol *data, size_t size, const StreamHeader &header, Symbol *out,
+                               int threads, const Dictionary *dictionary)
+        {
+            if (header.version == STREAM_FORMAT_VERSION)
+                throw std::invalid_argument("Framed streams have no recorded size; use StreamDecoder.");
+            check_dictionary(header, dictionary);
+            if (header.version < BLOCK_FORMAT_VERSION)
+            {
+                decompress_body(data + header.body_offset, size - header.body_offset, header, out,
+                                header.original_size, dictionary);
+                return;
+            }
+            size_t count = header.block_lengths.size();
+            std::vector<size_t> offsets(count + 1, header.body_offset);
+            for (size_t i = 0; i < count; ++i)
+                offsets[i + 1] = offsets[i] + header.block_lengths[i];
+            for_each_block(count, threads, [&](size_t i)
+                           {
+                size_t out_offset = i * header.block_size;
+                size_t length = std::min<size_t>(header.block_size, header.original_size - out_offset);
+                decompress_body(data + offsets[i], header.block_lengths[i], header, out + out_offset, length,
+                                dictionary); });
+        }
+
+        void decompress_range(const Symbol *data, size_t size, const StreamHeader &header, uint64_t offset,
+                              Symbol *out, size_t length, int threads, const Dictionary *dictionary)
+        {
+            if (header.version == STREAM_FORMAT_VERSION)
+                throw std::invalid_argument("Framed streams are not seekable; decompress them whole.");
+            if (offset > header.original_size || length > header.original_size - offset)
+                throw std::invalid_argument("Range lies outside the stream.");
+            check_dictionary(header, dictionary);
+            if (length == 0)
+                return;
+            if (header.version < BLOCK_FORMAT_VERSION)
+            {
+                std::vector<Symbol> whole(header.original_size);
+                decompress_stream(data, size, header, whole.data(), threads, dictionary);
+                std::memcpy(out, whole.data() + offset, length);
+                return;
+            }
+            const uint64_t end = offset + length;
+            const size_t first = offset / header.block_size;
+            const size_t last = (end - 1) / header.block_size;
+            size_t block_offset = header.body_offset;
+            for (size_t i = 0; i < first; ++i)
+                block_offset += header.block_lengths[i];
+            std::vector<size_t> offsets(last - first + 2, block_offset);
+            for (size_t i = first; i <= last; ++i)
+                offsets[i - first + 1] = offsets[i - first] + header.block_lengths[i];
+            for_each_block(last - first + 1, threads, [&](size_t k)
+                           {
+                size_t i = first + k;
+                uint64_t block_start = uint64_t(i) * header.block_size;
+                size_t block_length = std::min<uint64_t>(header.block_size, header.original_size - block_start);
+                uint64_t begin = std::max(offset, block_start);
+                uint64_t stop = std::min(end, block_start + block_length);
+                Symbol *dest = out + (begin - offset);
+                if (begin == block_start && stop == block_start + block_length)
+                {
+                    decompress_body(data + offsets[k], header.block_lengths[i], header, dest, block_length, dictionary);
+                    return;
+                }
+                // Edge blocks are decoded aside and only the overlap is copied.
+                std::vector<Symbol> block(block_length);
+                decompress_body(data + offsets[k], header.block_lengths[i], header, block.data(), block_length,
+                                dictionary);
+                std::memcpy(dest, block.data() + (begin - block_start), stop - begin); });
+        }
+
+        // --- Batch API ---
+        std::vector<Symbol> compress_batch(const std::vector<ByteRange> &inputs, const CompressOptions &options,
+                                           std::vector<size_t> &offsets)
+        {
+            // Parallelism is across records, so each record is coded serially.
+            CompressOptions record_options = options;
+            record_options.threads = 1;
+            size_t count = inputs.size();
+            std::vector<std::vector<Symbol>> records(count);
+            for_each_block(count, options.threads, [&](size_t i)
+                           { records[i] = compress_stream(inputs[i].first, inputs[i].second, record_options); });
+            offsets.assign(count + 1, 0);
+            for (size_t i = 0; i < count; ++i)
+                offsets[i + 1] = offsets[i] + records[i].size();
+            std::vector<Symbol> output;
+            output.reserve(offsets[count]);
+            for (auto &record : records)
+            {
+                output.insert(output.end(), record.begin(), record.end());
+                std::vector<Symbol>().swap(record);
+            }
+            return output;
+        }
+
+        std::vector<Symbol> decompress_batch(const std::vector<ByteRange> &inputs, int threads,
+                                             const Dictionary *dictionary, std::vector<size_t> &offsets)
+        {
+            size_t count = inputs.size();
+            std::vector<StreamHeader> headers(count);
+            // Framed streams do not record their size, so they are decoded
+            // while the headers are read; everything else decodes in place.
+            std::vector<std::vector<Symbol>> framed(count);
+            for_each_block(count, threads, [&](size_t i)
+                           {
+                headers[i] = read_header(inputs[i].first, inputs[i].second);
+                if (headers[i].original_size == UNKNOWN_SIZE)
+                    framed[i] = decompress_framed(inputs[i].first, inputs[i].second, dictionary); });
+            offsets.assign(count + 1, 0);
+            for (size_t i = 0; i < count; ++i)
+            {
+                uint64_t size = headers[i].original_size == UNKNOWN_SIZE ? framed[i].size() : headers[i].original_size;
+                if (size > SIZE_MAX - offsets[i])
+                    throw std::runtime_error("Invalid PhiComp data: original size too large.");
+                offsets[i + 1] = offsets[i] + static_cast<size_t>(size);
+            }
+            std::vector<Symbol> output(offsets[count]);
+            for_each_block(count, threads, [&](size_t i)
+                           {
+                if (headers[i].original_size == UNKNOWN_SIZE)
+                    std::copy(framed[i].begin(), framed[i].end(), output.begin() + offsets[i]);
+                else
+                    decompress_stream(inputs[i].first, inputs[i].second, headers[i], output.data() + offsets[i], 1,
+                                      dictionary); });
+            return output;
+        }
+
+        // --- StreamEncoder Implementation ---
+        static StreamHeader make_stream_header(size_t memory_budget, const Dictionary *dictionary,
+                                               const std::vector<size_t> &orders)
+        {
+            StreamHeader header;
+            header.version = STREAM_FORMAT_VERSION;
+            header.method = CodingMethod::Binary;
+            header.original_size = UNKNOWN_SIZE;
+            // The stream length is unknown, so the tables take the full budget.
+            header.orders = dictionary ? dictionary->model().orders() : orders;
+            check_orders(header.orders);
+            header.table_bits = dictionary ? dictionary->model().table_bits()
+                                           : table_bits_for(memory_budget, header.orders.size() * 64, UINT64_MAX);
+            header.dictionary_id = dictionary ? dictionary->id() : 0;
+            header.block_types = true;
+            header.block_size = 0;
+            header.body_offset = 0;
+            return header;
+        }
+
+        static BinaryArithmeticCoder make_stream_coder(const StreamHeader &header, const Dictionary *dictionary)
+        {
+            return dictionary ? BinaryArithmeticCoder(dictionary->model())
+                              : BinaryArithmeticCoder(header.table_bits, header.orders);
+        }
+
+        StreamEncoder::StreamEncoder(size_t memory_budget, size_t frame_size, const Dictionary *dictionary,
+                                     const std::vector<size_t> &orders)
+            : header(make_stream_header(memory_budget, dictionary, orders)), coder(make_stream_coder(header, dictionary)),
+              frame_size(frame_size), header_written(false), done(false)
+        {
+            if (frame_size == 0 || frame_size > MAX_BLOCK_SIZE)
+                throw std::invalid_argument("Frame size must be between 1 byte and 1 GiB.");
+            header.block_size = static_cast<uint32_t>(frame_size);
+            pending.reserve(frame_size);
+        }
+
+        void StreamEncoder::write_stream_header(std::vector<Symbol> &out)
+        {
+            if (!header_written)
+            {
+                write_header(header, out);
+                header_written = true;
+            }
+        }
+
+        void StreamEncoder::emit_frame(const Symbol *data, size_t size, std::vector<Symbol> &out)
+        {
+            size_t frame_start = out.size();
+            put_u32(out, static_cast<uint32_t>(size));
+            put_u32(out, 0);
+            encode_block(plan_block(data, size, header.orders), data, size, out,
+                         [&](const Symbol *block, size_t length, std::vector<Symbol> &block_out)
+                         { coder.encode(block, length, block_out); });
+            size_t coded = out.size() - frame_start - FRAME_HEADER_SIZE;
+            for (int i = 0; i < 4; ++i)
+                out[frame_start + 4 + i] = static_cast<Symbol>((coded >> (i * 8)) & 0xFF);
+        }
+
+        void StreamEncoder::write(const Symbol *data, size_t size, std::vector<Symbol> &out)
+        {
+            if (done)
+                throw std::invalid_argument("Compressor has already been flushed.");
+            write_stream_header(out);
+            // Top up a partially filled frame first, then code whole frames
+            // straight from the caller's buffer without staging them.
+            if (!pending.empty())
+            {
+                size_t take = std::min(size, frame_size - pending.size());
+                pending.insert(pending.end(), data, data + take);
+                data += take;
+                size -= take;
+                if (pending.size() < frame_size)
+                    return;
+                emit_frame(pending.data(), pending.size(), out);
+                pending.clear();
+            }
+            while (size >= frame_size)
+            {
+                emit_frame(data, frame_size, out);
+                data += frame_size;
+                size -= frame_size;
+            }
+            pending.insert(pending.end(), data, data + size);
+        }
+
+        void StreamEncoder::flush(bool finish, std::vector<Symbol> &out)
+        {
+            if (done)
+                throw std::invalid_argument("Compressor has already been flushed.");
+            write_stream_header(out);
+            if (!pending.empty())
+            {
+                emit_frame(pending.data(), pending.size(), out);
+                pending.clear();
+            }
+            if (finish)
+            {
+                put_u32(out, 0);
+                put_u32(out, 0);
+                done = true;
+            }
+        }
+
+        // --- StreamDecoder Implementation ---
+        std::vector<Symbol> decompress_framed(const Symbol *data, size_t size, const Dictionary *dictionary)
+        {
+            StreamDecoder decoder(dictionary);
+            std::vector<Symbol> output = decoder.decompress(data, size, -1);
+            if (!decoder.eof())
+                throw std::runtime_error("Invalid PhiComp data: stream ended before the end marker.");
+            return output;
+        }
+
+        bool StreamDecoder::frame_available() const noexcept
+        {
+            size_t available = input.size() - input_pos;
+            if (!coder)
+            {
+                if (available < PREFIX_SIZE)
+                    return false;
+                // Report a bad prefix right away instead of waiting for the
+                // optional fields its flag bits announce.
+                const Symbol *prefix = input.data() + input_pos;
+                if (std::memcmp(prefix, "PHIC", 4) != 0 || prefix[4] != STREAM_FORMAT_VERSION)
+                    return true;
+                return available >= header_prefix_size(prefix, available);
+            }
+            if (available < FRAME_HEADER_SIZE)
+                return false;
+            uint64_t coded = get_u32(input.data() + input_pos + 4);
+            return available >= FRAME_HEADER_SIZE + coded;
+        }
+
+        bool StreamDecoder::needs_input() const noexcept
+        {
+            return !at_end && output_pos == output.size() && !frame_available();
+        }
+
+        bool StreamDecoder::decode_next_frame()
+        {
+            if (!frame_available())
+                return false;
+            const Symbol *cursor = input.data() + input_pos;
+            if (!coder)
+            {
+                StreamHeader header = read_header(cursor, input.size() - input_pos);
+                if (header.version != STREAM_FORMAT_VERSION)
+                    throw std::runtime_error("Invalid PhiComp data: not a framed stream.");
+                check_dictionary(header, dictionary);
+                coder.reset(new BinaryArithmeticCoder(make_stream_coder(header, header.dictionary_id ? dictionary : nullptr)));
+                block_types = header.block_types;
+                if (header.block_size)
+                    frame_limit = header.block_size;
+                input_pos += header.body_offset;
+                return true;
+            }
+            uint32_t raw = get_u32(cursor);
+            uint32_t coded = get_u32(cursor + 4);
+            input_pos += FRAME_HEADER_SIZE;
+            if (raw == 0)
+            {
+                if (coded != 0)
+                    throw std::runtime_error("Invalid PhiComp data: malformed end of stream.");
+                at_end = true;
+                unused.assign(input.begin() + input_pos, input.end());
+                input.clear();
+                input_pos = 0;
+                return false;
+            }
+            // Checked before any output is allocated, so a forged length
+            // cannot make the decoder allocate or decode past the frame size.
+            if (raw > frame_limit)
+                throw std::runtime_error("Invalid PhiComp data: frame too large.");
+            size_t start = output.size();
+            output.resize(start + raw);
+            auto decode_modelled = [&](const Symbol *block, size_t length, Symbol *block_out, size_t block_size)
+            { coder->decode(block, length, block_out, block_size); };
+            if (block_types)
+                decode_block(input.data() + input_pos, coded, output.data() + start, raw, decode_modelled);
+            else
+                decode_modelled(input.data() + input_pos, coded, output.data() + start, raw);
+            input_pos += coded;
+            return true;
+        }
+
+        std::vector<Symbol> StreamDecoder::decompress(const Symbol *data, size_t size, long long max_length)
+        {
+            if (at_end)
+            {
+                unused.insert(unused.end(), data, data + size);
+            }
+            else
+            {
+                // Drop consumed input before buffering more.
+                if (input_pos > 0)
+                {
+                    input.erase(input.begin(), input.begin() + input_pos);
+                    input_pos = 0;
+                }
+                input.insert(input.end(), data, data + size);
+            }
+            if (output_pos == output.size())
+            {
+                output.clear();
+                output_pos = 0;
+            }
+            size_t limit = max_length < 0 ? SIZE_MAX : static_cast<size_t>(max_length);
+            while (!at_end && output.size() - output_pos < limit && decode_next_frame())
+            {
+            }
+            size_t count = std::min(limit, output.size() - output_pos);
+            std::vector<Symbol> result(output.begin() + output_pos, output.begin() + output_pos + count);
+            output_pos += count;
+            return result;
+        }
+
+        // --- SeekableEncoder Implementation ---
+        SeekableEncoder::SeekableEncoder(size_t memory_budget, size_t block_size, const std::vector<size_t> &orders,
+                                         int threads)
+            : total(0), threads(threads), header_written(false), done(false)
+        {
+            if (block_size == 0 || block_size > MAX_BLOCK_SIZE)
+                throw std::invalid_argument("Block size must be between 1 byte and 1 GiB.");
+            check_orders(orders);
+            header.version = SEEKABLE_FORMAT_VERSION;
+            header.method = CodingMethod::Binary;
+            header.original_size = UNKNOWN_SIZE;
+            header.table_bits = table_bits_for(memory_budget, orders.size() * 64, uint64_t(block_size) * 2);
+            header.dictionary_id = 0;
+            header.orders = orders;
+            header.block_types = true;
+            header.block_size = static_cast<uint32_t>(block_size);
+            header.body_offset = 0;
+        }
+
+        void SeekableEncoder::write_stream_header(std::vector<Symbol> &out)
+        {
+            if (!header_written)
+            {
+                write_header(header, out);
+                header_written = true;
+            }
+        }
+
+        void SeekableEncoder::emit_blocks(const Symbol *data, size_t size, std::vector<Symbol> &out)
+        {
+            size_t count = (size + header.block_size - 1) / header.block_size;
+            if (header.block_lengths.size() + count > UINT32_MAX)
+                throw std::runtime_error("Compression failed: too many blocks.");
+            std::vector<std::vector<Symbol>> blocks(count);
+            for_each_block(count, threads, [&](size_t i)
+                           {
+                size_t offset = i * header.block_size;
+                size_t length = std::min<size_t>(header.block_size, size - offset);
+                encode_block(plan_block(data + offset, length, header.orders), data + offset, length, blocks[i],
+                             [&](const Symbol *block, size_t block_size, std::vector<Symbol> &block_out)
+                             { compress_internal(block, block_size, header, block_out); }); });
+            for (auto &block : blocks)
+            {
+                if (block.size() > UINT32_MAX)
+                    throw std::runtime_error("Compression failed: block too large.");
+                header.block_lengths.push_back(static_cast<uint32_t>(block.size()));
+                out.insert(out.end(), block.begin(), block.end());
+                std::vector<Symbol>().swap(block);
+            }
+            total += size;
+        }
+
+        void SeekableEncoder::write(const Symbol *data, size_t size, std::vector<Symbol> &out)
+        {
+            if (done)
+                throw std::invalid_argument("Compressor has already been finished.");
+            write_stream_header(out);
+            if (!pending.empty())
+            {
+                size_t take = std::min<size_t>(size, header.block_size - pending.size());
+                pending.insert(pending.end(), data, data + take);
+                data += take;
+                size -= take;
+                if (pending.size() < header.block_size)
+                    return;
+                emit_blocks(pending.data(), pending.size(), out);
+                pending.clear();
+            }
+            // Whole blocks are coded straight from the caller's buffer, in parallel.
+            size_t whole = size - size % header.block_size;
+            if (whole > 0)
+                emit_blocks(data, whole, out);
+            pending.insert(pending.end(), data + whole, data + size);
+        }
+
+        void SeekableEncoder::finish(std::vector<Symbol> &out)
+        {
+            if (done)
+                throw std::invalid_argument("Compressor has already been finished.");
+            write_stream_header(out);
+            if (!pending.empty())
+            {
+                emit_blocks(pending.data(), pending.size(), out);
+                std::vector<Symbol>().swap(pending);
+            }
+            put_u32(out, header.block_size);
+            put_u32(out, static_cast<uint32_t>(header.block_lengths.size()));
+            for (uint32_t length : header.block_lengths)
+                put_u32(out, length);
+            for (int i = 0; i < 8; ++i)
+                out.push_back(static_cast<Symbol>((total >> (i * 8)) & 0xFF));
+            put_u32(out, static_cast<uint32_t>(MIN_FOOTER_SIZE + header.block_lengths.size() * 4));
+            out.insert(out.end(), {'P', 'H', 'I', 'X'});
+            done = true;
+        }
+
+        // --- EntropyCounter Implementation ---
+        void CountTable::increment(uint64_t key)
+        {
+            if (key == 0)
+                key = 1;
+            size_t mask = keys.size() - 1;
+            for (size_t i = static_cast<size_t>(key * GOLDEN_MULTIPLIER >> 32) & mask;; i = (i + 1) & mask)
+            {
+                if (keys[i] == key)
+                {
+                    counts[i]++;
+                    return;
+                }
+                if (keys[i] == 0)
+                {
+                    keys[i] = key;
+                    counts[i] = 1;
+                    if (++used * 2 > keys.size())
+                        grow();
+                    return;
+                }
+            }
+        }
+
+        void CountTable::grow()
+        {
+            std::vector<uint64_t> old_keys(keys.size() * 2, 0), old_counts(counts.size() * 2, 0);
+            old_keys.swap(keys);
+            old_counts.swap(counts);
+            size_t mask = keys.size() - 1;
+            for (size_t j = 0; j < old_keys.size(); ++j)
+            {
+                if (old_keys[j] == 0)
+                    continue;
+                size_t i = static_cast<size_t>(old_keys[j] * GOLDEN_MULTIPLIER >> 32) & mask;
+                while (keys[i] != 0)
+                    i = (i + 1) & mask;
+                keys[i] = old_keys[j];
+                counts[i] = old_counts[j];
+            }
+        }
+
+        EntropyCounter::EntropyCounter(const std::vector<size_t> &orders) : counted_orders(orders)
+        {
+            if (orders.empty())
+                throw std::invalid_argument("At least one entropy order is required.");
+            std::vector<size_t> context_orders;
+            for (size_t i = 0; i < orders.size(); ++i)
+            {
+                if (i > 0 && orders[i] <= orders[i - 1])
+                    throw std::invalid_argument("Entropy orders must be strictly ascending.");
+                if (orders[i] > MAX_CONTEXT_ORDER)
+                    throw std::invalid_argument("Entropy orders must be at most 255.");
+                if (orders[i] > 0)
+                    context_orders.push_back(orders[i]);
+            }
+            if (!context_orders.empty())
+            {
+                contexts.reset(new ContextHasher(context_orders));
+                context_counts.resize(context_orders.size());
+            }
+        }
+
+        void EntropyCounter::update(const Symbol *data, size_t size)
+        {
+            total += size;
+            if (!contexts)
+            {
+                for (size_t n = 0; n < size; ++n)
+                    histogram[data[n]]++;
+                return;
+            }
+            const size_t count = context_counts.size();
+            for (size_t n = 0; n < size; ++n)
+            {
+                Symbol symbol = data[n];
+                histogram[symbol]++;
+                for (size_t i = 0; i < count; ++i)
+                {
+                    if (!contexts->ready(i))
+                        break;
+                    ContextCounts &counts = context_counts[i];
+                    uint64_t context = mix_context_hash(contexts->hash(i));
+                    counts.contexts.increment(context);
+                    counts.pairs.increment(context ^ (uint64_t(symbol) + 1) * GOLDEN_MULTIPLIER);
+                    counts.positions++;
+                }
+                contexts->push(symbol);
+            }
+        }
+
+        static inline double count_log2(uint64_t count)
+        {
+            double c = static_cast<double>(count);
+            return count > 1 ? c * std::log2(c) : 0.0;
+        }
+
+        double CountTable::sum_count_log2() const
+        {
+            double sum = 0.0;
+            for (uint64_t count : counts)
+                sum += count_log2(count);
+            return sum;
+        }
+
+        double EntropyCounter::entropy(size_t order) const
+        {
+            auto found = std::find(counted_orders.begin(), counted_orders.end(), order);
+            if (found == counted_orders.end())
+                throw std::invalid_argument("Entropy order was not counted.");
+            // H = (sum_ctx n log2 n - sum_(ctx, sym) c log2 c) / positions, where
+            // order 0 has the single empty context.
+            if (order == 0)
+            {
+                if (total == 0)
+                    return 0.0;
+                double bits = count_log2(total);
+                for (uint64_t count : histogram)
+                    bits -= count_log2(count);
+                return std::max(0.0, bits / static_cast<double>(total));
+            }
+            size_t index = static_cast<size_t>(found - counted_orders.begin()) - (counted_orders.front() == 0 ? 1 : 0);
+            const ContextCounts &counts = context_counts[index];
+            if (counts.positions == 0)
+                return 0.0;
+            double bits = counts.contexts.sum_count_log2() - counts.pairs.sum_count_log2();
+            return std::max(0.0, bits / static_cast<double>(counts.positions));
+        }
+
+    } // namespace core
+} // namespace phicomp
 
 // =================================================================================
-//  pybind11 Module Definition
-// =================================================================================
+//  pybind11 Module Definition
+// =================================================================================
+// Borrowed, C-contiguous view of any object exporting the buffer protocol
+// (bytes, bytearray, memoryview, mmap, NumPy arrays). Holding the view keeps
+// the exporter from resizing or closing the memory while the GIL is released.
+class BufferView
+{
+public:
+    BufferView(const pybind11::object &obj, bool writable)
+    {
+        if (PyObject_GetBuffer(obj.ptr(), &view, writable ? PyBUF_WRITABLE : PyBUF_SIMPLE) != 0)
+            throw pybind11::error_already_set();
+    }
+    ~BufferView() { PyBuffer_Release(&view); }
+    BufferView(const BufferView &) = delete;
+    BufferView &operator=(const BufferView &) = delete;
+
+    phicomp::core::Symbol *data() const { return static_cast<phicomp::core::Symbol *>(view.buf); }
+    size_t size() const { return static_cast<size_t>(view.len); }
+
+private:
+    Py_buffer view;
+};
+
 PYBIND11_MODULE(core_bindings, m)
 {
+    using namespace phicomp::core;
+
     m.doc() = "Production-grade C++ core for PhiComp compression";
+    m.attr("DEFAULT_MEMORY_BUDGET") = DEFAULT_MEMORY_BUDGET;
+    m.attr("DEFAULT_BLOCK_SIZE") = DEFAULT_BLOCK_SIZE;
+    m.attr("METHOD_ARITHMETIC") = static_cast<int>(CodingMethod::Arithmetic);
+    m.attr("METHOD_BINARY") = static_cast<int>(CodingMethod::Binary);
+    m.attr("METHOD_FIXED_POINT") = static_cast<int>(CodingMethod::FixedPoint);
+
+    // All entry points borrow their input buffers and run the codec with the
+    // GIL released, so concurrent Python threads can compress in parallel.
+    m.attr("DEFAULT_DICTIONARY_BUDGET") = DEFAULT_DICTIONARY_BUDGET;
+    m.attr("MIN_LEVEL") = MIN_LEVEL;
+    m.attr("DEFAULT_LEVEL") = DEFAULT_LEVEL;
+    m.attr("MAX_LEVEL") = MAX_LEVEL;
+
+    pybind11::class_<Dictionary>(m, "Dictionary")
+        .def(pybind11::init([](const pybind11::object &data)
+                            {
+            BufferView input(data, false);
+            pybind11::gil_scoped_release release;
+            return Dictionary::load(input.data(), input.size()); }),
+             pybind11::arg("data"))
+        .def_static("train", [](const pybind11::list &samples, size_t memory_budget, int level)
+                    {
+            const std::vector<size_t> &orders = orders_for_level(level);
+            std::vector<std::unique_ptr<BufferView>> views;
+            std::vector<std::pair<const Symbol *, size_t>> ranges;
+            for (const auto &sample : samples)
+            {
+                views.emplace_back(new BufferView(pybind11::reinterpret_borrow<pybind11::object>(sample), false));
+                ranges.emplace_back(views.back()->data(), views.back()->size());
+            }
+            pybind11::gil_scoped_release release;
+            return Dictionary::train(ranges, memory_budget, orders); },
+                    pybind11::arg("samples"), pybind11::arg("memory_budget") = DEFAULT_DICTIONARY_BUDGET,
+                    pybind11::arg("level") = DEFAULT_LEVEL)
+        .def("as_bytes", [](const Dictionary &self)
+             {
+            std::vector<Symbol> output = self.serialize();
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); })
+        .def_property_readonly("id", &Dictionary::id);
 
-    m.def("compress_main", [](const pybind11::bytes &data_bytes)
+    m.def("compress_main", [](const pybind11::object &data, size_t memory_budget, int method,
+                              size_t block_size, int threads, const Dictionary *dictionary, int level)
           {
-        std::string data_str = data_bytes;
-        std::vector<phicomp::core::Symbol> data_vec(data_str.begin(), data_str.end());
-        
-        auto compressed_body = phicomp::core::compress_internal(data_vec);
-        
-        std::string header = "PHIC\x01\x01";
-        header.resize(14);
-        uint64_t original_size = data_vec.size();
-        for (int i = 0; i < 8; ++i) {
-            header[6 + i] = (original_size >> (i * 8)) & 0xFF;
+        BufferView input(data, false);
+
+        CompressOptions options;
+        options.orders = orders_for_level(level);
+        options.method = static_cast<CodingMethod>(method);
+        options.memory_budget = memory_budget;
+        options.block_size = block_size;
+        options.threads = threads;
+        options.dictionary = dictionary;
+        std::vector<Symbol> output;
+        {
+            pybind11::gil_scoped_release release;
+            output = compress_stream(input.data(), input.size(), options);
         }
-        header.append(reinterpret_cast<const char*>(compressed_body.data()), compressed_body.size());
         
-        return pybind11::bytes(header); }, "Compresses data using adaptive FCM and Arithmetic Coding");
+        return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); },
+          "Compresses data using adaptive FCM and Arithmetic Coding",
+          pybind11::arg("data"), pybind11::arg("memory_budget") = DEFAULT_MEMORY_BUDGET,
+          pybind11::arg("method") = static_cast<int>(CodingMethod::Binary),
+          pybind11::arg("block_size") = DEFAULT_BLOCK_SIZE, pybind11::arg("threads") = 0,
+          pybind11::arg("dictionary") = nullptr, pybind11::arg("level") = DEFAULT_LEVEL);
 
-    m.def("decompress_main", [](const pybind11::bytes &data_bytes)
+    m.def("decompress_main", [](const pybind11::object &data, int threads, const Dictionary *dictionary)
           {
-        std::string data_str = data_bytes;
-        if (data_str.size() < 14) throw std::runtime_error("Invalid PhiComp data: header too short.");
-        if (data_str.substr(0, 4) != "PHIC") throw std::runtime_error("Invalid PhiComp data: magic number mismatch.");
-        
-        uint64_t original_size = 0;
-        for (int i = 0; i < 8; ++i) {
-            original_size |= static_cast<uint64_t>(static_cast<phicomp::core::Symbol>(data_str[6 + i])) << (i * 8);
+        BufferView input(data, false);
+        StreamHeader header = read_header(input.data(), input.size());
+        if (header.original_size == UNKNOWN_SIZE)
+        {
+            // Framed stream: decode it frame by frame.
+            std::vector<Symbol> output;
+            {
+                pybind11::gil_scoped_release release;
+                output = decompress_framed(input.data(), input.size(), dictionary);
+            }
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size());
         }
-        
-        std::vector<phicomp::core::Symbol> compressed_body(data_str.begin() + 14, data_str.end());
-        auto decompressed_vec = phicomp::core::decompress_internal(compressed_body, original_size);
-        
-        std::string decompressed_str(decompressed_vec.begin(), decompressed_vec.end());
-        return pybind11::bytes(decompressed_str); }, "Decompresses data compressed with PhiComp");
-}
\ No newline at end of file
+        if (header.original_size > static_cast<uint64_t>(PY_SSIZE_T_MAX))
+            throw std::runtime_error("Invalid PhiComp data: original size too large.");
+
+        // Decode straight into the storage of a fresh bytes object.
+        PyObject *raw_result = PyBytes_FromStringAndSize(nullptr, static_cast<Py_ssize_t>(header.original_size));
+        if (raw_result == nullptr)
+            throw pybind11::error_already_set();
+        auto result = pybind11::reinterpret_steal<pybind11::bytes>(raw_result);
+        Symbol *out = reinterpret_cast<Symbol*>(PyBytes_AS_STRING(raw_result));
+        {
+            pybind11::gil_scoped_release release;
+            decompress_stream(input.data(), input.size(), header, out, threads, dictionary);
+        }
+        return result; },
+          "Decompresses data compressed with PhiComp", pybind11::arg("data"), pybind11::arg("threads") = 0,
+          pybind11::arg("dictionary") = nullptr);
+
+    m.def("decompress_into", [](const pybind11::object &data, const pybind11::object &out, int threads,
+                                const Dictionary *dictionary)
+          {
+        BufferView input(data, false);
+        BufferView output(out, true);
+        StreamHeader header = read_header(input.data(), input.size());
+        if (header.original_size == UNKNOWN_SIZE)
+            throw pybind11::value_error("Framed streams have no recorded size; use Decompressor.");
+        if (header.original_size > output.size())
+            throw pybind11::value_error("Output buffer is too small for the decompressed data.");
+        {
+            pybind11::gil_scoped_release release;
+            decompress_stream(input.data(), input.size(), header, output.data(), threads, dictionary);
+        }
+        return static_cast<size_t>(header.original_size); },
+          "Decompresses into a caller-supplied writable buffer and returns the byte count",
+          pybind11::arg("data"), pybind11::arg("out"), pybind11::arg("threads") = 0,
+          pybind11::arg("dictionary") = nullptr);
+
+    m.attr("UNKNOWN_SIZE") = UNKNOWN_SIZE;
+    m.attr("DEFAULT_STREAM_MEMORY_BUDGET") = DEFAULT_STREAM_MEMORY_BUDGET;
+    m.attr("DEFAULT_FRAME_SIZE") = DEFAULT_FRAME_SIZE;
+
+    pybind11::class_<StreamEncoder>(m, "StreamEncoder")
+        .def(pybind11::init([](size_t memory_budget, size_t frame_size, const Dictionary *dictionary, int level)
+                            { return new StreamEncoder(memory_budget, frame_size, dictionary, orders_for_level(level)); }),
+             pybind11::arg("memory_budget") = DEFAULT_STREAM_MEMORY_BUDGET,
+             pybind11::arg("frame_size") = DEFAULT_FRAME_SIZE, pybind11::arg("dictionary") = nullptr,
+             pybind11::arg("level") = DEFAULT_LEVEL)
+        .def("compress", [](StreamEncoder &self, const pybind11::object &data)
+             {
+            BufferView input(data, false);
+            std::vector<Symbol> output;
+            {
+                pybind11::gil_scoped_release release;
+                self.write(input.data(), input.size(), output);
+            }
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); },
+             pybind11::arg("data"))
+        .def("flush", [](StreamEncoder &self, bool finish)
+             {
+            std::vector<Symbol> output;
+            {
+                pybind11::gil_scoped_release release;
+                self.flush(finish, output);
+            }
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); },
+             pybind11::arg("finish") = true)
+        .def_property_readonly("finished", &StreamEncoder::finished);
+
+    // The decoder keeps a pointer to its dictionary, so the Python object
+    // must stay alive as long as the decoder does.
+    pybind11::class_<StreamDecoder>(m, "StreamDecoder")
+        .def(pybind11::init<const Dictionary *>(), pybind11::arg("dictionary") = nullptr,
+             pybind11::keep_alive<1, 2>())
+        .def("decompress", [](StreamDecoder &self, const pybind11::object &data, long long max_length)
+             {
+            BufferView input(data, false);
+            std::vector<Symbol> output;
+            {
+                pybind11::gil_scoped_release release;
+                output = self.decompress(input.data(), input.size(), max_length);
+            }
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); },
+             pybind11::arg("data"), pybind11::arg("max_length") = -1)
+        .def_property_readonly("eof", &StreamDecoder::eof)
+        .def_property_readonly("needs_input", &StreamDecoder::needs_input)
+        .def_property_readonly("unused_data", [](const StreamDecoder &self)
+                               { return pybind11::bytes(reinterpret_cast<const char*>(self.unused_data().data()),
+                                                        self.unused_data().size()); });
+
+    m.attr("DEFAULT_SEEKABLE_BLOCK_SIZE") = DEFAULT_SEEKABLE_BLOCK_SIZE;
+
+    pybind11::class_<SeekableEncoder>(m, "SeekableEncoder")
+        .def(pybind11::init([](size_t memory_budget, size_t block_size, int level, int threads)
+                            { return new SeekableEncoder(memory_budget, block_size, orders_for_level(level), threads); }),
+             pybind11::arg("memory_budget") = DEFAULT_MEMORY_BUDGET,
+             pybind11::arg("block_size") = DEFAULT_SEEKABLE_BLOCK_SIZE, pybind11::arg("level") = DEFAULT_LEVEL,
+             pybind11::arg("threads") = 0)
+        .def("compress", [](SeekableEncoder &self, const pybind11::object &data)
+             {
+            BufferView input(data, false);
+            std::vector<Symbol> output;
+            {
+                pybind11::gil_scoped_release release;
+                self.write(input.data(), input.size(), output);
+            }
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); },
+             pybind11::arg("data"))
+        .def("finish", [](SeekableEncoder &self)
+             {
+            std::vector<Symbol> output;
+            {
+                pybind11::gil_scoped_release release;
+                self.finish(output);
+            }
+            return pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()); })
+        .def_property_readonly("finished", &SeekableEncoder::finished);
+
+    m.def("decompress_range", [](const pybind11::object &data, uint64_t offset, uint64_t length, int threads,
+                                 const Dictionary *dictionary)
+          {
+        BufferView input(data, false);
+        StreamHeader header = read_header(input.data(), input.size());
+        if (header.original_size == UNKNOWN_SIZE)
+            throw std::invalid_argument("Framed streams are not seekable; decompress them whole.");
+        // Like slicing, a range running past the end is truncated.
+        offset = std::min(offset, header.original_size);
+        length = std::min(length, header.original_size - offset);
+        if (length > static_cast<uint64_t>(PY_SSIZE_T_MAX))
+            throw std::invalid_argument("Range too large.");
+        PyObject *raw_result = PyBytes_FromStringAndSize(nullptr, static_cast<Py_ssize_t>(length));
+        if (raw_result == nullptr)
+            throw pybind11::error_already_set();
+        auto result = pybind11::reinterpret_steal<pybind11::bytes>(raw_result);
+        Symbol *out = reinterpret_cast<Symbol*>(PyBytes_AS_STRING(raw_result));
+        {
+            pybind11::gil_scoped_release release;
+            decompress_range(input.data(), input.size(), header, offset, out, static_cast<size_t>(length), threads,
+                             dictionary);
+        }
+        return result; },
+          "Decompresses original bytes [offset, offset + length), decoding only the blocks needed",
+          pybind11::arg("data"), pybind11::arg("offset"), pybind11::arg("length"), pybind11::arg("threads") = 0,
+          pybind11::arg("dictionary") = nullptr);
+
+    pybind11::class_<EntropyCounter>(m, "EntropyCounter")
+        .def(pybind11::init<const std::vector<size_t> &>(), pybind11::arg("orders") = std::vector<size_t>{0})
+        .def("update", [](EntropyCounter &self, const pybind11::object &data)
+             {
+            BufferView input(data, false);
+            pybind11::gil_scoped_release release;
+            self.update(input.data(), input.size()); },
+             pybind11::arg("data"))
+        .def("entropy", &EntropyCounter::entropy, pybind11::arg("order") = 0)
+        .def_property_readonly("orders", &EntropyCounter::orders)
+        .def_property_readonly("size", &EntropyCounter::size);
+
+    // Batch entry points take either a list of buffers, or one buffer plus
+    // count + 1 offsets, and return (concatenated output, offsets).
+    auto gather_ranges = [](const pybind11::object &data, const pybind11::object &offsets,
+                            std::vector<std::unique_ptr<BufferView>> &views)
+    {
+        std::vector<ByteRange> ranges;
+        if (offsets.is_none())
+        {
+            pybind11::sequence items = pybind11::reinterpret_borrow<pybind11::sequence>(data);
+            ranges.reserve(items.size());
+            for (const auto &item : items)
+            {
+                views.emplace_back(new BufferView(pybind11::reinterpret_borrow<pybind11::object>(item), false));
+                ranges.emplace_back(views.back()->data(), views.back()->size());
+            }
+            return ranges;
+        }
+        views.emplace_back(new BufferView(data, false));
+        const BufferView &buffer = *views.back();
+        std::vector<size_t> bounds = offsets.cast<std::vector<size_t>>();
+        if (bounds.empty() || bounds.front() != 0 || bounds.back() > buffer.size())
+            throw pybind11::value_error("Offsets must start at 0 and end within the data.");
+        for (size_t i = 0; i + 1 < bounds.size(); ++i)
+        {
+            if (bounds[i + 1] < bounds[i])
+                throw pybind11::value_error("Offsets must be non-decreasing.");
+            ranges.emplace_back(buffer.data() + bounds[i], bounds[i + 1] - bounds[i]);
+        }
+        return ranges;
+    };
+
+    m.def("compress_batch", [gather_ranges](const pybind11::object &data, const pybind11::object &offsets,
+                                            size_t memory_budget, size_t block_size, int threads,
+                                            const Dictionary *dictionary, int level)
+          {
+        std::vector<std::unique_ptr<BufferView>> views;
+        std::vector<ByteRange> ranges = gather_ranges(data, offsets, views);
+        CompressOptions options;
+        options.orders = orders_for_level(level);
+        options.memory_budget = memory_budget;
+        options.block_size = block_size;
+        options.threads = threads;
+        options.dictionary = dictionary;
+        std::vector<size_t> output_offsets;
+        std::vector<Symbol> output;
+        {
+            pybind11::gil_scoped_release release;
+            output = compress_batch(ranges, options, output_offsets);
+        }
+        return pybind11::make_tuple(pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()),
+                                    output_offsets); },
+          "Compresses many buffers in one call", pybind11::arg("data"), pybind11::arg("offsets") = pybind11::none(),
+          pybind11::arg("memory_budget") = DEFAULT_MEMORY_BUDGET, pybind11::arg("block_size") = DEFAULT_BLOCK_SIZE,
+          pybind11::arg("threads") = 0, pybind11::arg("dictionary") = nullptr,
+          pybind11::arg("level") = DEFAULT_LEVEL);
+
+    m.def("decompress_batch", [gather_ranges](const pybind11::object &data, const pybind11::object &offsets,
+                                              int threads, const Dictionary *dictionary)
+          {
+        std::vector<std::unique_ptr<BufferView>> views;
+        std::vector<ByteRange> ranges = gather_ranges(data, offsets, views);
+        std::vector<size_t> output_offsets;
+        std::vector<Symbol> output;
+        {
+            pybind11::gil_scoped_release release;
+            output = decompress_batch(ranges, threads, dictionary, output_offsets);
+        }
+        return pybind11::make_tuple(pybind11::bytes(reinterpret_cast<const char*>(output.data()), output.size()),
+                                    output_offsets); },
+          "Decompresses many streams in one call", pybind11::arg("data"), pybind11::arg("offsets") = pybind11::none(),
+          pybind11::arg("threads") = 0, pybind11::arg("dictionary") = nullptr);
+
+    m.def("decompressed_size", [](const pybind11::object &data)
+          {
+        BufferView input(data, false);
+        return read_header(input.data(), input.size()).original_size; },
+          "Returns the original size recorded in a PhiComp header", pybind11::arg("data"));
+
+    m.def("context_orders", [](const pybind11::object &data)
+          {
+        BufferView input(data, false);
+        return read_header(input.data(), input.size()).orders; },
+          "Returns the context orders recorded in a PhiComp header", pybind11::arg("data"));
+
+    m.def("dictionary_id", [](const pybind11::object &data)
+          {
+        BufferView input(data, false);
+        return read_header(input.data(), input.size()).dictionary_id; },
+          "Returns the id of the dictionary a stream needs, or 0 if none", pybind11::arg("data"));
+}
@@ -1,10 +1,12 @@
 #pragma once
 
 #include <vector>
-#include <map>
+#include <array>
 #include <cstdint>
+#include <cstddef>
 #include <string>
-#include <deque>
+#include <memory>
+#include <utility>
 
 // Forward declaration for pybind11
 namespace pybind11
@@ -18,44 +20,566 @@ namespace phicomp
     {
 
         using Symbol = uint8_t;
-        using ContextKey = std::string;
-        using SymbolCounts = std::map<Symbol, uint32_t>;
-        using ContextTree = std::map<ContextKey, SymbolCounts>;
+        using ContextHash = uint64_t;
+
+        // floor(2^64 / phi): the same golden-ratio multiplier used by PhiBalancer.
+        constexpr uint64_t GOLDEN_MULTIPLIER = 11400714819323198485ULL;
+
+        // Default memory budget shared by all context tables of one model.
+        constexpr size_t DEFAULT_MEMORY_BUDGET = 64ULL << 20;
+        constexpr unsigned MIN_TABLE_BITS = 10;
+        constexpr unsigned MAX_TABLE_BITS = 24;
+
+        // Inputs larger than one block are split into independently modelled
+        // blocks that are coded in parallel (format version 4).
+        constexpr size_t DEFAULT_BLOCK_SIZE = 4ULL << 20;
+        constexpr size_t MAX_BLOCK_SIZE = 1ULL << 30;
+        // Seekable containers (format version 6) default to smaller blocks so
+        // that range reads decode little more than they return.
+        constexpr size_t DEFAULT_SEEKABLE_BLOCK_SIZE = 1ULL << 20;
+
+        // One open-addressed context entry. Each slot keeps the most frequent
+        // successor symbols of a single context together with a running total.
+        struct ContextSlot
+        {
+            static constexpr size_t MAX_SYMBOLS = 14;
+            static constexpr uint16_t MAX_COUNT = 0xFFFF;
+
+            uint32_t check;
+            uint32_t total;
+            uint8_t used;
+            Symbol symbols[MAX_SYMBOLS];
+            uint16_t counts[MAX_SYMBOLS];
+        };
+
+        // Fixed-size hash table of ContextSlots for a single model order.
+        // Collision policy: a context hashes to a bucket of two adjacent slots;
+        // a lookup matches either slot by its 32-bit check value. On insert with
+        // no match, the slot with the smaller total is replaced (the first one on
+        // ties), so encoder and decoder always evolve identical tables.
+        class ContextTable
+        {
+        public:
+            explicit ContextTable(unsigned table_bits);
+            const ContextSlot *find(ContextHash hash) const noexcept;
+            ContextSlot &find_or_insert(ContextHash hash) noexcept;
+
+        private:
+            std::vector<ContextSlot> slots;
+            unsigned bits;
+        };
+
+        // Context orders of the default model: the Fibonacci numbers 2..13.
+        const std::vector<size_t> &default_orders();
+
+        // Compression levels select a set of context orders: fewer and shorter
+        // contexts code faster, more contexts compress better. The orders are
+        // recorded in the stream header, so any level decodes anywhere.
+        constexpr int MIN_LEVEL = 1;
+        constexpr int DEFAULT_LEVEL = 3;
+        constexpr int MAX_LEVEL = 5;
+        const std::vector<size_t> &orders_for_level(int level);
+
+        // Rolling polynomial hashes of the last `order` symbols, one per order,
+        // maintained in constant time per symbol from a small ring buffer.
+        class ContextHasher
+        {
+        public:
+            explicit ContextHasher(const std::vector<size_t> &orders);
+            void push(Symbol symbol) noexcept;
+            ContextHash hash(size_t i) const noexcept { return hashes[i]; }
+            bool ready(size_t i) const noexcept { return history_length >= orders[i]; }
+            const std::vector<size_t> &context_orders() const noexcept { return orders; }
+            // Forgets the symbol history, as at the start of a message.
+            void reset() noexcept;
+
+        private:
+            std::vector<size_t> orders;
+            size_t max_order;
+            std::vector<ContextHash> hashes;
+            std::vector<ContextHash> drop_factors;
+            std::vector<Symbol> history;
+            size_t history_mask;
+            size_t history_pos;
+            size_t history_length;
+        };
+
+        // Integer symbol distribution produced by FibonacciContextModel: every
+        // symbol gets `base`, and the `count` predicted symbols listed in
+        // `symbols` (unordered) get `extra[s]` on top. `total` (at most
+        // FREQUENCY_TOTAL) is the sum over all 256 symbols. Entries of `extra`
+        // and `mixed` are zero for symbols that are not listed.
+        constexpr uint32_t FREQUENCY_TOTAL = 1u << 16;
+
+        struct SymbolFrequencies
+        {
+            uint32_t base = 0;
+            uint32_t total = 0;
+            size_t count = 0;
+            std::array<Symbol, 256> symbols{};
+            std::array<uint32_t, 256> extra{};
+            std::array<uint64_t, 256> mixed{};
+        };
 
         class FibonacciContextModel
         {
         public:
-            explicit FibonacciContextModel(const std::vector<size_t> &orders = {2, 3, 5, 8, 13});
+            explicit FibonacciContextModel(const std::vector<size_t> &orders = default_orders(),
+                                           unsigned table_bits = MIN_TABLE_BITS);
             void update(Symbol symbol) noexcept;
+            // Floating-point mixing used by the original symbol coder; kept so
+            // existing method 1 streams still decode.
             std::vector<double> get_probabilities() const;
+            // Fixed-point mixing with the same phi-power weights, bit-exact on
+            // every platform.
+            void get_frequencies(SymbolFrequencies &frequencies) const noexcept;
 
         private:
             std::vector<size_t> fib_orders;
-            size_t max_order;
-            std::vector<ContextTree> context_models;
-            std::deque<Symbol> history;
+            std::vector<ContextTable> context_models;
+            ContextHasher contexts;
             const double phi;
+            // phi^i per order with 12 fractional bits, and the share of the
+            // frequency total every symbol keeps as its escape floor.
+            std::vector<uint32_t> order_weights;
+            uint32_t escape_base;
         };
 
+        // Bitwise variant of the Fibonacci context model. Each byte is coded as
+        // eight binary decisions; every order owns a table of 16-entry buckets of
+        // adaptive bit probabilities (one bucket per context and nibble), and the
+        // per-order predictions are combined by an integer logistic mixer whose
+        // weights start from Fibonacci ratios. All arithmetic is integer-only.
+        class BinaryContextModel
+        {
+        public:
+            explicit BinaryContextModel(const std::vector<size_t> &orders = default_orders(),
+                                        unsigned table_bits = MIN_TABLE_BITS);
+            // Copies re-align the tables within their own allocation.
+            BinaryContextModel(const BinaryContextModel &other);
+            BinaryContextModel &operator=(const BinaryContextModel &other);
+            BinaryContextModel(BinaryContextModel &&) = default;
+            BinaryContextModel &operator=(BinaryContextModel &&) = default;
+            // Probability that the next bit is 1, scaled to 12 bits (1..4095).
+            int predict() noexcept;
+            void update(int bit) noexcept;
+            // Runs predict/update over `data` without coding it.
+            void learn(const Symbol *data, size_t size) noexcept;
+            // Starts a new message: clears the symbol history but keeps the
+            // learned statistics.
+            void reset_history() noexcept;
+            // Restores the untrained state without reallocating the tables.
+            void reset() noexcept;
+            const std::vector<size_t> &orders() const noexcept { return contexts.context_orders(); }
+            unsigned table_bits() const noexcept { return bits; }
+            // Appends / restores the learned statistics (little-endian words).
+            void save(std::vector<Symbol> &out) const;
+            void load(const Symbol *data, size_t size);
+            size_t saved_size() const noexcept;
+
+        private:
+            void select_buckets() noexcept;
+
+            ContextHasher contexts;
+            // All per-order tables live in one allocation, starting at the first
+            // cache-line aligned entry so every bucket is a single line.
+            std::vector<uint32_t> tables;
+            size_t table_offset;
+            std::vector<uint32_t> order0;
+            std::vector<size_t> buckets;
+            std::vector<int32_t> weights;
+            std::vector<int> inputs;
+            std::vector<size_t> slots;
+            unsigned bits;
+            int probability;
+            uint32_t partial_byte;
+            uint32_t nibble_node;
+            int bit_count;
+        };
+
+        // Largest table size (log2 slots per order) whose `slot_bytes`-sized
+        // slots fit `memory_budget`, shrunk to about twice `slots_wanted` so
+        // short messages do not pay for huge tables.
+        unsigned table_bits_for(size_t memory_budget, size_t slot_bytes, uint64_t slots_wanted);
+
+        // Appends bits MSB-first straight into a byte vector.
+        class BitWriter
+        {
+        public:
+            explicit BitWriter(std::vector<Symbol> &out) : out(out), current(0), filled(0) {}
+            void write(uint8_t bit)
+            {
+                current = static_cast<Symbol>((current << 1) | bit);
+                if (++filled == 8)
+                {
+                    out.push_back(current);
+                    current = 0;
+                    filled = 0;
+                }
+            }
+            // Pads the last partial byte with zero bits.
+            void flush()
+            {
+                if (filled > 0)
+                    out.push_back(static_cast<Symbol>(current << (8 - filled)));
+                current = 0;
+                filled = 0;
+            }
+
+        private:
+            std::vector<Symbol> &out;
+            Symbol current;
+            unsigned filled;
+        };
+
+        // Reads bits MSB-first from a byte range, yielding zeros past its end.
+        class BitReader
+        {
+        public:
+            BitReader(const Symbol *data, size_t size) : data(data), size(size), pos(0), current(0), remaining(0) {}
+            uint8_t read() noexcept
+            {
+                if (remaining == 0)
+                {
+                    if (pos >= size)
+                        return 0;
+                    current = data[pos++];
+                    remaining = 8;
+                }
+                --remaining;
+                return (current >> remaining) & 1;
+            }
+
+        private:
+            const Symbol *data;
+            size_t size;
+            size_t pos;
+            Symbol current;
+            unsigned remaining;
+        };
+
+        // 256-symbol coder over FibonacciContextModel. With `fixed_point` the
+        // model is mixed and the interval split using integers only; without
+        // it, the original floating-point mixing is used.
         class ArithmeticCoder
         {
         public:
-            std::vector<Symbol> encode(const std::vector<Symbol> &data);
-            std::vector<Symbol> decode(const std::vector<Symbol> &compressed_data, size_t original_size);
+            explicit ArithmeticCoder(unsigned table_bits = MIN_TABLE_BITS,
+                                     const std::vector<size_t> &orders = default_orders(), bool fixed_point = true)
+                : table_bits(table_bits), orders(orders), fixed_point(fixed_point) {}
+            // Appends the coded form of `data` to `out`.
+            void encode(const Symbol *data, size_t size, std::vector<Symbol> &out);
+            // Decodes exactly `original_size` symbols into `out`.
+            void decode(const Symbol *compressed_data, size_t compressed_size, Symbol *out, size_t original_size);
 
         private:
+            unsigned table_bits;
+            std::vector<size_t> orders;
+            bool fixed_point;
             uint64_t low, high, pending_bits, code_value;
-            std::vector<Symbol> bit_buffer;
-            const std::vector<Symbol> *input_buffer_ptr;
-            size_t bit_idx;
-            void write_bit(uint8_t bit);
-            void flush_encoder();
-            uint8_t read_bit();
+            void write_bit(BitWriter &writer, uint8_t bit);
+            void flush_encoder(BitWriter &writer);
+            void encoder_renormalize(BitWriter &writer);
+            void decoder_renormalize(BitReader &reader);
+        };
+
+        // The model persists across encode/decode calls: every call codes one
+        // self-contained segment (its own interval, flushed at the end) while
+        // the statistics carry over, which is what streaming frames rely on.
+        class BinaryArithmeticCoder
+        {
+        public:
+            explicit BinaryArithmeticCoder(unsigned table_bits = MIN_TABLE_BITS,
+                                           const std::vector<size_t> &orders = default_orders())
+                : model(orders, table_bits) {}
+            // Starts from a pre-trained model instead of empty tables.
+            explicit BinaryArithmeticCoder(const BinaryContextModel &trained) : model(trained) {}
+            const BinaryContextModel &state() const noexcept { return model; }
+            // Rewinds to an untrained (or the given trained) model, reusing memory.
+            void restart() noexcept { model.reset(); }
+            void restart(const BinaryContextModel &trained) { model = trained; }
+            // Appends the coded form of `data` to `out`.
+            void encode(const Symbol *data, size_t size, std::vector<Symbol> &out);
+            // Decodes exactly `original_size` symbols into `out`.
+            void decode(const Symbol *compressed_data, size_t compressed_size, Symbol *out, size_t original_size);
+
+        private:
+            BinaryContextModel model;
+        };
+
+        constexpr size_t DEFAULT_DICTIONARY_BUDGET = 1ULL << 20;
+
+        // A BinaryContextModel trained on sample messages, used as the
+        // starting state for coding small inputs (like a zstd dictionary).
+        // Serialised layout (little-endian):
+        //   "PHID" | version (1) | table bits (1) | order count (1) | orders
+        //   (1 each) | id (4) | model statistics
+        // The id is a hash of everything after it and is never 0.
+        class Dictionary
+        {
+        public:
+            static Dictionary train(const std::vector<std::pair<const Symbol *, size_t>> &samples,
+                                    size_t memory_budget = DEFAULT_DICTIONARY_BUDGET,
+                                    const std::vector<size_t> &orders = default_orders());
+            static Dictionary load(const Symbol *data, size_t size);
+            std::vector<Symbol> serialize() const;
+            uint32_t id() const noexcept { return dictionary_id; }
+            const BinaryContextModel &model() const noexcept { return trained; }
+
+        private:
+            explicit Dictionary(BinaryContextModel model) : trained(std::move(model)), dictionary_id(0) {}
+
+            BinaryContextModel trained;
+            uint32_t dictionary_id;
         };
 
+        // Coding method recorded in the stream header.
+        enum class CodingMethod : uint8_t
+        {
+            Arithmetic = 1, // 256-symbol FCM, floating-point mixing (format version 2)
+            Binary = 2,     // bitwise FCM with logistic mixing (format version 3)
+            FixedPoint = 3, // 256-symbol FCM, fixed-point mixing (format version 2)
+        };
+
+        // Stream layout (all integers little-endian):
+        //   "PHIC" | version (1) | method (1) | original size (8) | table bits (1)
+        //   [| dictionary id (4), present when the method has DICTIONARY_FLAG]
+        //   [| order count (1) | orders (1 each), present with ORDERS_FLAG;
+        //    streams without it use default_orders()]
+        // Version 2/3: the header is followed by a single coded body.
+        // Version 4:   block size (4) | block count (4) | coded length of each
+        //              block (4 each) | the coded blocks back to back.
+        // Version 5:   streamed frames, each raw length (4) | coded length (4) |
+        //              coded bytes, sharing one model; the original size field
+        //              is UNKNOWN_SIZE and a frame with raw length 0 ends it.
+        // Version 6:   seekable container written incrementally: the original
+        //              size field is UNKNOWN_SIZE, independently coded blocks
+        //              follow back to back, then the index footer: block size (4) |
+        //              block count (4) | coded length of each block (4 each) |
+        //              original size (8) | footer size (4) | "PHIX".
+        // With BLOCK_TYPES_FLAG every coded body, block and frame starts with
+        // a BlockType byte. Version 2/3/4 writers set it only when some block
+        // takes a fast path; version 5 writers always set it.
+        // Version 1 streams predate the hashed context tables and are not decodable.
+        struct StreamHeader
+        {
+            uint8_t version;
+            CodingMethod method;
+            uint64_t original_size;
+            unsigned table_bits;
+            // 0 when the stream was coded without a dictionary.
+            uint32_t dictionary_id;
+            std::vector<size_t> orders;
+            bool block_types = false;
+            // Block size (version 4 and 6) or frame size (version 5, 0 if unrecorded).
+            uint32_t block_size;
+            std::vector<uint32_t> block_lengths;
+            size_t body_offset;
+        };
+
+        // How a block is coded in streams with BLOCK_TYPES_FLAG.
+        enum class BlockType : uint8_t
+        {
+            Modelled = 0, // the coding method's body
+            Stored = 1,   // raw bytes, for incompressible data
+            // Long byte runs: token length (varint) | tokens, each a varint
+            // (length << 1 | is_run) followed by the byte value for runs |
+            // literal BlockType (Modelled or Stored) | the literals coded that way.
+            Runs = 2,
+        };
+
+        constexpr uint8_t DICTIONARY_FLAG = 0x80;
+        constexpr uint8_t ORDERS_FLAG = 0x40;
+        constexpr uint8_t BLOCK_TYPES_FLAG = 0x20;
+        // Framed streams (format version 5): the frame size follows the
+        // dictionary ID, and no frame may hold more bytes than it.
+        constexpr uint8_t FRAME_SIZE_FLAG = 0x10;
+        constexpr size_t MAX_CONTEXT_ORDERS = 16;
+        constexpr size_t MAX_CONTEXT_ORDER = 255;
+        constexpr uint64_t UNKNOWN_SIZE = ~0ULL;
+        constexpr size_t DEFAULT_STREAM_MEMORY_BUDGET = 8ULL << 20;
+        constexpr size_t DEFAULT_FRAME_SIZE = 64ULL << 10;
+
+        struct CompressOptions
+        {
+            CodingMethod method = CodingMethod::Binary;
+            size_t memory_budget = DEFAULT_MEMORY_BUDGET;
+            // 0 keeps the whole input in a single block.
+            size_t block_size = DEFAULT_BLOCK_SIZE;
+            // 0 uses the OpenMP default thread count.
+            int threads = 0;
+            std::vector<size_t> orders = default_orders();
+            // Pre-trained starting model; overrides memory_budget and orders
+            // (Binary only).
+            const Dictionary *dictionary = nullptr;
+        };
+
+        StreamHeader make_header(const CompressOptions &options, uint64_t original_size);
+        void write_header(const StreamHeader &header, std::vector<Symbol> &out);
+        StreamHeader read_header(const Symbol *data, size_t size);
+
+        // Throws unless `dictionary` is the one the stream was coded with.
+        void check_dictionary(const StreamHeader &header, const Dictionary *dictionary);
+
         // Internal C++ functions
-        std::vector<Symbol> compress_internal(const std::vector<Symbol> &data);
-        std::vector<Symbol> decompress_internal(const std::vector<Symbol> &data, uint64_t original_size);
+        void compress_internal(const Symbol *data, size_t size, const StreamHeader &header, std::vector<Symbol> &out,
+                               const Dictionary *dictionary = nullptr);
+        void decompress_internal(const Symbol *data, size_t size, const StreamHeader &header, Symbol *out,
+                                 size_t original_size, const Dictionary *dictionary = nullptr);
+
+        // Whole-stream API: header plus single or block-parallel body.
+        std::vector<Symbol> compress_stream(const Symbol *data, size_t size, const CompressOptions &options);
+        void decompress_stream(const Symbol *data, size_t size, const StreamHeader &header, Symbol *out,
+                               int threads, const Dictionary *dictionary = nullptr);
+
+        // Decodes original bytes [offset, offset + length), which must lie
+        // inside the stream. Block containers (versions 4 and 6) decode only
+        // the blocks overlapping the range; single-body streams decode whole.
+        void decompress_range(const Symbol *data, size_t size, const StreamHeader &header, uint64_t offset,
+                              Symbol *out, size_t length, int threads, const Dictionary *dictionary = nullptr);
+
+        // Decodes a complete version 5 framed stream.
+        std::vector<Symbol> decompress_framed(const Symbol *data, size_t size, const Dictionary *dictionary = nullptr);
+
+        // Batch API: many independent streams in one call, coded in parallel
+        // on `threads` OpenMP threads (0 = default). Outputs are concatenated
+        // and `offsets` receives count + 1 boundaries into the result.
+        using ByteRange = std::pair<const Symbol *, size_t>;
+        std::vector<Symbol> compress_batch(const std::vector<ByteRange> &inputs, const CompressOptions &options,
+                                           std::vector<size_t> &offsets);
+        std::vector<Symbol> decompress_batch(const std::vector<ByteRange> &inputs, int threads,
+                                             const Dictionary *dictionary, std::vector<size_t> &offsets);
+
+        // Incremental encoder for the version 5 framed format. Input is
+        // buffered up to one frame; memory use is bounded by the frame size
+        // plus the model tables.
+        class StreamEncoder
+        {
+        public:
+            StreamEncoder(size_t memory_budget = DEFAULT_STREAM_MEMORY_BUDGET, size_t frame_size = DEFAULT_FRAME_SIZE,
+                          const Dictionary *dictionary = nullptr,
+                          const std::vector<size_t> &orders = default_orders());
+            void write(const Symbol *data, size_t size, std::vector<Symbol> &out);
+            // Emits buffered input as a frame; `finish` also ends the stream.
+            void flush(bool finish, std::vector<Symbol> &out);
+            bool finished() const noexcept { return done; }
+
+        private:
+            void write_stream_header(std::vector<Symbol> &out);
+            void emit_frame(const Symbol *data, size_t size, std::vector<Symbol> &out);
+
+            StreamHeader header;
+            BinaryArithmeticCoder coder;
+            std::vector<Symbol> pending;
+            size_t frame_size;
+            bool header_written;
+            bool done;
+        };
+
+        // Incremental encoder for the version 6 seekable container. Input is
+        // buffered up to one block; whole blocks are coded independently, in
+        // parallel on `threads` OpenMP threads, and `finish` appends the index.
+        class SeekableEncoder
+        {
+        public:
+            SeekableEncoder(size_t memory_budget = DEFAULT_MEMORY_BUDGET,
+                            size_t block_size = DEFAULT_SEEKABLE_BLOCK_SIZE,
+                            const std::vector<size_t> &orders = default_orders(), int threads = 0);
+            void write(const Symbol *data, size_t size, std::vector<Symbol> &out);
+            // Codes buffered input and appends the index footer, ending the stream.
+            void finish(std::vector<Symbol> &out);
+            bool finished() const noexcept { return done; }
+
+        private:
+            void write_stream_header(std::vector<Symbol> &out);
+            void emit_blocks(const Symbol *data, size_t size, std::vector<Symbol> &out);
+
+            StreamHeader header;
+            std::vector<Symbol> pending;
+            uint64_t total;
+            int threads;
+            bool header_written;
+            bool done;
+        };
+
+        // Incremental decoder for the version 5 framed format, with the
+        // max_length / needs_input / eof semantics of lzma.LZMADecompressor.
+        class StreamDecoder
+        {
+        public:
+            // `dictionary` must outlive the decoder.
+            explicit StreamDecoder(const Dictionary *dictionary = nullptr) : dictionary(dictionary) {}
+            // Returns at most `max_length` bytes (all available if negative).
+            std::vector<Symbol> decompress(const Symbol *data, size_t size, long long max_length);
+            bool eof() const noexcept { return at_end; }
+            bool needs_input() const noexcept;
+            const std::vector<Symbol> &unused_data() const noexcept { return unused; }
+
+        private:
+            bool frame_available() const noexcept;
+            bool decode_next_frame();
+
+            const Dictionary *dictionary;
+            std::unique_ptr<BinaryArithmeticCoder> coder;
+            bool block_types = false;
+            // Streams written before FRAME_SIZE_FLAG only bound frames by this.
+            size_t frame_limit = MAX_BLOCK_SIZE;
+            std::vector<Symbol> input;
+            size_t input_pos = 0;
+            std::vector<Symbol> output;
+            size_t output_pos = 0;
+            std::vector<Symbol> unused;
+            bool at_end = false;
+        };
+
+        // Open-addressing counter keyed by 64-bit hashes; grows at half load.
+        class CountTable
+        {
+        public:
+            CountTable() : keys(16, 0), counts(16, 0), used(0) {}
+            void increment(uint64_t key);
+            // sum(c * log2(c)) over all counts.
+            double sum_count_log2() const;
+
+        private:
+            void grow();
+            std::vector<uint64_t> keys; // 0 marks an empty slot
+            std::vector<uint64_t> counts;
+            size_t used;
+        };
+
+        // Empirical entropy of a byte stream fed in chunks. Order 0 is the
+        // Shannon entropy of the byte histogram; order k > 0 is the entropy of
+        // a byte given the k bytes before it (contexts are hashed), over the
+        // positions that have k bytes of history. Memory grows with the number
+        // of distinct contexts, so high orders suit samples rather than
+        // unbounded traffic.
+        class EntropyCounter
+        {
+        public:
+            // `orders` are strictly ascending, each at most MAX_CONTEXT_ORDER.
+            explicit EntropyCounter(const std::vector<size_t> &orders = {0});
+            void update(const Symbol *data, size_t size);
+            // Bits per byte at `order`, which must be one of the counted orders.
+            double entropy(size_t order) const;
+            const std::vector<size_t> &orders() const noexcept { return counted_orders; }
+            uint64_t size() const noexcept { return total; }
+
+        private:
+            struct ContextCounts
+            {
+                CountTable contexts;
+                CountTable pairs;
+                uint64_t positions = 0;
+            };
+
+            std::vector<size_t> counted_orders;
+            uint64_t total = 0;
+            std::array<uint64_t, 256> histogram{};
+            // Rolling hashes for the orders above 0; null when only order 0 is counted.
+            std::unique_ptr<ContextHasher> contexts;
+            std::vector<ContextCounts> context_counts;
+        };
 
     } // namespace core
-} // namespace phicomp
\ No newline at end of file
+} // namespace phicomp
@@ -0,0 +1,315 @@
+# phiresearch_compression/files.py
+import builtins
+import io
+import mmap
+import os
+from typing import Optional, Union
+
+from .compressor import (
+    Compressor, Decompressor, FLUSH_SYNC, FLUSH_FINISH, DEFAULT_MEMORY_BUDGET, DEFAULT_SEEKABLE_BLOCK_SIZE,
+    core_bindings, decompress_into, decompressed_size, read_range, _check_buffer, _check_int, _check_level,
+)
+
+FILE_SUFFIX = ".phic"
+
+# Amount of compressed input pulled from the underlying file per read, and
+# of raw input handed to the compressor per call when streaming files.
+READ_CHUNK_SIZE = 1 << 20
+
+PathType = Union[str, bytes, os.PathLike]
+
+
+class _DecompressReader(io.RawIOBase):
+    """Raw reader that decodes one or more concatenated framed streams."""
+    def __init__(self, fp):
+        self._fp = fp
+        self._decompressor = Decompressor()
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        with memoryview(b) as view, view.cast("B") as byte_view:
+            data = self._read(len(byte_view))
+            byte_view[:len(data)] = data
+        return len(data)
+
+    def _read(self, size: int) -> bytes:
+        if self._eof or size == 0:
+            return b""
+        # Loop until some output is produced, more input is exhausted, or
+        # the last stream ends.
+        while True:
+            if self._decompressor.eof:
+                raw = self._decompressor.unused_data or self._fp.read(READ_CHUNK_SIZE)
+                if not raw:
+                    self._eof = True
+                    return b""
+                # Another stream follows the one that just ended.
+                self._decompressor = Decompressor()
+                data = self._decompressor.decompress(raw, size)
+            elif self._decompressor.needs_input:
+                raw = self._fp.read(READ_CHUNK_SIZE)
+                if not raw:
+                    raise EOFError("Compressed file ended before the end-of-stream marker was reached.")
+                data = self._decompressor.decompress(raw, size)
+            else:
+                data = self._decompressor.decompress(b"", size)
+            if data:
+                return data
+
+
+class PhiCompFile(io.BufferedIOBase):
+    """
+    A file object that transparently compresses or decompresses PhiComp
+    framed streams, in the style of gzip.GzipFile and lzma.LZMAFile.
+
+    `filename` is a path or an existing binary file object. `mode` is one of
+    "r", "w", "x" or "a" (optionally with "b"). Writing buffers at most one
+    frame, and reading decodes one frame at a time, so memory use stays
+    constant regardless of file size. Reading accepts concatenated streams.
+    """
+    def __init__(self, filename: Union[PathType, io.IOBase], mode: str = "rb", *,
+                 memory_budget: Optional[int] = None, frame_size: Optional[int] = None,
+                 level: Optional[int] = None):
+        self._fp = None
+        self._closefp = False
+        self._buffer = None
+        self._compressor = None
+
+        if mode in ("r", "rb"):
+            reading = True
+        elif mode in ("w", "wb", "x", "xb", "a", "ab"):
+            reading = False
+        else:
+            raise ValueError(f"Invalid mode: {mode!r}")
+
+        if isinstance(filename, (str, bytes, os.PathLike)):
+            self._fp = builtins.open(filename, mode if "b" in mode else mode + "b")
+            self._closefp = True
+        elif hasattr(filename, "read") or hasattr(filename, "write"):
+            self._fp = filename
+        else:
+            raise TypeError("filename must be a str, bytes, os.PathLike or file object.")
+
+        if reading:
+            self._buffer = io.BufferedReader(_DecompressReader(self._fp))
+        else:
+            self._compressor = Compressor(memory_budget, frame_size, level=level)
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+    @property
+    def closed(self) -> bool:
+        return self._fp is None
+
+    def readable(self) -> bool:
+        self._check_open()
+        return self._buffer is not None
+
+    def writable(self) -> bool:
+        self._check_open()
+        return self._compressor is not None
+
+    def seekable(self) -> bool:
+        return False
+
+    def fileno(self) -> int:
+        self._check_open()
+        return self._fp.fileno()
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        self._check_open()
+        if self._buffer is None:
+            raise io.UnsupportedOperation("File not open for reading.")
+        return self._buffer.read(size)
+
+    def read1(self, size: int = -1) -> bytes:
+        self._check_open()
+        if self._buffer is None:
+            raise io.UnsupportedOperation("File not open for reading.")
+        return self._buffer.read1(size)
+
+    def readinto(self, b) -> int:
+        self._check_open()
+        if self._buffer is None:
+            raise io.UnsupportedOperation("File not open for reading.")
+        return self._buffer.readinto(b)
+
+    def peek(self, size: int = -1) -> bytes:
+        self._check_open()
+        if self._buffer is None:
+            raise io.UnsupportedOperation("File not open for reading.")
+        return self._buffer.peek(size)
+
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        self._check_open()
+        if self._buffer is None:
+            raise io.UnsupportedOperation("File not open for reading.")
+        return self._buffer.readline(size)
+
+    def write(self, data) -> int:
+        self._check_open()
+        if self._compressor is None:
+            raise io.UnsupportedOperation("File not open for writing.")
+        _check_buffer(data)
+        with memoryview(data) as view:
+            length = view.nbytes
+        self._fp.write(self._compressor.compress(data))
+        return length
+
+    def flush(self):
+        """Codes buffered data as a frame so everything written so far is readable."""
+        self._check_open()
+        if self._compressor is not None:
+            self._fp.write(self._compressor.flush(FLUSH_SYNC))
+            self._fp.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._compressor is not None:
+                self._fp.write(self._compressor.flush(FLUSH_FINISH))
+                self._compressor = None
+            elif self._buffer is not None:
+                self._buffer.close()
+                self._buffer = None
+        finally:
+            try:
+                if self._closefp:
+                    self._fp.close()
+            finally:
+                self._fp = None
+                self._closefp = False
+
+
+def open(filename: Union[PathType, io.IOBase], mode: str = "rb", *,
+         memory_budget: Optional[int] = None, frame_size: Optional[int] = None, level: Optional[int] = None,
+         encoding: Optional[str] = None, errors: Optional[str] = None, newline: Optional[str] = None):
+    """
+    Opens a PhiComp compressed file in binary or text mode, like gzip.open().
+
+    Binary modes ("rb", "wb", "xb", "ab") return a PhiCompFile; text modes
+    ("rt", "wt", "xt", "at") wrap it in an io.TextIOWrapper with the given
+    encoding, errors and newline settings.
+    """
+    if "t" in mode:
+        if "b" in mode:
+            raise ValueError(f"Invalid mode: {mode!r}")
+    else:
+        if encoding is not None:
+            raise ValueError("Argument 'encoding' not supported in binary mode")
+        if errors is not None:
+            raise ValueError("Argument 'errors' not supported in binary mode")
+        if newline is not None:
+            raise ValueError("Argument 'newline' not supported in binary mode")
+
+    binary_file = PhiCompFile(filename, mode.replace("t", ""), memory_budget=memory_budget,
+                              frame_size=frame_size, level=level)
+    if "t" in mode:
+        return io.TextIOWrapper(binary_file, encoding, errors, newline)
+    return binary_file
+
+
+def compress_file(src: PathType, dst: Optional[PathType] = None, *,
+                  memory_budget: Optional[int] = None, frame_size: Optional[int] = None,
+                  level: Optional[int] = None, seekable: bool = False, block_size: Optional[int] = None,
+                  threads: Optional[int] = None) -> str:
+    """
+    Compresses the file `src` into `dst` (default: `src` + ".phic") and
+    returns the output path. The input is memory-mapped and fed to the
+    compressor in slices, so memory use is constant.
+
+    By default the output is a framed stream. With `seekable=True` it is a
+    seekable container of independently coded blocks of `block_size` bytes
+    (default 1 MiB, coded on `threads` threads) followed by a block index,
+    so `read_file_range` can serve any byte range without decoding the rest.
+    """
+    src = os.fspath(src)
+    if dst is None:
+        dst = src + (FILE_SUFFIX if isinstance(src, str) else FILE_SUFFIX.encode())
+    if not seekable:
+        if block_size is not None:
+            raise ValueError("block_size applies to seekable files only.")
+        with builtins.open(src, "rb") as fin, \
+                PhiCompFile(dst, "wb", memory_budget=memory_budget, frame_size=frame_size, level=level) as fout:
+            size = os.fstat(fin.fileno()).st_size
+            if size:
+                with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    for offset in range(0, size, READ_CHUNK_SIZE):
+                        fout.write(view[offset:offset + READ_CHUNK_SIZE])
+        return os.fspath(dst)
+
+    if frame_size is not None:
+        raise ValueError("frame_size applies to framed files only.")
+    memory_budget = _check_int("memory_budget", memory_budget, DEFAULT_MEMORY_BUDGET, 1)
+    block_size = _check_int("block_size", block_size, DEFAULT_SEEKABLE_BLOCK_SIZE, 1)
+    threads = _check_int("threads", threads, 0, 1)
+    encoder = core_bindings.SeekableEncoder(memory_budget, block_size, _check_level(level), threads)
+    # Hand the encoder one block per thread at a time so they code in parallel.
+    chunk = block_size * max(1, threads or os.cpu_count() or 1)
+    with builtins.open(src, "rb") as fin, builtins.open(dst, "wb") as fout:
+        size = os.fstat(fin.fileno()).st_size
+        if size:
+            with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for offset in range(0, size, chunk):
+                    fout.write(encoder.compress(view[offset:offset + chunk]))
+        fout.write(encoder.finish())
+    return os.fspath(dst)
+
+
+def read_file_range(src: PathType, offset: int, length: int, *, threads: Optional[int] = None) -> bytes:
+    """
+    Returns original bytes [offset, offset + length) of the compressed file
+    `src`, e.g. to serve HTTP Range requests. The file is memory-mapped, so
+    for seekable files and block streams only the index and the blocks
+    overlapping the range are read from disk and decoded.
+    """
+    with builtins.open(src, "rb") as fin:
+        if os.fstat(fin.fileno()).st_size == 0:
+            raise ValueError(f"{os.fspath(src)!r} is empty and not a PhiComp file.")
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            return read_range(view, offset, length, threads)
+
+
+def decompress_file(src: PathType, dst: Optional[PathType] = None, *, threads: Optional[int] = None) -> str:
+    """
+    Decompresses the file `src` into `dst` (default: `src` without its
+    ".phic" suffix) and returns the output path.
+
+    Framed streams are decoded frame by frame; streams written by
+    `compress` record their size, so the output file is preallocated,
+    memory-mapped and decoded into directly (in parallel for block streams).
+    """
+    src = os.fspath(src)
+    if dst is None:
+        suffix = FILE_SUFFIX if isinstance(src, str) else FILE_SUFFIX.encode()
+        if not src.endswith(suffix) or len(src) == len(suffix):
+            raise ValueError(f"Cannot derive an output name for {src!r}; pass dst explicitly.")
+        dst = src[:-len(suffix)]
+    with builtins.open(src, "rb") as fin:
+        if os.fstat(fin.fileno()).st_size == 0:
+            raise ValueError(f"{src!r} is empty and not a PhiComp file.")
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            try:
+                size = decompressed_size(view)
+            except ValueError:
+                size = None
+            if size is None:
+                with PhiCompFile(fin, "rb") as reader, builtins.open(dst, "wb") as fout:
+                    while True:
+                        chunk = reader.read1(READ_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        fout.write(chunk)
+            else:
+                with builtins.open(dst, "w+b") as fout:
+                    fout.truncate(size)
+                    if size:
+                        with mmap.mmap(fout.fileno(), size) as out_mapped:
+                            decompress_into(view, out_mapped, threads)
+    return os.fspath(dst)
@@ -1,29 +1,101 @@
 # phiresearch_compression/utils.py
-import math
+import threading
+from typing import Dict, Iterable, Tuple
 
-def calculate_shannon_entropy(data: bytes) -> float:
+from .compressor import BytesLike, core_bindings, _check_buffer
+
+# Order 0 plus the Fibonacci context orders, for EntropyEstimator(FIBONACCI_ORDERS).
+FIBONACCI_ORDERS = (0, 1, 2, 3, 5, 8, 13)
+
+def calculate_shannon_entropy(data: BytesLike) -> float:
+    """
+    Calculates the Shannon entropy (order-0) of a given byte stream, in bits
+    per byte. The histogram is built natively without holding the GIL.
+    """
+    return calculate_context_entropy(data, 0)
+
+def calculate_context_entropy(data: BytesLike, order: int) -> float:
+    """
+    Calculates the order-`order` empirical entropy of a byte stream: the
+    bits per byte an ideal static model needs when it predicts each byte from
+    the `order` bytes before it. Order 0 is the Shannon entropy.
+    """
+    estimator = EntropyEstimator((order,))
+    estimator.update(data)
+    return estimator.entropy(order)
+
+def _efficiency(entropy: float, original_size: int, compressed_size: int) -> Tuple[float, float, int]:
+    if original_size == 0:
+        return (100.0, 0.0, compressed_size)
+    theoretical_minimum_bytes = (entropy * original_size) / 8.0
+    if compressed_size == 0:
+        return (0.0, theoretical_minimum_bytes, 0)
+    efficiency = (theoretical_minimum_bytes / compressed_size) * 100.0
+    return (efficiency, theoretical_minimum_bytes, compressed_size)
+
+class EntropyEstimator:
     """
-    Calculates the Shannon entropy (order-0) of a given byte stream.
+    Incremental entropy over data seen in chunks, e.g. inline on production
+    traffic: feed every chunk to `update()` and read `entropy()` at any time.
+
+    `orders` selects the context orders counted (order 0 by default, which
+    only keeps a byte histogram). Orders above 0 keep a count per distinct
+    context, so their memory grows with the data; use them on samples.
+    Instances are thread-safe: the native counter is updated without the
+    GIL, so calls are serialised by a lock.
     """
-    if not data:
-        return 0.0
+    def __init__(self, orders: Iterable[int] = (0,)):
+        orders = tuple(orders)
+        if any(not isinstance(order, int) or order < 0 for order in orders):
+            raise ValueError("orders must be non-negative integers.")
+        try:
+            self._counter = core_bindings.EntropyCounter(sorted(orders))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid entropy orders {orders!r}: {e}") from None
+        self._lock = threading.Lock()
+
+    @property
+    def orders(self) -> Tuple[int, ...]:
+        return tuple(self._counter.orders)
+
+    @property
+    def size(self) -> int:
+        """Total number of bytes seen so far."""
+        with self._lock:
+            return self._counter.size
+
+    def update(self, data: BytesLike) -> None:
+        """Counts the bytes of `data`, continuing the context of earlier chunks."""
+        _check_buffer(data)
+        with self._lock:
+            self._counter.update(data)
 
-    byte_counts = [0] * 256
-    for byte in data:
-        byte_counts[byte] += 1
+    def entropy(self, order: int = 0) -> float:
+        """Returns the order-`order` entropy in bits per byte of everything seen."""
+        if order not in self.orders:
+            raise ValueError(f"Order {order} is not counted; counted orders are {self.orders}.")
+        with self._lock:
+            return self._counter.entropy(order)
 
-    length = len(data)
-    entropy = 0.0
-    for count in byte_counts:
-        if count > 0:
-            probability = count / length
-            entropy -= probability * math.log2(probability)
+    def entropies(self) -> Dict[int, float]:
+        """Returns the entropy for every counted order."""
+        with self._lock:
+            return {order: self._counter.entropy(order) for order in self._counter.orders}
 
-    return entropy
+    def efficiency(self, compressed_size: int, order: int = 0) -> Tuple[float, float, int]:
+        """
+        Like verify_efficiency(), for the data seen so far and the given
+        total compressed size.
+        """
+        entropy = self.entropy(order)
+        with self._lock:
+            size = self._counter.size
+        return _efficiency(entropy, size, compressed_size)
 
-def verify_efficiency(original_data: bytes, compressed_data: bytes) -> tuple[float, float, int]:
+def verify_efficiency(original_data: BytesLike, compressed_data: BytesLike, order: int = 0) -> Tuple[float, float, int]:
     """
-    Calculates compression efficiency against the Shannon limit.
+    Calculates compression efficiency against the Shannon limit, or against
+    the order-`order` entropy when `order` is greater than 0.
 
     Returns:
         A tuple containing:
@@ -31,15 +103,8 @@ def verify_efficiency(original_data: bytes, compressed_data: bytes) -> tuple[flo
         - (float): The theoretical minimum compressed size in bytes.
         - (int): The actual compressed size in bytes.
     """
-    if not original_data:
-        return (100.0, 0.0, len(compressed_data))
-
-    entropy = calculate_shannon_entropy(original_data)
-    theoretical_minimum_bytes = (entropy * len(original_data)) / 8.0
-    actual_compressed_bytes = len(compressed_data)
-
-    if actual_compressed_bytes == 0:
-        return (0.0, theoretical_minimum_bytes, 0)
-
-    efficiency = (theoretical_minimum_bytes / actual_compressed_bytes) * 100.0
-    return (efficiency, theoretical_minimum_bytes, actual_compressed_bytes)
\ No newline at end of file
+    with memoryview(compressed_data) as view:
+        compressed_size = view.nbytes
+    estimator = EntropyEstimator((order,))
+    estimator.update(original_data)
+    return estimator.efficiency(compressed_size, order)
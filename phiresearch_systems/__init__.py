@@ -1,6 +1,6 @@
-from .balancing import PhiBalancer
-from .database import PhiDB
-from .caching import PhiCache
+from .balancing import PhiBalancer, MigrationReport, HASH_FUNCTIONS
+from .database import PhiDB, plan_rebalance
+from .caching import PhiCache, ConcurrentPhiCache, CacheStats
 from .generators import modlo_sequence
 
-__all__ = ['PhiBalancer', 'PhiDB', 'PhiCache', 'modlo_sequence']
\ No newline at end of file
+__all__ = ['PhiBalancer', 'MigrationReport', 'HASH_FUNCTIONS', 'PhiDB', 'plan_rebalance', 'PhiCache', 'ConcurrentPhiCache', 'CacheStats', 'modlo_sequence']
\ No newline at end of file
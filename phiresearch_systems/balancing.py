@@ -1,15 +1,106 @@
 # phiresearch_systems/balancing.py
 import math
-import hashlib
-from typing import List
+import functools
+import threading
+from array import array
+from contextlib import contextmanager
+from fractions import Fraction
+from typing import Dict, Iterator, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# The compiled routing core is built by 'pip install .' alongside the
+# compression extension.
+try:
+    from . import routing_core
+except ImportError as e:
+    raise ImportError(
+        "Could not import routing_core. This usually means the C++ extension "
+        "was not compiled successfully. Please ensure you have a C++17 compiler "
+        "and run 'pip install .' from the project root."
+    ) from e
+
+# Hash functions for request IDs. Each hashes the UTF-8 bytes of the ID, so
+# routes are identical across processes and machines. 'sha256' is the
+# original; the non-cryptographic ones cost a fraction of the CPU.
+HASH_FUNCTIONS = {
+    'sha256': routing_core.HASH_SHA256,
+    'xxhash64': routing_core.HASH_XXHASH64,
+    'fnv1a64': routing_core.HASH_FNV1A64,
+}
+DEFAULT_HASH_FUNCTION = 'sha256'
+
+# Routes of recently seen request IDs are memoized; client IPs and user IDs
+# repeat constantly, and a memo hit skips hashing entirely.
+DEFAULT_MEMO_SIZE = 65536
+
+class MigrationReport(NamedTuple):
+    """The keys whose route changes between two routing configurations."""
+    moved: List[Tuple[str, str, str]]  # (request ID, old server, new server)
+    total: int
+
+    @property
+    def moved_fraction(self) -> float:
+        return len(self.moved) / self.total if self.total else 0.0
+
+def _check_hash_function(hash_function: str) -> int:
+    if not isinstance(hash_function, str):
+        raise TypeError("Hash function must be a string.")
+    if hash_function not in HASH_FUNCTIONS:
+        raise ValueError(f"Unknown hash function {hash_function!r}; choose from {', '.join(HASH_FUNCTIONS)}.")
+    return HASH_FUNCTIONS[hash_function]
+
+def _check_weights(weights: Optional[Sequence[Union[int, float]]], num_servers: int) -> Optional[Tuple[Union[int, float], ...]]:
+    if weights is None:
+        return None
+    if not isinstance(weights, (list, tuple)):
+        raise TypeError("Weights must be a list or tuple.")
+    if len(weights) != num_servers:
+        raise ValueError("There must be exactly one weight per server.")
+    for weight in weights:
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            raise TypeError("All weights must be numbers.")
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError("Weights must be finite and non-negative.")
+    if not any(weights):
+        raise ValueError("At least one server must have a positive weight.")
+    return tuple(weights)
+
+def _interval_starts(weights: Sequence[Union[int, float]]) -> Tuple[List[int], List[int]]:
+    """
+    Splits the 64-bit scaled hash space into one interval per positive
+    weight, sized by weight. Boundaries are exact ceilings, so equal weights
+    give the same index as (scaled_hash * num_servers) >> 64.
+    """
+    total = sum(Fraction(weight) for weight in weights)
+    starts, owners = [], []
+    cumulative = Fraction(0)
+    for index, weight in enumerate(weights):
+        if weight > 0:
+            starts.append(math.ceil(cumulative * 2**64 / total))
+            owners.append(index)
+            cumulative += Fraction(weight)
+    return starts, owners
 
 class PhiBalancer:
     """
     A production-ready, high-performance load balancer using Golden Ratio (phi)
     distribution. This method provides mathematically optimal, even distribution
-    with minimal computational overhead. It is stateless and thread-safe.
+    with minimal computational overhead. It is thread-safe.
+
+    Optional per-server `weights` give each server a share of the keys
+    proportional to its capacity. Servers can be taken out of rotation with
+    mark_down(); only their keys move, each to a deterministic fallback chosen
+    by stepping through the golden-ratio sequence, and they return unchanged
+    after mark_up().
+
+    Requests routed with acquire()/release() (or track()) are counted while
+    in flight. With a `load_factor` ε, a server holding more than
+    (1 + ε) times its share of them is skipped for the key's next candidate
+    ("consistent hashing with bounded loads"), so one hot key cannot
+    overload its server.
     """
-    def __init__(self, servers: List[str]):
+    def __init__(self, servers: List[str], hash_function: str = DEFAULT_HASH_FUNCTION,
+                 weights: Optional[Sequence[Union[int, float]]] = None,
+                 load_factor: Optional[float] = None, memo_size: int = DEFAULT_MEMO_SIZE):
         if not isinstance(servers, (list, tuple)):
             raise TypeError("Server list must be a list or tuple.")
         if not servers:
@@ -26,25 +117,164 @@ class PhiBalancer:
         # properties for hash table operations.
         self.hash_multiplier = 11400714819323198485
 
+        self.hash_function = hash_function
+        self._hash_id = _check_hash_function(hash_function)
+
+        self.weights = _check_weights(weights, self.num_servers)
+        self._starts, self._owners = _interval_starts(self.weights or (1,) * self.num_servers)
+        self._positions = {}
+        for index, server in enumerate(self.servers):
+            self._positions.setdefault(server, []).append(index)
+
+        if load_factor is not None:
+            if isinstance(load_factor, bool) or not isinstance(load_factor, (int, float)):
+                raise TypeError("Load factor must be a number.")
+            if not math.isfinite(load_factor) or load_factor < 0:
+                raise ValueError("Load factor must be finite and non-negative.")
+        self.load_factor = load_factor
+        self._loads = routing_core.LoadTracker(self.num_servers)
+
+        if isinstance(memo_size, bool) or not isinstance(memo_size, int):
+            raise TypeError("Memo size must be an integer.")
+        if memo_size < 0:
+            raise ValueError("Memo size must be non-negative.")
+        self.memo_size = memo_size
+
+        # Routing is precomputed into a native table indexed by the top hash
+        # bits. Health changes build a new immutable table, with a fresh memo,
+        # and swap both in at once, so lookups never take a lock.
+        self._available = [True] * self.num_servers
+        self._health_lock = threading.Lock()
+        self._install_table()
+
+    def _install_table(self) -> None:
+        table = routing_core.RoutingTable(self._starts, self._owners, self._available, self.hash_multiplier)
+        servers, route_key, hash_id = self.servers, table.route_key, self._hash_id
+
+        def lookup(request_id: str) -> str:
+            return servers[route_key(request_id, hash_id)]
+
+        if self.memo_size:
+            lookup = functools.lru_cache(maxsize=self.memo_size)(lookup)
+        self._routing = (table, lookup)
+
+    def _set_available(self, server: str, available: bool) -> None:
+        if server not in self._positions:
+            raise ValueError(f"Unknown server {server!r}.")
+        with self._health_lock:
+            for index in self._positions[server]:
+                self._available[index] = available
+            self._install_table()
+
+    def mark_down(self, server: str) -> None:
+        """
+        Takes a server out of rotation. Its keys move to fallback servers;
+        keys of every other server keep their route.
+        """
+        self._set_available(server, False)
+
+    def mark_up(self, server: str) -> None:
+        """Returns a server to rotation; its keys route to it again."""
+        self._set_available(server, True)
+
+    def is_available(self, server: str) -> bool:
+        if server not in self._positions:
+            raise ValueError(f"Unknown server {server!r}.")
+        return all(self._available[index] for index in self._positions[server])
+
+    @property
+    def available_servers(self) -> Tuple[str, ...]:
+        return tuple(server for server, available in zip(self.servers, self._available) if available)
+
     def get_server_for_request(self, request_id: str) -> str:
         """
         Determines the optimal server for a given request ID.
         This operation is extremely fast, suitable for high-frequency environments.
         Uses deterministic hashing to ensure reproducible results.
+
+        The request ID is hashed and mapped by the native routing core in a
+        single call; repeated IDs are answered from the memo.
+
+        This ignores in-flight loads; use acquire() for bounded-load routing.
+        Raises RuntimeError if every server with a positive weight is down.
         """
-        if not isinstance(request_id, str):
-            raise TypeError("Request ID must be a string.")
-        
-        # Use SHA-256 for deterministic, reproducible hashing
-        # This avoids Python's hash randomization which can vary between runs
-        request_hash = int(hashlib.sha256(request_id.encode('utf-8')).hexdigest()[:16], 16)
-        
-        # Golden Ratio (Fibonacci) Hashing
-        # This is a fast, integer-only operation.
-        scaled_hash = (request_hash * self.hash_multiplier) & (2**64 - 1)
-        
-        # Map the hash to a server index.
-        # The multiplication and shift is faster than floating point division.
-        index = (scaled_hash * self.num_servers) >> 64
-        
-        return self.servers[index]
\ No newline at end of file
+        return self._routing[1](request_id)
+
+    def acquire(self, request_id: str) -> str:
+        """
+        Picks the server for a request under bounded loads and counts the
+        request as in flight on it until release(server) is called. Without
+        a `load_factor` this is get_server_for_request() plus the count.
+        """
+        load_factor = -1.0 if self.load_factor is None else float(self.load_factor)
+        index = self._routing[0].acquire(request_id, self._hash_id, self._loads, load_factor)
+        return self.servers[index]
+
+    def release(self, server: str) -> None:
+        """Marks a request acquired on `server` as finished."""
+        if server not in self._positions:
+            raise ValueError(f"Unknown server {server!r}.")
+        if not any(self._loads.release(index) for index in self._positions[server]):
+            raise ValueError(f"Server {server!r} has no requests in flight.")
+
+    @contextmanager
+    def track(self, request_id: str) -> Iterator[str]:
+        """Acquires a server for the duration of a `with` block."""
+        server = self.acquire(request_id)
+        try:
+            yield server
+        finally:
+            self.release(server)
+
+    def get_load(self, server: str) -> int:
+        """Returns the number of requests in flight on `server`."""
+        if server not in self._positions:
+            raise ValueError(f"Unknown server {server!r}.")
+        return sum(self._loads.load(index) for index in self._positions[server])
+
+    @property
+    def in_flight(self) -> Dict[str, int]:
+        return {server: self.get_load(server) for server in self._positions}
+
+    def _route_into(self, request_ids: Sequence[str], hash_id: int) -> array:
+        indices = array('Q', [0]) * len(request_ids)
+        self._routing[0].route_indices(request_ids, indices, hash_id)
+        return indices
+
+    def route_indices(self, request_ids: Iterable[str]) -> array:
+        """
+        Determines the server index for every request ID in a batch.
+        The whole batch is hashed and mapped in C++ without the GIL, and
+        each index is identical to the one get_server_for_request() picks.
+
+        Returns:
+            An array('Q') of indices into `self.servers`; NumPy can view it
+            without copying via numpy.frombuffer(result, dtype=numpy.uint64).
+        """
+        if isinstance(request_ids, str):
+            raise TypeError("Request IDs must be an iterable of strings, not a single string.")
+        if not isinstance(request_ids, (list, tuple)):
+            request_ids = list(request_ids)
+        return self._route_into(request_ids, self._hash_id)
+
+    def get_servers_for_requests(self, request_ids: Iterable[str]) -> List[str]:
+        """
+        Determines the optimal server for every request ID in a batch; see
+        route_indices().
+        """
+        return list(map(self.servers.__getitem__, self.route_indices(request_ids)))
+
+    def plan_hash_migration(self, request_ids: Iterable[str], hash_function: str) -> MigrationReport:
+        """
+        Reports which request IDs would be routed to a different server if
+        this balancer switched to `hash_function`, without changing it.
+        """
+        new_hash_id = _check_hash_function(hash_function)
+        if not isinstance(request_ids, (list, tuple)):
+            request_ids = list(request_ids)
+        old = self.route_indices(request_ids)
+        new = self._route_into(request_ids, new_hash_id)
+        servers = self.servers
+        moved = [(request_ids[i], servers[o], servers[n])
+                 for i, (o, n) in enumerate(zip(old, new)) if o != n]
+        return MigrationReport(moved, len(request_ids))
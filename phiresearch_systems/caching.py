@@ -1,6 +1,107 @@
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
 from collections import OrderedDict
+import asyncio
+import heapq
+import inspect
+import itertools
 import math
+import sys
+import threading
+import time
+import weakref
+from .balancing import DEFAULT_HASH_FUNCTION, PhiBalancer
+
+# The compressed value tier uses the codec shipped alongside this package.
+try:
+    import phiresearch_compression as phicomp
+except ImportError:
+    phicomp = None
+
+# Returns the number of bytes an entry is charged against `max_bytes`.
+Sizer = Callable[[Hashable, Any], int]
+
+def default_sizer(key: Hashable, value: Any) -> int:
+    """Charges an entry the shallow size of its key and value objects."""
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+class CacheStats(NamedTuple):
+    """Counters of a cache since it was created."""
+    hits: int
+    misses: int
+    evictions: int    # entries dropped for space, including values too large to hold
+    expirations: int  # entries dropped because their TTL ran out
+    entries: int
+    bytes: int        # as measured by the sizer
+    compressed: int   # entries stored compressed
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+def _check_positive(value: Optional[Union[int, float]], name: str, integer: bool = False) -> None:
+    if value is None:
+        return
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+        raise TypeError(f"{name} must be {'an integer' if integer else 'a number'}.")
+    if not value > 0:
+        raise ValueError(f"{name} must be positive.")
+
+class _RecencyIndex:
+    """
+    Counts live entries by access stamp in a Fenwick tree, so the LRU position
+    of an entry (how many entries were used less recently) is a prefix sum in
+    O(log n). Stamps only grow; when they run out, the owner renumbers its
+    entries with reset().
+    """
+    def __init__(self, size: int):
+        self._size = size
+        self._tree = [0] * (size + 1)
+        self.next_stamp = 0
+
+    def full(self) -> bool:
+        return self.next_stamp >= self._size
+
+    def add(self, stamp: int, delta: int) -> None:
+        tree, size = self._tree, self._size
+        i = stamp + 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def position(self, stamp: int) -> int:
+        """Returns the number of live stamps smaller than `stamp`."""
+        tree = self._tree
+        total = 0
+        i = stamp
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def reset(self, count: int, size: int) -> None:
+        """Resizes to `size` stamps with 0..count-1 live, in O(size)."""
+        tree = [0] * (size + 1)
+        for i in range(1, size + 1):
+            if i <= count:
+                tree[i] += 1
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._size = size
+        self._tree = tree
+        self.next_stamp = count
+
+# Entry fields; entries are lists so they can be updated in place.
+_VALUE, _COUNT, _STAMP, _SIZE, _EXPIRES, _CODEC = range(6)
+
+# How an entry's value is stored: as given, or compressed from bytes or
+# from UTF-8 encoded text.
+_RAW, _BYTES, _TEXT = range(3)
+
+# Entries whose Fibonacci weight reaches this (5 accesses) are kept
+# uncompressed, so the hottest keys never pay for decompression.
+DEFAULT_HOT_WEIGHT = 5
 
 class PhiCache:
     """
@@ -8,87 +109,473 @@ class PhiCache:
     Fibonacci-based weighting system for eviction. Items that are accessed
     frequently are given higher "resonance" weights, making them less likely
     to be evicted than older, less important items.
+
+    Entries are kept in one recency-ordered bucket per Fibonacci weight, so
+    eviction only scores the most recent entry of each bucket, and every
+    operation is O(log n) instead of a scan of the whole cache.
+
+    Keys may be any hashable object and values any object. The cache holds
+    at most `capacity` entries and, with `max_bytes`, at most that many bytes
+    as measured by `sizer(key, value)`; either limit may be None. Entries
+    put with a `ttl` (or the `default_ttl`) expire that many seconds later:
+    get() drops them when it finds them, and expire() sweeps the rest.
+
+    With a `compress_threshold`, str and bytes values of at least that many
+    bytes are stored compressed with phiresearch_compression (at
+    `compression_level`, by default the fastest) whenever that makes them
+    smaller, and are charged against `max_bytes` at their compressed size.
+    get() decompresses them; once an entry's Fibonacci weight reaches
+    `hot_weight` it is stored uncompressed from then on.
+
+    PhiCache is not thread-safe; share a ConcurrentPhiCache between threads.
     """
-    def __init__(self, capacity: int = 256):
-        if not isinstance(capacity, int):
+    def __init__(self, capacity: Optional[int] = 256, max_bytes: Optional[int] = None,
+                 sizer: Optional[Sizer] = None, default_ttl: Optional[float] = None,
+                 compress_threshold: Optional[int] = None, compression_level: Optional[int] = None,
+                 hot_weight: int = DEFAULT_HOT_WEIGHT):
+        if capacity is not None and not isinstance(capacity, int):
             raise TypeError("Cache capacity must be an integer.")
-        if capacity <= 0:
+        if capacity is not None and capacity <= 0:
             raise ValueError("Cache capacity must be positive.")
-        self.cache = OrderedDict()
+        _check_positive(max_bytes, "Byte limit", integer=True)
+        _check_positive(default_ttl, "Default TTL")
+        if sizer is not None and not callable(sizer):
+            raise TypeError("Sizer must be callable.")
+        _check_positive(compress_threshold, "Compression threshold", integer=True)
+        _check_positive(hot_weight, "Hot weight", integer=True)
+        if compress_threshold is not None and phicomp is None:
+            raise ImportError("Compressed caching requires phiresearch_compression; run 'pip install .' "
+                              "from the project root.")
+        if compression_level is not None and phicomp is not None:
+            if isinstance(compression_level, bool) or not isinstance(compression_level, int):
+                raise TypeError("Compression level must be an integer.")
+            if not phicomp.compressor.MIN_LEVEL <= compression_level <= phicomp.compressor.MAX_LEVEL:
+                raise ValueError(f"Compression level must be between {phicomp.compressor.MIN_LEVEL} "
+                                 f"and {phicomp.compressor.MAX_LEVEL}.")
         self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.sizer = sizer or default_sizer
+        self.default_ttl = default_ttl
+        self.compress_threshold = compress_threshold
+        if compression_level is None and phicomp is not None:
+            compression_level = phicomp.compressor.MIN_LEVEL
+        self.compression_level = compression_level
+        self.hot_weight = hot_weight
         self.phi = (1 + math.sqrt(5)) / 2
         # Precompute Fibonacci numbers to use as weights
         self.fib_weights = [0, 1]
         while len(self.fib_weights) < 30: # Support high access counts
             self.fib_weights.append(self.fib_weights[-1] + self.fib_weights[-2])
 
+        # key -> [value, access_count, stamp, size, expires_at, codec]
+        self._entries = {}
+        # Keys by weight index, least recently used first.
+        self._buckets = [OrderedDict() for _ in self.fib_weights]
+        self._recency = _RecencyIndex(2 * capacity + 2 if capacity else 64)
+        # (expires_at, sequence, key); stale items are skipped when popped.
+        self._expiries: List[Tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+
+        self._bytes = self._compressed = 0
+        self._hits = self._misses = self._evictions = self._expirations = 0
+
+    def __len__(self) -> int:
+        """Counts stored entries, including expired ones not yet dropped."""
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry, time.monotonic())
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self._hits, self._misses, self._evictions, self._expirations,
+                          len(self._entries), self._bytes, self._compressed)
+
     def _get_weight(self, access_count: int) -> int:
         """Maps access count to a Fibonacci weight."""
         index = min(access_count, len(self.fib_weights) - 1)
         return self.fib_weights[index]
 
-    def get(self, key: str) -> Optional[str]:
+    def _bucket(self, access_count: int) -> OrderedDict:
+        return self._buckets[min(access_count, len(self._buckets) - 1)]
+
+    @staticmethod
+    def _expired(entry: list, now: float) -> bool:
+        return entry[_EXPIRES] is not None and entry[_EXPIRES] <= now
+
+    def _touch(self, key: Hashable, entry: list) -> None:
+        """Makes `entry` the most recently used and counts one more access."""
+        recency = self._recency
+        if entry[_STAMP] is not None:
+            recency.add(entry[_STAMP], -1)
+            del self._bucket(entry[_COUNT])[key]
+            entry[_COUNT] += 1
+        if recency.full():
+            # Renumber the other entries 0..n-1 in recency order.
+            others = sorted((e for k, e in self._entries.items() if k != key), key=lambda e: e[_STAMP])
+            for stamp, other in enumerate(others):
+                other[_STAMP] = stamp
+            recency.reset(len(others), 2 * len(self._entries) + 2)
+        entry[_STAMP] = recency.next_stamp
+        recency.next_stamp += 1
+        recency.add(entry[_STAMP], 1)
+        self._bucket(entry[_COUNT])[key] = None
+
+    def _remove(self, key: Hashable) -> list:
+        entry = self._entries.pop(key)
+        self._recency.add(entry[_STAMP], -1)
+        del self._bucket(entry[_COUNT])[key]
+        self._bytes -= entry[_SIZE]
+        self._compressed -= entry[_CODEC] != _RAW
+        return entry
+
+    def _encode(self, value: Any, access_count: int) -> Tuple[Any, int]:
+        """Returns the value to store for an entry, and how it is stored."""
+        if self.compress_threshold is None or self._get_weight(access_count) >= self.hot_weight:
+            return value, _RAW
+        if isinstance(value, bytes):
+            data, codec = value, _BYTES
+        elif isinstance(value, str):
+            data, codec = value.encode('utf-8'), _TEXT
+        else:
+            return value, _RAW
+        if len(data) < self.compress_threshold:
+            return value, _RAW
+        # Cached values are small, so one thread beats starting a pool.
+        packed = phicomp.compress(data, threads=1, level=self.compression_level)
+        if len(packed) >= len(data):
+            return value, _RAW
+        return packed, codec
+
+    @staticmethod
+    def _decode(entry: list) -> Any:
+        if entry[_CODEC] == _RAW:
+            return entry[_VALUE]
+        data = phicomp.decompress(entry[_VALUE], threads=1)
+        return data.decode('utf-8') if entry[_CODEC] == _TEXT else data
+
+    def _measure(self, key: Hashable, value: Any) -> int:
+        size = self.sizer(key, value)
+        if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+            raise TypeError("Sizer must return a non-negative integer.")
+        return size
+
+    def _store(self, entry: list, value: Any, codec: int, size: int) -> None:
+        """Replaces the stored value of `entry`."""
+        self._bytes += size - entry[_SIZE]
+        self._compressed += (codec != _RAW) - (entry[_CODEC] != _RAW)
+        entry[_VALUE], entry[_SIZE], entry[_CODEC] = value, size, codec
+
+    def _enforce_limits(self) -> None:
+        while ((self.capacity is not None and len(self._entries) > self.capacity)
+               or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            self._evict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
         """
         Retrieves an item from the cache. If found, its access count is
         incremented, and it's moved to the end (most recently used).
+        Returns `default` if the key is missing or has expired.
         """
-        if not isinstance(key, str):
-            raise TypeError("Cache key must be a string.")
-        
-        if key not in self.cache:
-            return None
-        
-        value, access_count = self.cache[key]
-        access_count += 1
-        self.cache[key] = (value, access_count)
-        self.cache.move_to_end(key)
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, time.monotonic()):
+            self._remove(key)
+            self._expirations += 1
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return default
+        self._hits += 1
+        self._touch(key, entry)
+        value = self._decode(entry)
+        if entry[_CODEC] != _RAW and self._get_weight(entry[_COUNT]) >= self.hot_weight:
+            # Hot now: keep it decompressed if it fits, which may need room.
+            size = self._measure(key, value)
+            if self.max_bytes is None or size <= self.max_bytes:
+                self._store(entry, value, _RAW, size)
+                self._enforce_limits()
         return value
 
-    def put(self, key: str, value: str):
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
         """
         Adds an item to the cache. If the cache is full, it evicts the
-        item with the lowest score (a combination of recency and weight).
+        item with the lowest score (a combination of recency and weight)
+        until the entry and byte limits are met again. A value larger than
+        `max_bytes` (after compression) is not stored, and replaces nothing.
         """
-        if not isinstance(key, str):
-            raise TypeError("Cache key must be a string.")
-        if not isinstance(value, str):
-            raise TypeError("Cache value must be a string.")
-        
-        if key in self.cache:
+        _check_positive(ttl, "TTL")
+        entry = self._entries.get(key)
+        value, codec = self._encode(value, 1 if entry is None else entry[_COUNT] + 1)
+        size = self._measure(key, value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            if entry is not None:
+                self._remove(key)
+            self._evictions += 1
+            return
+
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        if entry is not None:
             # Update existing key
-            _, access_count = self.cache[key]
-            self.cache[key] = (value, access_count + 1)
-            self.cache.move_to_end(key)
+            self._store(entry, value, codec, size)
+            entry[_EXPIRES] = expires_at
+            self._touch(key, entry)
         else:
-            # Add new key
-            self.cache[key] = (value, 1) # Start with access count of 1
-            if len(self.cache) > self.capacity:
-                self._evict()
+            # Add new key with an access count of 1
+            entry = self._entries[key] = [None, 1, None, 0, expires_at, _RAW]
+            self._store(entry, value, codec, size)
+            self._touch(key, entry)
+        if expires_at is not None:
+            self._schedule_expiry(key, expires_at)
+        self._enforce_limits()
+
+    def _schedule_expiry(self, key: Hashable, expires_at: float) -> None:
+        expiries = self._expiries
+        if len(expiries) > 2 * len(self._entries) + 64:
+            # Mostly superseded expiry times; rebuild from the live entries.
+            expiries[:] = [(e[_EXPIRES], next(self._sequence), k)
+                           for k, e in self._entries.items() if e[_EXPIRES] is not None and k != key]
+            heapq.heapify(expiries)
+        heapq.heappush(expiries, (expires_at, next(self._sequence), key))
+
+    def expire(self) -> int:
+        """Drops every expired entry and returns how many were dropped."""
+        now = time.monotonic()
+        expiries, dropped = self._expiries, 0
+        while expiries and expiries[0][0] <= now:
+            expires_at, _, key = heapq.heappop(expiries)
+            entry = self._entries.get(key)
+            if entry is not None and entry[_EXPIRES] == expires_at:
+                self._remove(key)
+                dropped += 1
+        self._expirations += dropped
+        return dropped
 
     def _evict(self):
         """
         Evicts the least valuable item. The value is determined by its
         Fibonacci weight divided by its age (position in the LRU order).
         This prioritizes keeping high-weight items even if they are old.
-        
-        Optimized version that finds the minimum in a single pass.
+
+        Within one weight bucket the score only falls with recency, so the
+        lowest score overall is among the most recent entries of the buckets:
+        at most one candidate per Fibonacci weight, each positioned in
+        O(log n). Ties go to the less recently used entry, as in a scan from
+        oldest to newest.
         """
-        if not self.cache:
+        lowest = None
+        # No entry is older than this, so weight / oldest bounds a bucket's
+        # scores from below; buckets are in increasing weight order.
+        oldest = math.pow(len(self._entries), self.phi - 1)
+        for weight, bucket in zip(self.fib_weights, self._buckets):
+            if not bucket:
+                continue
+            if lowest is not None and weight / oldest > lowest[0]:
+                break
+            key = next(reversed(bucket))
+            entry = self._entries[key]
+            position = self._recency.position(entry[_STAMP])
+            # Score = weight / age (older items have smaller position)
+            score = self._get_weight(entry[_COUNT]) / math.pow(position + 1, self.phi - 1)
+            if lowest is None or (score, position) < lowest[:2]:
+                lowest = (score, position, key)
+
+        if lowest is not None:
+            self._remove(lowest[2])
+            self._evictions += 1
+
+# Lock stripes in a ConcurrentPhiCache; threads touching keys on different
+# shards never wait for each other.
+DEFAULT_CACHE_SHARDS = 16
+
+# Marks a miss, since None is a valid cached value.
+_MISSING = object()
+# Result of a load whose leader was cancelled or interrupted; its waiters
+# were not, so they start over and one of them loads the key.
+_RETRY = object()
+
+def _expiry_loop(cache_ref: "weakref.ref[ConcurrentPhiCache]", stop: threading.Event, interval: float) -> None:
+    # Holds the cache weakly, so an unreferenced cache is still collected.
+    while not stop.wait(interval):
+        cache = cache_ref()
+        if cache is None:
             return
-            
-        lowest_score = float('inf')
-        key_to_evict = None
-        
-        # Single pass through items from oldest to newest
-        for i, (key, (value, access_count)) in enumerate(self.cache.items()):
-            weight = self._get_weight(access_count)
-            # Score = weight / age (older items have smaller i)
-            # The phi factor slightly boosts the score of newer items.
-            score = weight / (math.pow(i + 1, self.phi - 1))
-            
-            if score < lowest_score:
-                lowest_score = score
-                key_to_evict = key
-        
-        if key_to_evict:
-            del self.cache[key_to_evict]
\ No newline at end of file
+        cache.expire()
+        del cache
+
+class ConcurrentPhiCache:
+    """
+    A thread-safe PhiCache for servers with thread pools or event loops.
+    Keys are spread over independently locked PhiCache shards by the same
+    golden-ratio routing as PhiBalancer, so concurrent requests rarely
+    contend, and each shard evicts by Fibonacci weight and age on its own.
+    The entry and byte limits are divided evenly between the shards.
+
+    get_or_load() coalesces concurrent misses for a key into a single call
+    of the loader ("single flight"), so a popular key that expires does not
+    send a stampede of requests to the backend.
+
+    With an `expiry_interval`, a daemon thread sweeps expired entries every
+    that many seconds until close() is called. The codec releases the GIL,
+    so shards compress and decompress values in parallel.
+    """
+    def __init__(self, capacity: Optional[int] = 256, shards: int = DEFAULT_CACHE_SHARDS,
+                 hash_function: str = DEFAULT_HASH_FUNCTION, max_bytes: Optional[int] = None,
+                 sizer: Optional[Sizer] = None, default_ttl: Optional[float] = None,
+                 expiry_interval: Optional[float] = None, compress_threshold: Optional[int] = None,
+                 compression_level: Optional[int] = None, hot_weight: int = DEFAULT_HOT_WEIGHT):
+        if capacity is not None and not isinstance(capacity, int):
+            raise TypeError("Cache capacity must be an integer.")
+        if capacity is not None and capacity <= 0:
+            raise ValueError("Cache capacity must be positive.")
+        if isinstance(shards, bool) or not isinstance(shards, int):
+            raise TypeError("Shard count must be an integer.")
+        if shards <= 0:
+            raise ValueError("Shard count must be positive.")
+        _check_positive(max_bytes, "Byte limit", integer=True)
+        _check_positive(expiry_interval, "Expiry interval")
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        # Every shard gets at least one entry and one byte of the limits,
+        # and together exactly the limits.
+        self.num_shards = min(shards, capacity or shards, max_bytes or shards)
+
+        def split(limit: Optional[int], i: int) -> Optional[int]:
+            if limit is None:
+                return None
+            return limit // self.num_shards + (i < limit % self.num_shards)
+
+        self.router = PhiBalancer([f"shard{i}" for i in range(self.num_shards)], hash_function)
+        self.shards = tuple(PhiCache(split(capacity, i), split(max_bytes, i), sizer, default_ttl,
+                                     compress_threshold, compression_level, hot_weight)
+                            for i in range(self.num_shards))
+        self._locks = tuple(threading.Lock() for _ in self.shards)
+        self._by_server = {server: (shard, lock)
+                           for server, shard, lock in zip(self.router.servers, self.shards, self._locks)}
+
+        # (event loop, key) -> future of the load in progress
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+        self._flights_lock = threading.Lock()
+
+        self.expiry_interval = expiry_interval
+        self._stop_expiry = threading.Event()
+        if expiry_interval is not None:
+            threading.Thread(target=_expiry_loop, args=(weakref.ref(self), self._stop_expiry, expiry_interval),
+                             name="PhiCache expiry", daemon=True).start()
+
+    def _shard(self, key: Hashable) -> Tuple[PhiCache, threading.Lock]:
+        if isinstance(key, str):
+            return self._by_server[self.router.get_server_for_request(key)]
+        # Other keys only need to agree within this process, so their own
+        # hash is mixed with the same golden-ratio multiplier.
+        scaled_hash = (hash(key) * self.router.hash_multiplier) & (2**64 - 1)
+        index = (scaled_hash * self.num_shards) >> 64
+        return self.shards[index], self._locks[index]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, key: Hashable) -> bool:
+        shard, lock = self._shard(key)
+        with lock:
+            return key in shard
+
+    @property
+    def bytes(self) -> int:
+        return sum(shard.bytes for shard in self.shards)
+
+    def stats(self) -> CacheStats:
+        """Sums the counters of all shards."""
+        totals = [0] * len(CacheStats._fields)
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                for i, value in enumerate(shard.stats()):
+                    totals[i] += value
+        return CacheStats(*totals)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retrieves an item, counting the access; see PhiCache.get()."""
+        shard, lock = self._shard(key)
+        with lock:
+            return shard.get(key, default)
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Adds an item, evicting from the key's shard if it is full."""
+        shard, lock = self._shard(key)
+        with lock:
+            shard.put(key, value, ttl)
+
+    def expire(self) -> int:
+        """Drops every expired entry, one shard at a time."""
+        dropped = 0
+        for shard, lock in zip(self.shards, self._locks):
+            with lock:
+                dropped += shard.expire()
+        return dropped
+
+    def close(self) -> None:
+        """Stops the background expiry thread, if there is one."""
+        self._stop_expiry.set()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[Hashable], Union[Any, Awaitable[Any]]],
+                          ttl: Optional[float] = None) -> Any:
+        """
+        Returns the cached value for `key`, or calls `loader(key)` to fetch
+        it, caches the result (with `ttl`, if given) and returns it. The
+        loader may be a coroutine function. While a load is in progress, other
+        callers on the same event loop wait for it instead of calling the
+        loader again; if it raises, they all receive the exception and nothing
+        is cached. If the caller running the load is cancelled instead, one of
+        the waiting callers takes over and runs the loader again.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            flight = (loop, key)
+            with self._flights_lock:
+                future = self._flights.get(flight)
+                leader = future is None
+                if leader:
+                    future = loop.create_future()
+                    self._flights[flight] = future
+            if leader:
+                return await self._load(key, loader, ttl, flight, future)
+            # Shielded, so a cancelled waiter does not cancel the shared load.
+            value = await asyncio.shield(future)
+            if value is not _RETRY:
+                return value
+
+    async def _load(self, key: Hashable, loader: Callable[[Hashable], Union[Any, Awaitable[Any]]],
+                    ttl: Optional[float], flight: Tuple[asyncio.AbstractEventLoop, Hashable],
+                    future: asyncio.Future) -> Any:
+        """Runs the load for a flight and resolves its future on every exit."""
+        try:
+            # The previous flight may have finished since the first lookup.
+            value = self.get(key, _MISSING) if key in self else _MISSING
+            if value is _MISSING:
+                value = loader(key)
+                if inspect.isawaitable(value):
+                    value = await value
+                self.put(key, value, ttl)
+        except Exception as e:
+            future.set_exception(e)
+            # The leader raises it; waiters are optional, so mark it retrieved.
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled or interrupted, which the waiters were not.
+            future.set_result(_RETRY)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(flight, None)
+        return value
@@ -0,0 +1,599 @@
+#include "routing_core.h"
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <cstring>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+namespace phisys
+{
+    namespace core
+    {
+
+        namespace
+        {
+            constexpr uint32_t SHA256_ROUND_CONSTANTS[64] = {
+                0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+                0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+                0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+                0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+                0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+                0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+                0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+                0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2};
+
+            inline uint32_t rotr(uint32_t x, unsigned n) { return (x >> n) | (x << (32 - n)); }
+
+            void sha256_compress(uint32_t state[8], const uint8_t block[64])
+            {
+                uint32_t w[64];
+                for (int i = 0; i < 16; ++i)
+                    w[i] = (uint32_t(block[4 * i]) << 24) | (uint32_t(block[4 * i + 1]) << 16) |
+                           (uint32_t(block[4 * i + 2]) << 8) | uint32_t(block[4 * i + 3]);
+                for (int i = 16; i < 64; ++i)
+                {
+                    const uint32_t s0 = rotr(w[i - 15], 7) ^ rotr(w[i - 15], 18) ^ (w[i - 15] >> 3);
+                    const uint32_t s1 = rotr(w[i - 2], 17) ^ rotr(w[i - 2], 19) ^ (w[i - 2] >> 10);
+                    w[i] = w[i - 16] + s0 + w[i - 7] + s1;
+                }
+
+                uint32_t a = state[0], b = state[1], c = state[2], d = state[3];
+                uint32_t e = state[4], f = state[5], g = state[6], h = state[7];
+                for (int i = 0; i < 64; ++i)
+                {
+                    const uint32_t t1 = h + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25)) + ((e & f) ^ (~e & g)) +
+                                        SHA256_ROUND_CONSTANTS[i] + w[i];
+                    const uint32_t t2 = (rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c));
+                    h = g;
+                    g = f;
+                    f = e;
+                    e = d + t1;
+                    d = c;
+                    c = b;
+                    b = a;
+                    a = t1 + t2;
+                }
+                state[0] += a;
+                state[1] += b;
+                state[2] += c;
+                state[3] += d;
+                state[4] += e;
+                state[5] += f;
+                state[6] += g;
+                state[7] += h;
+            }
+        } // namespace
+
+        std::array<uint8_t, 32> sha256(const uint8_t *data, size_t size)
+        {
+            uint32_t state[8] = {0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+                                 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19};
+            size_t position = 0;
+            for (; position + 64 <= size; position += 64)
+                sha256_compress(state, data + position);
+
+            // Pad the tail with 0x80, zeros and the message length in bits.
+            uint8_t tail[128] = {};
+            const size_t remaining = size - position;
+            if (remaining > 0)
+                std::memcpy(tail, data + position, remaining);
+            tail[remaining] = 0x80;
+            const size_t tail_size = remaining < 56 ? 64 : 128;
+            const uint64_t bits = static_cast<uint64_t>(size) * 8;
+            for (int i = 0; i < 8; ++i)
+                tail[tail_size - 1 - i] = static_cast<uint8_t>(bits >> (8 * i));
+            sha256_compress(state, tail);
+            if (tail_size == 128)
+                sha256_compress(state, tail + 64);
+
+            std::array<uint8_t, 32> digest;
+            for (int i = 0; i < 8; ++i)
+                for (int j = 0; j < 4; ++j)
+                    digest[4 * i + j] = static_cast<uint8_t>(state[i] >> (24 - 8 * j));
+            return digest;
+        }
+
+        uint64_t sha256_prefix64(const uint8_t *data, size_t size)
+        {
+            const std::array<uint8_t, 32> digest = sha256(data, size);
+            uint64_t prefix = 0;
+            for (int i = 0; i < 8; ++i)
+                prefix = (prefix << 8) | digest[i];
+            return prefix;
+        }
+
+        namespace
+        {
+            constexpr uint64_t XXH_PRIME1 = 0x9E3779B185EBCA87ULL;
+            constexpr uint64_t XXH_PRIME2 = 0xC2B2AE3D27D4EB4FULL;
+            constexpr uint64_t XXH_PRIME3 = 0x165667B19E3779F9ULL;
+            constexpr uint64_t XXH_PRIME4 = 0x85EBCA77C2B2AE63ULL;
+            constexpr uint64_t XXH_PRIME5 = 0x27D4EB2F165667C5ULL;
+
+            inline uint64_t rotl64(uint64_t x, unsigned n) { return (x << n) | (x >> (64 - n)); }
+
+            inline uint64_t read64(const uint8_t *p)
+            {
+                uint64_t value = 0;
+                for (int i = 7; i >= 0; --i)
+                    value = (value << 8) | p[i];
+                return value;
+            }
+
+            inline uint32_t read32(const uint8_t *p)
+            {
+                return uint32_t(p[0]) | (uint32_t(p[1]) << 8) | (uint32_t(p[2]) << 16) | (uint32_t(p[3]) << 24);
+            }
+
+            inline uint64_t xxh_round(uint64_t accumulator, uint64_t input)
+            {
+                return rotl64(accumulator + input * XXH_PRIME2, 31) * XXH_PRIME1;
+            }
+
+            inline uint64_t xxh_merge(uint64_t accumulator, uint64_t value)
+            {
+                return (accumulator ^ xxh_round(0, value)) * XXH_PRIME1 + XXH_PRIME4;
+            }
+        } // namespace
+
+        uint64_t xxhash64(const uint8_t *data, size_t size, uint64_t seed)
+        {
+            const uint8_t *p = data;
+            const uint8_t *const end = data + size;
+            uint64_t h;
+            if (size >= 32)
+            {
+                uint64_t v1 = seed + XXH_PRIME1 + XXH_PRIME2, v2 = seed + XXH_PRIME2;
+                uint64_t v3 = seed, v4 = seed - XXH_PRIME1;
+                for (; p + 32 <= end; p += 32)
+                {
+                    v1 = xxh_round(v1, read64(p));
+                    v2 = xxh_round(v2, read64(p + 8));
+                    v3 = xxh_round(v3, read64(p + 16));
+                    v4 = xxh_round(v4, read64(p + 24));
+                }
+                h = rotl64(v1, 1) + rotl64(v2, 7) + rotl64(v3, 12) + rotl64(v4, 18);
+                h = xxh_merge(h, v1);
+                h = xxh_merge(h, v2);
+                h = xxh_merge(h, v3);
+                h = xxh_merge(h, v4);
+            }
+            else
+            {
+                h = seed + XXH_PRIME5;
+            }
+            h += static_cast<uint64_t>(size);
+
+            for (; p + 8 <= end; p += 8)
+                h = rotl64(h ^ xxh_round(0, read64(p)), 27) * XXH_PRIME1 + XXH_PRIME4;
+            if (p + 4 <= end)
+            {
+                h = rotl64(h ^ (uint64_t(read32(p)) * XXH_PRIME1), 23) * XXH_PRIME2 + XXH_PRIME3;
+                p += 4;
+            }
+            for (; p < end; ++p)
+                h = rotl64(h ^ (uint64_t(*p) * XXH_PRIME5), 11) * XXH_PRIME1;
+
+            h ^= h >> 33;
+            h *= XXH_PRIME2;
+            h ^= h >> 29;
+            h *= XXH_PRIME3;
+            h ^= h >> 32;
+            return h;
+        }
+
+        uint64_t fnv1a64(const uint8_t *data, size_t size)
+        {
+            uint64_t h = 0xCBF29CE484222325ULL;
+            for (size_t i = 0; i < size; ++i)
+                h = (h ^ data[i]) * 0x100000001B3ULL;
+            return h;
+        }
+
+        uint64_t hash_key(HashFunction function, const uint8_t *data, size_t size)
+        {
+            switch (function)
+            {
+            case HashFunction::Sha256:
+                return sha256_prefix64(data, size);
+            case HashFunction::XxHash64:
+                return xxhash64(data, size);
+            case HashFunction::Fnv1a64:
+                return fnv1a64(data, size);
+            }
+            throw std::invalid_argument("Unknown hash function.");
+        }
+
+        LoadTracker::LoadTracker(size_t num_servers)
+            : num_servers_(num_servers), loads_(new std::atomic<int64_t>[num_servers]), total_(0)
+        {
+            for (size_t i = 0; i < num_servers; ++i)
+                loads_[i].store(0, std::memory_order_relaxed);
+        }
+
+        bool LoadTracker::try_acquire(size_t server, int64_t capacity)
+        {
+            int64_t current = loads_[server].load(std::memory_order_relaxed);
+            while (current < capacity)
+            {
+                if (loads_[server].compare_exchange_weak(current, current + 1, std::memory_order_acq_rel))
+                {
+                    total_.fetch_add(1, std::memory_order_relaxed);
+                    return true;
+                }
+            }
+            return false;
+        }
+
+        void LoadTracker::force_acquire(size_t server)
+        {
+            loads_[server].fetch_add(1, std::memory_order_acq_rel);
+            total_.fetch_add(1, std::memory_order_relaxed);
+        }
+
+        bool LoadTracker::release(size_t server)
+        {
+            int64_t current = loads_[server].load(std::memory_order_relaxed);
+            while (current > 0)
+            {
+                if (loads_[server].compare_exchange_weak(current, current - 1, std::memory_order_acq_rel))
+                {
+                    total_.fetch_sub(1, std::memory_order_relaxed);
+                    return true;
+                }
+            }
+            return false;
+        }
+
+        RoutingTable::RoutingTable(std::vector<uint64_t> starts, std::vector<uint32_t> owners,
+                                   std::vector<bool> available, uint64_t multiplier)
+            : starts_(std::move(starts)), owners_(std::move(owners)), available_(std::move(available)),
+              multiplier_(multiplier), any_available_(false)
+        {
+            const size_t count = starts_.size();
+            if (count == 0 || owners_.size() != count)
+                throw std::invalid_argument("Routing table needs one owner per interval and at least one interval.");
+            if (starts_[0] != 0 || !std::is_sorted(starts_.begin(), starts_.end()))
+                throw std::invalid_argument("Interval starts must be sorted and begin at 0.");
+            for (uint32_t owner : owners_)
+                if (owner >= available_.size())
+                    throw std::invalid_argument("Interval owner is not a server.");
+
+            next_available_.assign(count, 0);
+            size_t next = count; // no live interval seen yet
+            for (size_t pass = 0; pass < 2; ++pass)
+                for (size_t i = count; i-- > 0;)
+                {
+                    if (available_[owners_[i]])
+                        next = i;
+                    if (next != count)
+                        next_available_[i] = static_cast<uint32_t>(next);
+                }
+            any_available_ = next != count;
+
+            // Interval lengths as fractions of the live hash space.
+            constexpr double HASH_SPACE = 18446744073709551616.0; // 2^64
+            shares_.assign(available_.size(), 0.0);
+            double live = 0.0;
+            for (size_t i = 0; i < count; ++i)
+            {
+                const double end = i + 1 < count ? double(starts_[i + 1]) : HASH_SPACE;
+                const double length = end - double(starts_[i]);
+                if (available_[owners_[i]])
+                {
+                    shares_[owners_[i]] += length;
+                    live += length;
+                }
+            }
+            if (live > 0)
+                for (double &share : shares_)
+                    share /= live;
+
+            unsigned bits = 1;
+            while (bits < 20 && (size_t(1) << bits) < 2 * count)
+                ++bits;
+            bucket_shift_ = 64 - bits;
+            buckets_.resize(size_t(1) << bits);
+            for (size_t b = 0; b < buckets_.size(); ++b)
+            {
+                const uint64_t point = static_cast<uint64_t>(b) << bucket_shift_;
+                buckets_[b] = static_cast<uint32_t>(
+                    std::upper_bound(starts_.begin(), starts_.end(), point) - starts_.begin() - 1);
+            }
+        }
+
+        size_t RoutingTable::locate(uint64_t point) const
+        {
+            size_t i = buckets_[point >> bucket_shift_];
+            while (i + 1 < starts_.size() && starts_[i + 1] <= point)
+                ++i;
+            return i;
+        }
+
+        uint64_t RoutingTable::route(uint64_t hash) const
+        {
+            if (!any_available_)
+                throw std::runtime_error("No servers are available.");
+            const uint64_t scaled = hash * multiplier_;
+            const size_t primary = locate(scaled);
+            if (available_[owners_[primary]])
+                return owners_[primary];
+            for (unsigned probe = 1; probe <= MAX_PROBES; ++probe)
+            {
+                const uint32_t owner = owners_[locate(probe_point(hash, probe))];
+                if (available_[owner])
+                    return owner;
+            }
+            return owners_[next_available_[primary]];
+        }
+
+        uint64_t RoutingTable::acquire(uint64_t hash, LoadTracker &tracker, double load_factor) const
+        {
+            if (!any_available_)
+                throw std::runtime_error("No servers are available.");
+            if (tracker.num_servers() != available_.size())
+                throw std::invalid_argument("Load tracker does not match the routing table.");
+
+            const double scale = (1.0 + load_factor) * double(tracker.total() + 1);
+            auto try_server = [&](uint32_t server)
+            {
+                if (!available_[server])
+                    return false;
+                const int64_t capacity = load_factor < 0
+                                             ? std::numeric_limits<int64_t>::max()
+                                             : std::max<int64_t>(1, static_cast<int64_t>(std::ceil(scale * shares_[server])));
+                return tracker.try_acquire(server, capacity);
+            };
+
+            const uint64_t scaled = hash * multiplier_;
+            const size_t primary = locate(scaled);
+            if (try_server(owners_[primary]))
+                return owners_[primary];
+            for (unsigned probe = 1; probe <= MAX_PROBES; ++probe)
+            {
+                const uint32_t owner = owners_[locate(probe_point(hash, probe))];
+                if (try_server(owner))
+                    return owner;
+            }
+            for (size_t step = 1; step <= starts_.size(); ++step)
+            {
+                const uint32_t owner = owners_[(primary + step) % starts_.size()];
+                if (try_server(owner))
+                    return owner;
+            }
+
+            // Every live server is at capacity, which only concurrent
+            // acquires can cause: use the least loaded one.
+            uint32_t best = owners_[next_available_[primary]];
+            for (size_t i = 0; i < starts_.size(); ++i)
+                if (available_[owners_[i]] && tracker.load(owners_[i]) < tracker.load(best))
+                    best = owners_[i];
+            tracker.force_acquire(best);
+            return best;
+        }
+
+        void RoutingTable::route_batch(HashFunction function, const KeyView *keys, size_t count, uint64_t *out) const
+        {
+            if (count > 0 && !any_available_)
+                throw std::runtime_error("No servers are available.");
+            for (size_t i = 0; i < count; ++i)
+                out[i] = route(hash_key(function, keys[i].data, keys[i].size));
+        }
+
+        uint64_t jump_index(uint64_t key, uint64_t num_buckets)
+        {
+            int64_t bucket = -1, next = 0;
+            while (next < static_cast<int64_t>(num_buckets))
+            {
+                bucket = next;
+                key = key * 2862933555777941757ULL + 1;
+                next = static_cast<int64_t>((bucket + 1) * (double(int64_t(1) << 31) / double((key >> 33) + 1)));
+            }
+            return static_cast<uint64_t>(bucket);
+        }
+
+        ShardRouter::ShardRouter(ShardingMode mode, std::vector<uint64_t> seeds, uint64_t multiplier,
+                                 HashFunction function)
+            : mode_(mode), seeds_(std::move(seeds)), multiplier_(multiplier), function_(function)
+        {
+            if (seeds_.empty())
+                throw std::invalid_argument("A shard router needs at least one shard.");
+        }
+
+        uint64_t ShardRouter::route_hash(uint64_t hash) const
+        {
+            const uint64_t scaled = hash * multiplier_;
+            if (mode_ == ShardingMode::Jump)
+                return jump_index(scaled, seeds_.size());
+
+            size_t best = 0;
+            uint64_t best_score = mix64(scaled ^ seeds_[0]);
+            for (size_t i = 1; i < seeds_.size(); ++i)
+            {
+                const uint64_t score = mix64(scaled ^ seeds_[i]);
+                if (score > best_score)
+                {
+                    best = i;
+                    best_score = score;
+                }
+            }
+            return best;
+        }
+
+        void ShardRouter::route_batch(const KeyView *keys, size_t count, uint64_t *out) const
+        {
+            for (size_t i = 0; i < count; ++i)
+                out[i] = route(keys[i].data, keys[i].size);
+        }
+
+    } // namespace core
+} // namespace phisys
+
+// --- Python Bindings ---
+
+namespace
+{
+    phisys::core::HashFunction to_hash_function(int function)
+    {
+        if (function < 0 || function > static_cast<int>(phisys::core::HashFunction::Fnv1a64))
+            throw pybind11::value_error("Unknown hash function " + std::to_string(function) + ".");
+        return static_cast<phisys::core::HashFunction>(function);
+    }
+
+    // A writable buffer holding exactly one uint64 per key.
+    class IndexBuffer
+    {
+    public:
+        IndexBuffer(const pybind11::object &out, size_t count)
+        {
+            if (PyObject_GetBuffer(out.ptr(), &view, PyBUF_WRITABLE) != 0)
+                throw pybind11::error_already_set();
+            if (static_cast<size_t>(view.len) != count * sizeof(uint64_t))
+            {
+                PyBuffer_Release(&view);
+                throw pybind11::value_error("Output buffer must hold one uint64 per request ID.");
+            }
+        }
+        ~IndexBuffer() { PyBuffer_Release(&view); }
+        IndexBuffer(const IndexBuffer &) = delete;
+        IndexBuffer &operator=(const IndexBuffer &) = delete;
+
+        uint64_t *data() const { return static_cast<uint64_t *>(view.buf); }
+
+    private:
+        Py_buffer view;
+    };
+
+    // Borrows the UTF-8 form of a str, which Python caches inside it.
+    phisys::core::KeyView key_view(PyObject *key)
+    {
+        if (!PyUnicode_Check(key))
+            throw pybind11::type_error("Request ID must be a string.");
+        Py_ssize_t size;
+        const char *utf8 = PyUnicode_AsUTF8AndSize(key, &size);
+        if (utf8 == nullptr)
+            throw pybind11::error_already_set();
+        return {reinterpret_cast<const uint8_t *>(utf8), static_cast<size_t>(size)};
+    }
+
+    // Borrows the UTF-8 form of every str in a tuple. Python caches the
+    // encoding inside each str, so the views stay valid while `keys` lives.
+    std::vector<phisys::core::KeyView> key_views(PyObject *keys)
+    {
+        const Py_ssize_t count = PyTuple_GET_SIZE(keys);
+        std::vector<phisys::core::KeyView> views(static_cast<size_t>(count));
+        for (Py_ssize_t i = 0; i < count; ++i)
+        {
+            PyObject *item = PyTuple_GET_ITEM(keys, i);
+            if (!PyUnicode_Check(item))
+                throw pybind11::type_error("Request ID at position " + std::to_string(i) + " must be a string.");
+            views[i] = key_view(item);
+        }
+        return views;
+    }
+
+    // Copies the keys into a new tuple (a tuple is returned as is), which
+    // holds a reference to every str. Borrowing from the caller's list would
+    // let another thread free its strs while they are hashed without the GIL.
+    pybind11::object snapshot_keys(const pybind11::object &keys)
+    {
+        auto snapshot = pybind11::reinterpret_steal<pybind11::object>(PySequence_Tuple(keys.ptr()));
+        if (!snapshot)
+            throw pybind11::error_already_set();
+        return snapshot;
+    }
+} // namespace
+
+PYBIND11_MODULE(routing_core, m)
+{
+    using namespace phisys::core;
+
+    m.doc() = "C++ routing core for PhiBalancer";
+    m.attr("GOLDEN_MULTIPLIER") = GOLDEN_MULTIPLIER;
+    m.attr("HASH_SHA256") = static_cast<int>(HashFunction::Sha256);
+    m.attr("HASH_XXHASH64") = static_cast<int>(HashFunction::XxHash64);
+    m.attr("HASH_FNV1A64") = static_cast<int>(HashFunction::Fnv1a64);
+    m.attr("MODE_JUMP") = static_cast<int>(ShardingMode::Jump);
+    m.attr("MODE_RENDEZVOUS") = static_cast<int>(ShardingMode::Rendezvous);
+
+    m.def("hash_key", [](const std::string &key, int function)
+          { return hash_key(to_hash_function(function), reinterpret_cast<const uint8_t *>(key.data()), key.size()); },
+          "Returns the 64-bit hash of a request ID's UTF-8 bytes",
+          pybind11::arg("key"), pybind11::arg("function") = static_cast<int>(HashFunction::Sha256));
+
+    pybind11::class_<RoutingTable>(m, "RoutingTable")
+        .def(pybind11::init<std::vector<uint64_t>, std::vector<uint32_t>, std::vector<bool>, uint64_t>(),
+             pybind11::arg("starts"), pybind11::arg("owners"), pybind11::arg("available"), pybind11::arg("multiplier"))
+        .def("route", &RoutingTable::route, "Returns the server index for a key hash", pybind11::arg("hash"))
+        .def("route_key", [](const RoutingTable &self, const pybind11::handle &key, int function)
+             {
+            const KeyView view = key_view(key.ptr());
+            return self.route(hash_key(to_hash_function(function), view.data, view.size)); },
+             "Hashes a request ID and returns its server index",
+             pybind11::arg("key"), pybind11::arg("function") = static_cast<int>(HashFunction::Sha256))
+        .def("route_indices", [](const RoutingTable &self, const pybind11::object &keys, const pybind11::object &out,
+                                 int function)
+             {
+            const HashFunction hash_function = to_hash_function(function);
+            pybind11::object snapshot = snapshot_keys(keys);
+            std::vector<KeyView> views = key_views(snapshot.ptr());
+            IndexBuffer indices(out, views.size());
+            pybind11::gil_scoped_release release;
+            self.route_batch(hash_function, views.data(), views.size(), indices.data()); },
+             "Hashes every request ID and writes its server index to `out`",
+             pybind11::arg("keys"), pybind11::arg("out"), pybind11::arg("function") = static_cast<int>(HashFunction::Sha256))
+        .def("acquire", [](const RoutingTable &self, const pybind11::handle &key, int function,
+                           LoadTracker &tracker, double load_factor)
+             {
+            const KeyView view = key_view(key.ptr());
+            return self.acquire(hash_key(to_hash_function(function), view.data, view.size), tracker, load_factor); },
+             "Picks the server for a request ID under bounded loads and counts the request on it",
+             pybind11::arg("key"), pybind11::arg("function"), pybind11::arg("tracker"), pybind11::arg("load_factor"))
+        .def_property_readonly("num_servers", &RoutingTable::num_servers)
+        .def_property_readonly_static("MAX_PROBES", [](const pybind11::object &) { return RoutingTable::MAX_PROBES; });
+
+    pybind11::class_<ShardRouter>(m, "ShardRouter")
+        .def(pybind11::init([](int mode, std::vector<uint64_t> seeds, uint64_t multiplier, int function)
+                            {
+            if (mode != static_cast<int>(ShardingMode::Jump) && mode != static_cast<int>(ShardingMode::Rendezvous))
+                throw pybind11::value_error("Unknown sharding mode " + std::to_string(mode) + ".");
+            return new ShardRouter(static_cast<ShardingMode>(mode), std::move(seeds), multiplier,
+                                   to_hash_function(function)); }),
+             pybind11::arg("mode"), pybind11::arg("seeds"), pybind11::arg("multiplier"),
+             pybind11::arg("function") = static_cast<int>(HashFunction::Sha256))
+        .def("route", [](const ShardRouter &self, const pybind11::handle &key)
+             {
+            const KeyView view = key_view(key.ptr());
+            return self.route(view.data, view.size); },
+             "Returns the shard index for a key", pybind11::arg("key"))
+        .def("route_indices", [](const ShardRouter &self, const pybind11::object &keys, const pybind11::object &out)
+             {
+            pybind11::object snapshot = snapshot_keys(keys);
+            std::vector<KeyView> views = key_views(snapshot.ptr());
+            IndexBuffer indices(out, views.size());
+            pybind11::gil_scoped_release release;
+            self.route_batch(views.data(), views.size(), indices.data()); },
+             "Hashes every key and writes its shard index to `out`", pybind11::arg("keys"), pybind11::arg("out"));
+
+    pybind11::class_<LoadTracker>(m, "LoadTracker")
+        .def(pybind11::init<size_t>(), pybind11::arg("num_servers"))
+        .def("load", [](const LoadTracker &self, size_t server)
+             {
+            if (server >= self.num_servers())
+                throw pybind11::index_error("Server index out of range.");
+            return self.load(server); },
+             pybind11::arg("server"))
+        .def("release", [](LoadTracker &self, size_t server)
+             {
+            if (server >= self.num_servers())
+                throw pybind11::index_error("Server index out of range.");
+            return self.release(server); },
+             "Uncounts one request on `server`; returns False if it had none in flight", pybind11::arg("server"))
+        .def_property_readonly("total", &LoadTracker::total)
+        .def_property_readonly("num_servers", &LoadTracker::num_servers);
+}
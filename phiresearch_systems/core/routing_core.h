@@ -0,0 +1,192 @@
+#pragma once
+
+#include <array>
+#include <atomic>
+#include <memory>
+#include <cstdint>
+#include <cstddef>
+#include <vector>
+
+namespace phisys
+{
+    namespace core
+    {
+
+        // floor(2^64 / phi), the multiplier of PhiBalancer's Fibonacci hashing.
+        constexpr uint64_t GOLDEN_MULTIPLIER = 11400714819323198485ULL;
+
+        // Key hash functions selectable per balancer. Every one is defined
+        // over the UTF-8 bytes of the key, so routes are stable across
+        // processes, machines and Python versions.
+        enum class HashFunction : int
+        {
+            Sha256 = 0,   // first 8 digest bytes, big-endian (the original)
+            XxHash64 = 1, // xxHash64 with seed 0
+            Fnv1a64 = 2,  // 64-bit FNV-1a
+        };
+
+        // SHA-256 of `size` bytes at `data`.
+        std::array<uint8_t, 32> sha256(const uint8_t *data, size_t size);
+
+        // The first 8 digest bytes read big-endian: int(sha256(key).hexdigest()[:16], 16).
+        uint64_t sha256_prefix64(const uint8_t *data, size_t size);
+
+        uint64_t xxhash64(const uint8_t *data, size_t size, uint64_t seed = 0);
+        uint64_t fnv1a64(const uint8_t *data, size_t size);
+
+        // The 64-bit hash of a key under `function`.
+        uint64_t hash_key(HashFunction function, const uint8_t *data, size_t size);
+
+        // High 64 bits of the 128-bit product a * b.
+        inline uint64_t mul_high64(uint64_t a, uint64_t b)
+        {
+#if defined(__SIZEOF_INT128__)
+            return static_cast<uint64_t>((static_cast<unsigned __int128>(a) * b) >> 64);
+#else
+            const uint64_t a_lo = a & 0xFFFFFFFFu, a_hi = a >> 32;
+            const uint64_t b_lo = b & 0xFFFFFFFFu, b_hi = b >> 32;
+            const uint64_t lo_lo = a_lo * b_lo, hi_lo = a_hi * b_lo;
+            const uint64_t lo_hi = a_lo * b_hi, hi_hi = a_hi * b_hi;
+            const uint64_t cross = (lo_lo >> 32) + (hi_lo & 0xFFFFFFFFu) + lo_hi;
+            return hi_hi + (hi_lo >> 32) + (cross >> 32);
+#endif
+        }
+
+        // Golden-ratio (Fibonacci) hashing of a 64-bit key hash onto
+        // [0, num_servers): ((hash * multiplier) mod 2^64 * num_servers) >> 64.
+        inline uint64_t fibonacci_index(uint64_t hash, uint64_t multiplier, uint64_t num_servers)
+        {
+            return mul_high64(hash * multiplier, num_servers);
+        }
+
+        // The UTF-8 bytes of one routing key.
+        struct KeyView
+        {
+            const uint8_t *data;
+            size_t size;
+        };
+
+        // The splitmix64 finalizer, a bijective 64-bit mixer.
+        inline uint64_t mix64(uint64_t z)
+        {
+            z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+            z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+            return z ^ (z >> 31);
+        }
+
+        // The k-th fallback point of a key hash: splitmix64 over the Weyl
+        // sequence hash + k * GOLDEN_MULTIPLIER.
+        inline uint64_t probe_point(uint64_t hash, unsigned probe)
+        {
+            return mix64(hash + probe * GOLDEN_MULTIPLIER);
+        }
+
+        // In-flight request counts per server for bounded-load routing. All
+        // operations are lock-free, so concurrent callers never block.
+        class LoadTracker
+        {
+        public:
+            explicit LoadTracker(size_t num_servers);
+
+            size_t num_servers() const { return num_servers_; }
+            int64_t load(size_t server) const { return loads_[server].load(std::memory_order_relaxed); }
+            int64_t total() const { return total_.load(std::memory_order_relaxed); }
+
+            // Counts a request on `server` if it has fewer than `capacity`
+            // in flight; returns whether it did.
+            bool try_acquire(size_t server, int64_t capacity);
+            void force_acquire(size_t server);
+            // Returns false if `server` had nothing in flight.
+            bool release(size_t server);
+
+        private:
+            size_t num_servers_;
+            std::unique_ptr<std::atomic<int64_t>[]> loads_;
+            std::atomic<int64_t> total_;
+        };
+
+        // Weighted, health-aware routing over golden-ratio intervals. Server
+        // `owners[i]` owns the scaled hashes in [starts[i], starts[i + 1]);
+        // the intervals are sorted with starts[0] == 0 and sized by weight, so
+        // equal weights reproduce fibonacci_index() exactly.
+        //
+        // A key whose server is down probes probe_point(hash, k) for
+        // k = 1..MAX_PROBES, which spreads the keys of a down server over all
+        // live servers in proportion to their weight. Keys on live servers
+        // never move. After MAX_PROBES the next live interval is used.
+        // Tables are immutable; a health change builds a new one.
+        class RoutingTable
+        {
+        public:
+            static constexpr unsigned MAX_PROBES = 32;
+
+            RoutingTable(std::vector<uint64_t> starts, std::vector<uint32_t> owners,
+                         std::vector<bool> available, uint64_t multiplier);
+
+            size_t num_servers() const { return available_.size(); }
+            bool available(size_t server) const { return available_[server]; }
+
+            // The server for a key hash. Throws std::runtime_error if no
+            // server with a positive weight is available.
+            uint64_t route(uint64_t hash) const;
+            void route_batch(HashFunction function, const KeyView *keys, size_t count, uint64_t *out) const;
+
+            // Consistent hashing with bounded loads: takes the first live
+            // server, in the order route() would fall back through them,
+            // that has fewer than ceil((1 + load_factor) * (total + 1) *
+            // share) requests in flight, where share is the server's part of
+            // the live weight, and counts the request on it. A negative
+            // load_factor disables the bound.
+            uint64_t acquire(uint64_t hash, LoadTracker &tracker, double load_factor) const;
+
+        private:
+            // Index of the interval containing `point`, in O(1) expected time
+            // through a lookup table over the top bits of `point`.
+            size_t locate(uint64_t point) const;
+
+            std::vector<uint64_t> starts_;
+            std::vector<uint32_t> owners_;
+            std::vector<bool> available_;
+            std::vector<uint32_t> next_available_; // per interval, the first live interval at or after it
+            std::vector<double> shares_;           // per server, its part of the live weight
+            std::vector<uint32_t> buckets_;
+            unsigned bucket_shift_;
+            uint64_t multiplier_;
+            bool any_available_;
+        };
+
+        // Shard assignment schemes that move few keys when shards change.
+        enum class ShardingMode : int
+        {
+            Jump = 0,       // jump consistent hash: add or remove shards at the end
+            Rendezvous = 1, // highest random weight: add or remove any shard
+        };
+
+        // Jump consistent hash (Lamping & Veach) of `key` onto [0, num_buckets).
+        uint64_t jump_index(uint64_t key, uint64_t num_buckets);
+
+        // Routes keys to shards with a minimal-disruption scheme. Both modes
+        // first apply the golden-ratio multiply to the key hash. Rendezvous
+        // scores shard i as mix64(scaled ^ seeds[i]), where the seed is the
+        // hash of the shard's name, so routes do not depend on shard order.
+        class ShardRouter
+        {
+        public:
+            ShardRouter(ShardingMode mode, std::vector<uint64_t> seeds, uint64_t multiplier, HashFunction function);
+
+            uint64_t route_hash(uint64_t hash) const;
+            uint64_t route(const uint8_t *data, size_t size) const
+            {
+                return route_hash(hash_key(function_, data, size));
+            }
+            void route_batch(const KeyView *keys, size_t count, uint64_t *out) const;
+
+        private:
+            ShardingMode mode_;
+            std::vector<uint64_t> seeds_;
+            uint64_t multiplier_;
+            HashFunction function_;
+        };
+
+    } // namespace core
+} // namespace phisys
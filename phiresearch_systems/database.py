@@ -1,6 +1,19 @@
 # phiresearch_systems/database.py
-from typing import List
-from .balancing import PhiBalancer
+from array import array
+from typing import Iterable, List, Sequence
+from .balancing import DEFAULT_HASH_FUNCTION, MigrationReport, PhiBalancer, routing_core
+
+# How keys are assigned to shards. 'fibonacci' is PhiBalancer's mapping,
+# which remaps almost every key when the shard count changes. 'jump' moves
+# only ~1/N of the keys when shards are added or removed at the end of the
+# list; 'rendezvous' does the same for any shard added or removed, at O(N)
+# per lookup. Both keep the golden-ratio multiplicative mixing.
+SHARDING_MODES = {
+    'fibonacci': None,
+    'jump': routing_core.MODE_JUMP,
+    'rendezvous': routing_core.MODE_RENDEZVOUS,
+}
+DEFAULT_SHARDING_MODE = 'fibonacci'
 
 class PhiDB:
     """
@@ -8,13 +21,31 @@ class PhiDB:
     It ensures mathematical coherence with the load balancer by re-using
     the exact same PhiBalancer logic, which is the core of the Resonance
     Hypothesis.
+
+    Clusters that grow or shrink should use mode='jump' or 'rendezvous';
+    plan_rebalance() lists the keys a change of shards would move.
     """
-    def __init__(self, db_shards: List[str]):
+    def __init__(self, db_shards: List[str], hash_function: str = DEFAULT_HASH_FUNCTION,
+                 mode: str = DEFAULT_SHARDING_MODE):
         if not db_shards:
             raise ValueError("Database shard list cannot be empty.")
-        
+        if not isinstance(mode, str):
+            raise TypeError("Sharding mode must be a string.")
+        if mode not in SHARDING_MODES:
+            raise ValueError(f"Unknown sharding mode {mode!r}; choose from {', '.join(SHARDING_MODES)}.")
+
         # The router is a direct instance of the proven PhiBalancer.
-        self.router = PhiBalancer(db_shards)
+        self.router = PhiBalancer(db_shards, hash_function)
+        self.shards = self.router.servers
+        self.hash_function = hash_function
+        self.mode = mode
+
+        self._shard_router = None
+        if SHARDING_MODES[mode] is not None:
+            hash_id = self.router._hash_id
+            seeds = [routing_core.hash_key(shard.encode('utf-8'), hash_id) for shard in self.shards]
+            self._shard_router = routing_core.ShardRouter(SHARDING_MODES[mode], seeds,
+                                                          self.router.hash_multiplier, hash_id)
 
     def get_shard_for_key(self, key: str) -> str:
         """
@@ -23,4 +54,59 @@ class PhiDB:
         to be handled by the same application server and database shard,
         improving cache locality and performance.
         """
-        return self.router.get_server_for_request(key)
\ No newline at end of file
+        if self._shard_router is None:
+            return self.router.get_server_for_request(key)
+        return self.shards[self._shard_router.route(key)]
+
+    def route_indices(self, keys: Iterable[str]) -> array:
+        """
+        Determines the shard index for every key in a batch, hashed and
+        mapped in C++ without the GIL; see PhiBalancer.route_indices().
+        """
+        if self._shard_router is None:
+            return self.router.route_indices(keys)
+        if isinstance(keys, str):
+            raise TypeError("Keys must be an iterable of strings, not a single string.")
+        if not isinstance(keys, (list, tuple)):
+            keys = list(keys)
+        indices = array('Q', [0]) * len(keys)
+        self._shard_router.route_indices(keys, indices)
+        return indices
+
+    def get_shards_for_keys(self, keys: Iterable[str]) -> List[str]:
+        """Determines the shard for every key in a batch."""
+        return list(map(self.shards.__getitem__, self.route_indices(keys)))
+
+    def plan_rebalance(self, new_shards: List[str], keys: Iterable[str]) -> MigrationReport:
+        """
+        Reports which keys would move if the cluster changed to `new_shards`
+        with the same hash function and mode. The keys are routed in bulk.
+        """
+        return _compare_routes(self, PhiDB(new_shards, self.hash_function, self.mode), keys)
+
+    def plan_hash_migration(self, keys: Iterable[str], hash_function: str) -> MigrationReport:
+        """
+        Reports which keys would move to a different shard if the router
+        switched to `hash_function`; see PhiBalancer.plan_hash_migration().
+        """
+        return _compare_routes(self, PhiDB(list(self.shards), hash_function, self.mode), keys)
+
+def _compare_routes(old: PhiDB, new: PhiDB, keys: Iterable[str]) -> MigrationReport:
+    if isinstance(keys, str):
+        raise TypeError("Keys must be an iterable of strings, not a single string.")
+    if not isinstance(keys, (list, tuple)):
+        keys = list(keys)
+    old_shards, new_shards = old.shards, new.shards
+    moved = [(key, old_shards[o], new_shards[n])
+             for key, o, n in zip(keys, old.route_indices(keys), new.route_indices(keys))
+             if old_shards[o] != new_shards[n]]
+    return MigrationReport(moved, len(keys))
+
+def plan_rebalance(old_shards: Sequence[str], new_shards: Sequence[str], keys: Iterable[str],
+                   mode: str = DEFAULT_SHARDING_MODE,
+                   hash_function: str = DEFAULT_HASH_FUNCTION) -> MigrationReport:
+    """
+    Reports which keys move to a different shard when a cluster sharded with
+    `mode` changes from `old_shards` to `new_shards`.
+    """
+    return PhiDB(list(old_shards), hash_function, mode).plan_rebalance(list(new_shards), keys)
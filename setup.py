@@ -23,6 +23,14 @@ ext_modules = [
         extra_compile_args=extra_compile_args,
         extra_link_args=['-fopenmp'] if sys.platform != 'win32' else ['/openmp']
     ),
+    Extension(
+        'phiresearch_systems.routing_core',
+        ['phiresearch_systems/core/routing_core.cpp'],
+        include_dirs=[get_pybind_include()],
+        language='c++',
+        extra_compile_args=extra_compile_args,
+        extra_link_args=['-fopenmp'] if sys.platform != 'win32' else ['/openmp']
+    ),
 ]
 
 # The setup() function is now minimal. All metadata is in pyproject.toml.
@@ -48,6 +48,275 @@ def test_phi_balancer():
     
     print("✓ PhiBalancer tests passed")
 
+def test_batch_routing():
+    """Test that batch routing matches the single-key path exactly."""
+    print("Testing batch routing...")
+    import hashlib
+    from phiresearch_systems.balancing import PhiBalancer
+
+    # Keys around the SHA-256 padding boundaries, non-ASCII and empty keys.
+    keys = ["", "test_request", "é🙂" * 40] + ["x" * n for n in range(130)]
+    keys += [f"10.0.{i >> 8}.{i & 255}" for i in range(2000)]
+    for num_servers in (1, 3, 10, 97):
+        balancer = PhiBalancer([f"server{i}" for i in range(num_servers)])
+        expected = [balancer.get_server_for_request(key) for key in keys]
+        # The original pure-Python mapping, which the native core must match.
+        reference = []
+        for key in keys:
+            request_hash = int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:16], 16)
+            scaled_hash = (request_hash * 11400714819323198485) & (2**64 - 1)
+            reference.append(balancer.servers[(scaled_hash * num_servers) >> 64])
+        assert expected == reference
+        assert balancer.get_servers_for_requests(keys) == expected
+        assert balancer.get_servers_for_requests(iter(keys)) == expected
+        indices = balancer.route_indices(tuple(keys))
+        assert indices.typecode == 'Q' and len(indices) == len(keys)
+        assert [balancer.servers[i] for i in indices] == expected
+
+    assert len(balancer.route_indices([])) == 0
+
+    # The memo must not change results, and health changes invalidate it.
+    memoized = PhiBalancer(['a', 'b', 'c'])
+    unmemoized = PhiBalancer(['a', 'b', 'c'], memo_size=0)
+    for _ in range(2):
+        assert [memoized.get_server_for_request(k) for k in keys] == \
+            [unmemoized.get_server_for_request(k) for k in keys]
+    down = memoized.get_server_for_request('test_request')
+    memoized.mark_down(down)
+    assert memoized.get_server_for_request('test_request') != down
+    memoized.mark_up(down)
+    assert memoized.get_server_for_request('test_request') == down
+
+    try:
+        balancer.route_indices(["key", 123])
+        assert False, "Should raise TypeError for non-string request IDs"
+    except TypeError:
+        pass
+
+    try:
+        balancer.get_servers_for_requests("key")
+        assert False, "Should raise TypeError for a single string"
+    except TypeError:
+        pass
+
+    print("✓ batch routing tests passed")
+
+def test_hash_functions():
+    """Test selectable hash functions and hash migration reports."""
+    print("Testing hash functions...")
+    from phiresearch_systems.balancing import PhiBalancer, HASH_FUNCTIONS
+    from phiresearch_systems.database import PhiDB
+
+    # Routes must never change across processes or releases.
+    keys = ['', 'user:42', '10.0.0.1', 'Nobody inspects the spammish repetition']
+    expected_routes = {
+        'sha256': [161, 326, 607, 766],
+        'xxhash64': [49, 83, 859, 365],
+        'fnv1a64': [971, 626, 331, 235],
+    }
+    servers = [f"server{i}" for i in range(1000)]
+    for hash_function in HASH_FUNCTIONS:
+        balancer = PhiBalancer(servers, hash_function=hash_function)
+        assert list(balancer.route_indices(keys)) == expected_routes[hash_function], hash_function
+        many = [f"key{i}" for i in range(500)] + ["é🙂" * 20]
+        single = [balancer.get_server_for_request(key) for key in many]
+        assert balancer.get_servers_for_requests(many) == single, hash_function
+
+    assert PhiBalancer(servers).hash_function == 'sha256'
+
+    db = PhiDB(servers[:10])
+    many = [f"key{i}" for i in range(2000)]
+    report = db.plan_hash_migration(many, 'xxhash64')
+    assert report.total == len(many)
+    moved = {key: (old, new) for key, old, new in report.moved}
+    switched = PhiDB(servers[:10], hash_function='xxhash64')
+    for key in many:
+        old, new = db.get_shard_for_key(key), switched.get_shard_for_key(key)
+        assert moved.get(key, (old, old)) == (old, new)
+    assert 0.8 < report.moved_fraction < 0.95
+    assert db.plan_hash_migration(many, 'sha256').moved == []
+
+    try:
+        PhiBalancer(servers, hash_function='md5')
+        assert False, "Should raise ValueError for an unknown hash function"
+    except ValueError:
+        pass
+
+    print("✓ hash function tests passed")
+
+def test_weighted_routing():
+    """Test weighted routing and mark-down/mark-up fallback."""
+    print("Testing weighted routing...")
+    from collections import Counter
+    from phiresearch_systems.balancing import PhiBalancer
+
+    keys = [f"client{i}" for i in range(20000)]
+    servers = ['server0', 'server1', 'server2', 'server3', 'server4']
+    plain = PhiBalancer(servers)
+    expected = plain.get_servers_for_requests(keys)
+
+    # Equal weights keep the original routes exactly.
+    assert PhiBalancer(servers, weights=[3] * 5).get_servers_for_requests(keys) == expected
+
+    # Shares follow the weights; a zero weight drains a server.
+    balancer = PhiBalancer(servers, weights=[1, 2, 3, 0, 4])
+    counts = Counter(balancer.route_indices(keys))
+    assert 3 not in counts
+    for index, weight in ((0, 1), (1, 2), (2, 3), (4, 4)):
+        assert abs(counts[index] / len(keys) - weight / 10) < 0.01, counts
+
+    # Only the keys of a down server move, spread over the live servers.
+    before = balancer.get_servers_for_requests(keys)
+    balancer.mark_down('server2')
+    assert not balancer.is_available('server2')
+    assert 'server2' not in balancer.available_servers
+    after = balancer.get_servers_for_requests(keys)
+    assert [balancer.get_server_for_request(key) for key in keys[:2000]] == after[:2000]
+    moved = [(old, new) for old, new in zip(before, after) if old != new]
+    assert moved and all(old == 'server2' for old, _ in moved)
+    assert {new for _, new in moved} == {'server0', 'server1', 'server4'}
+    balancer.mark_up('server2')
+    assert balancer.get_servers_for_requests(keys) == before
+
+    plain.mark_down('server1')
+    assert 'server1' not in plain.get_servers_for_requests(keys)
+    plain.mark_up('server1')
+    assert plain.get_servers_for_requests(keys) == expected
+
+    for server in servers:
+        plain.mark_down(server)
+    try:
+        plain.get_server_for_request('client0')
+        assert False, "Should raise RuntimeError when every server is down"
+    except RuntimeError:
+        pass
+
+    for weights, error in (([1, 2], ValueError), ([1, -1, 1, 1, 1], ValueError),
+                           ([0] * 5, ValueError), (['1'] * 5, TypeError)):
+        try:
+            PhiBalancer(servers, weights=weights)
+            assert False, f"Should raise {error.__name__} for weights {weights}"
+        except error:
+            pass
+
+    try:
+        balancer.mark_down('unknown')
+        assert False, "Should raise ValueError for an unknown server"
+    except ValueError:
+        pass
+
+    print("✓ weighted routing tests passed")
+
+def test_bounded_load_routing():
+    """Test consistent hashing with bounded loads."""
+    print("Testing bounded-load routing...")
+    import math
+    import threading
+    from phiresearch_systems.balancing import PhiBalancer
+
+    servers = [f"server{i}" for i in range(8)]
+
+    # Without a load factor every request for a key goes to its server.
+    balancer = PhiBalancer(servers)
+    home = balancer.get_server_for_request('hot-tenant')
+    held = [balancer.acquire('hot-tenant') for _ in range(50)]
+    assert set(held) == {home} and balancer.get_load(home) == 50
+    for server in held:
+        balancer.release(server)
+    assert sum(balancer.in_flight.values()) == 0
+
+    # With one, a hot key spills over once its server is full.
+    balancer = PhiBalancer(servers, load_factor=0.25)
+    assert balancer.acquire('hot-tenant') == home
+    held = [home] + [balancer.acquire('hot-tenant') for _ in range(999)]
+    assert max(balancer.in_flight.values()) <= math.ceil(1.25 * 1000 / len(servers))
+    assert balancer.get_load(home) == max(balancer.in_flight.values())
+    for server in held:
+        balancer.release(server)
+
+    # Spill order is deterministic for a given sequence of requests.
+    other = PhiBalancer(servers, load_factor=0.25)
+    assert [other.acquire('hot-tenant') for _ in range(1000)] == held
+
+    # Counts stay exact under concurrent use.
+    balancer = PhiBalancer(servers, load_factor=0.1, weights=[1, 1, 1, 1, 2, 2, 2, 2])
+
+    def worker():
+        for i in range(2000):
+            with balancer.track('hot' if i % 2 else f"key{i}"):
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(balancer.in_flight.values()) == 0
+
+    try:
+        balancer.release('server0')
+        assert False, "Should raise ValueError when nothing is in flight"
+    except ValueError:
+        pass
+
+    try:
+        PhiBalancer(servers, load_factor=-0.5)
+        assert False, "Should raise ValueError for a negative load factor"
+    except ValueError:
+        pass
+
+    print("✓ bounded-load routing tests passed")
+
+def test_resharding():
+    """Test minimal-disruption sharding modes and rebalance planning."""
+    print("Testing resharding...")
+    from phiresearch_systems.balancing import PhiBalancer
+    from phiresearch_systems.database import PhiDB, plan_rebalance
+
+    keys = [f"user:{i}" for i in range(20000)]
+    shards = [f"db{i}" for i in range(10)]
+
+    # The default mode keeps the original PhiBalancer routes.
+    assert PhiDB(shards).get_shards_for_keys(keys) == PhiBalancer(shards).get_servers_for_requests(keys)
+
+    for mode in ('jump', 'rendezvous'):
+        db = PhiDB(shards, mode=mode)
+        routed = db.get_shards_for_keys(keys)
+        assert [db.get_shard_for_key(key) for key in keys[:2000]] == routed[:2000]
+        counts = [routed.count(shard) for shard in shards]
+        assert max(counts) < 1.1 * len(keys) / len(shards), (mode, counts)
+
+        # Adding a shard moves ~1/11 of the keys, all of them to the new shard.
+        report = plan_rebalance(shards, shards + ['db10'], keys, mode=mode)
+        assert report.total == len(keys)
+        assert 0.07 < report.moved_fraction < 0.11, (mode, report.moved_fraction)
+        assert all(new == 'db10' for _, _, new in report.moved)
+        grown = PhiDB(shards + ['db10'], mode=mode)
+        for key, old, new in report.moved[:200]:
+            assert db.get_shard_for_key(key) == old and grown.get_shard_for_key(key) == new
+
+        # Removing the last shard moves only that shard's keys.
+        report = db.plan_rebalance(shards[:-1], keys)
+        assert report.moved and all(old == 'db9' for _, old, _ in report.moved)
+
+    # Rendezvous routes do not depend on shard order, and removing any
+    # shard only moves the keys it held.
+    assert PhiDB(shards, mode='rendezvous').get_shards_for_keys(keys) == \
+        PhiDB(shards[::-1], mode='rendezvous').get_shards_for_keys(keys)
+    report = plan_rebalance(shards, shards[:4] + shards[5:], keys, mode='rendezvous')
+    assert report.moved and all(old == 'db4' for _, old, _ in report.moved)
+
+    # The Fibonacci mapping remaps far more keys.
+    assert plan_rebalance(shards, shards + ['db10'], keys).moved_fraction > 0.4
+
+    try:
+        PhiDB(shards, mode='ring')
+        assert False, "Should raise ValueError for an unknown sharding mode"
+    except ValueError:
+        pass
+
+    print("✓ resharding tests passed")
+
 def test_phi_cache():
     """Test PhiCache fixes and improvements."""
     print("Testing PhiCache...")
@@ -79,24 +348,290 @@ def test_phi_cache():
         pass
     
     try:
-        cache.put(123, 'value')
-        assert False, "Should raise TypeError for non-string key"
+        cache.put(['unhashable'], 'value')
+        assert False, "Should raise TypeError for an unhashable key"
     except TypeError:
         pass
     
     try:
-        cache.put('key', 123)
-        assert False, "Should raise TypeError for non-string value"
+        cache.get(['unhashable'])
+        assert False, "Should raise TypeError for an unhashable key"
     except TypeError:
         pass
     
+    print("✓ PhiCache tests passed")
+
+def test_cache_limits_and_ttl():
+    """Test byte limits, TTL expiry, arbitrary keys and values, and stats."""
+    print("Testing PhiCache limits and TTL...")
+    import time
+    from phiresearch_systems import CacheStats, ConcurrentPhiCache, PhiCache
+
+    # Any hashable key and any value, including None.
+    cache = PhiCache(10)
+    cache.put(42, {'user': 42})
+    cache.put(('a', 1), None)
+    assert cache.get(42) == {'user': 42}
+    assert ('a', 1) in cache and cache.get(('a', 1), 'missing') is None
+    assert cache.get('absent', 'missing') == 'missing'
+
+    # The byte limit holds many small values or few large ones.
+    cache = PhiCache(None, max_bytes=1000, sizer=lambda key, value: len(value))
+    for i in range(100):
+        cache.put(i, b'x' * 10)
+    assert len(cache) == 100 and cache.bytes == 1000
+    cache.get(5)
+    cache.put('big', b'y' * 400)
+    assert cache.bytes <= 1000 and 5 in cache
+    cache.put('huge', b'z' * 1001)  # larger than the whole cache
+    assert 'huge' not in cache and cache.bytes <= 1000
+    cache.put(5, b'y' * 1001)       # replacing with an oversized value drops the key
+    assert 5 not in cache
+    stats = cache.stats()
+    assert isinstance(stats, CacheStats) and stats.bytes == cache.bytes
+    assert stats.entries == len(cache) and stats.evictions == 101 - len(cache) + 1
+
+    # Entries expire lazily on get and in bulk on expire().
+    cache = PhiCache(100, default_ttl=0.05)
+    cache.put('short', 1)
+    cache.put('long', 2, ttl=60)
+    for i in range(10):
+        cache.put(i, i)
+    time.sleep(0.1)
+    assert 'short' not in cache
+    assert cache.get('short') is None and cache.get('long') == 2
+    assert cache.expire() == 10 and len(cache) == 1
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.expirations) == (1, 1, 11)
+    assert stats.hit_ratio == 0.5
+
+    # The concurrent cache splits both limits and sweeps in the background.
+    cache = ConcurrentPhiCache(None, shards=4, max_bytes=4000, sizer=lambda key, value: len(value),
+                               expiry_interval=0.02)
+    assert sum(shard.max_bytes for shard in cache.shards) == 4000
+    cache.put(7, 'seven', ttl=0.05)
+    cache.put('eight', 'eight')
+    assert cache.get(7) == 'seven' and cache.bytes == 10
+    time.sleep(0.2)
+    assert len(cache) == 1 and cache.stats().expirations == 1
+    cache.close()
+
+    try:
+        PhiCache(10, max_bytes=0)
+        assert False, "Should raise ValueError for a non-positive byte limit"
+    except ValueError:
+        pass
+
     try:
-        cache.get(123)
-        assert False, "Should raise TypeError for non-string key"
+        PhiCache(10).put('key', 'value', ttl=-1)
+        assert False, "Should raise ValueError for a negative TTL"
+    except ValueError:
+        pass
+
+    try:
+        PhiCache(10, sizer=lambda key, value: -1).put('key', 'value')
+        assert False, "Should raise TypeError for a negative size"
     except TypeError:
         pass
-    
-    print("✓ PhiCache tests passed")
+
+    print("✓ PhiCache limits and TTL tests passed")
+
+def test_compressed_cache():
+    """Test the compressed value tier of PhiCache."""
+    print("Testing compressed PhiCache values...")
+    import json
+    import random
+    from phiresearch_systems import ConcurrentPhiCache, PhiCache
+
+    def blob(i):
+        return json.dumps({"id": i, "items": [{"sku": f"item-{n}", "qty": n % 7} for n in range(60)]})
+
+    length = lambda key, value: len(value)
+    plain = PhiCache(None, max_bytes=200000, sizer=length)
+    packed = PhiCache(None, max_bytes=200000, sizer=length, compress_threshold=256)
+    for i in range(500):
+        plain.put(i, blob(i))
+        packed.put(i, blob(i))
+    # Compressed bytes count against the limit, so far more entries fit.
+    assert len(packed) > 3 * len(plain), (len(packed), len(plain))
+    assert packed.stats().compressed == len(packed) and packed.bytes <= 200000
+    assert packed.get(499) == blob(499)
+
+    # Small values, incompressible values and other types are stored as is.
+    cache = PhiCache(10, compress_threshold=256)
+    cache.put('small', 'x' * 10)
+    cache.put('bytes', b'abc' * 1000)
+    rng = random.Random(0)
+    cache.put('random', bytes(rng.getrandbits(8) for _ in range(1024)))
+    cache.put('dict', {'payload': 'y' * 1000})
+    assert cache.get('bytes') == b'abc' * 1000 and isinstance(cache.get('bytes'), bytes)
+    assert cache.get('dict') == {'payload': 'y' * 1000} and cache.get('small') == 'x' * 10
+    assert cache.stats().compressed == 1
+
+    # A hot entry is decompressed once and kept that way.
+    cache = PhiCache(10, compress_threshold=64, hot_weight=5)
+    cache.put('hot', blob(1))
+    assert cache.stats().compressed == 1
+    for _ in range(4):
+        assert cache.get('hot') == blob(1)
+    assert cache.stats().compressed == 0
+    cache.put('hot', blob(2))  # rewriting a hot entry does not compress it
+    assert cache.stats().compressed == 0 and cache.get('hot') == blob(2)
+
+    concurrent = ConcurrentPhiCache(100, shards=4, compress_threshold=256)
+    concurrent.put('blob', blob(3))
+    assert concurrent.get('blob') == blob(3) and concurrent.stats().compressed == 1
+
+    try:
+        PhiCache(10, compress_threshold=64, compression_level=99)
+        assert False, "Should raise ValueError for an invalid compression level"
+    except ValueError:
+        pass
+
+    print("✓ compressed PhiCache tests passed")
+
+def test_cache_eviction_parity():
+    """Test that bucketed eviction picks the same victims as a full scan."""
+    print("Testing PhiCache eviction parity...")
+    import math
+    import random
+    from phiresearch_systems.caching import PhiCache
+
+    def reference_victim(order, counts, fib_weights, phi):
+        scores = [fib_weights[min(counts[key], 29)] / math.pow(i + 1, phi - 1)
+                  for i, key in enumerate(order)]
+        return order[scores.index(min(scores))]
+
+    rng = random.Random(7)
+    for capacity in (1, 2, 5, 64):
+        cache = PhiCache(capacity)
+        order, counts = [], {}
+        for _ in range(5000):
+            key = f"k{int(rng.paretovariate(1.2)) % (capacity * 4)}"
+            if key in counts:
+                counts[key] += 1
+                order.remove(key)
+                order.append(key)
+                if rng.random() < 0.5:
+                    assert cache.get(key) == key
+                else:
+                    cache.put(key, key)
+                continue
+            assert cache.get(key) is None
+            cache.put(key, key)
+            order.append(key)
+            counts[key] = 1
+            if len(order) > capacity:
+                victim = reference_victim(order, counts, cache.fib_weights, cache.phi)
+                order.remove(victim)
+                del counts[victim]
+            assert len(cache) == len(order)
+            assert all(k in cache for k in order)
+
+    print("✓ PhiCache eviction parity tests passed")
+
+def test_concurrent_cache():
+    """Test the sharded, thread-safe cache and single-flight loading."""
+    print("Testing ConcurrentPhiCache...")
+    import asyncio
+    import threading
+    from phiresearch_systems import ConcurrentPhiCache, PhiBalancer
+
+    cache = ConcurrentPhiCache(1000, shards=8)
+    assert sum(shard.capacity for shard in cache.shards) == 1000
+    assert ConcurrentPhiCache(3).num_shards == 3
+
+    # Keys go to shards exactly as PhiBalancer routes them.
+    keys = [f"user:{i}" for i in range(500)]
+    for key in keys:
+        cache.put(key, key.upper())
+    routes = PhiBalancer([f"shard{i}" for i in range(8)]).route_indices(keys)
+    for key, index in zip(keys, routes):
+        assert key in cache.shards[index]
+        assert cache.get(key) == key.upper()
+
+    # Concurrent writers and readers never exceed the capacity.
+    def worker(offset):
+        for i in range(3000):
+            key = f"k{(i * 7 + offset) % 1500}"
+            if cache.get(key) is None:
+                cache.put(key, key)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) <= 1000
+    assert all(len(shard) <= shard.capacity for shard in cache.shards)
+
+    async def coalesce():
+        cache = ConcurrentPhiCache(100)
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return f"loaded {key}"
+
+        values = await asyncio.gather(*(cache.get_or_load("hot", loader) for _ in range(50)))
+        assert values == ["loaded hot"] * 50 and calls == ["hot"]
+        assert await cache.get_or_load("hot", loader) == "loaded hot" and calls == ["hot"]
+        assert cache.get("hot") == "loaded hot"
+
+        async def failing(key):
+            await asyncio.sleep(0.01)
+            raise ConnectionError("backend down")
+
+        results = await asyncio.gather(*(cache.get_or_load("cold", failing) for _ in range(5)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, ConnectionError) for r in results)
+        assert cache.get("cold") is None
+        # A failed flight is not remembered; sync loaders work too.
+        assert await cache.get_or_load("cold", str.upper) == "COLD"
+
+    class Interrupted(BaseException):
+        pass
+
+    async def leader_aborts():
+        cache = ConcurrentPhiCache(100)
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return f"loaded {key}"
+
+        # Cancelling the caller running the load hands it to a waiter.
+        leader = asyncio.ensure_future(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get_or_load("key", loader)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await asyncio.gather(*waiters) == ["loaded key"] * 3 and calls == ["key", "key"]
+        assert leader.cancelled() and not cache._flights
+
+        # So does a leader interrupted by a BaseException; only it sees it.
+        async def interrupting(key):
+            await asyncio.sleep(0.01)
+            raise Interrupted()
+
+        results = await asyncio.gather(cache.get_or_load("other", interrupting),
+                                       *(cache.get_or_load("other", loader) for _ in range(3)),
+                                       return_exceptions=True)
+        assert isinstance(results[0], Interrupted) and results[1:] == ["loaded other"] * 3
+        assert not cache._flights
+
+    asyncio.run(coalesce())
+    asyncio.run(asyncio.wait_for(leader_aborts(), 5))
+
+    try:
+        ConcurrentPhiCache(10, shards=0)
+        assert False, "Should raise ValueError for a non-positive shard count"
+    except ValueError:
+        pass
+
+    print("✓ ConcurrentPhiCache tests passed")
 
 def test_modlo_sequence():
     """Test modlo_sequence fixes and improvements."""
@@ -131,6 +666,664 @@ def test_modlo_sequence():
     
     print("✓ modlo_sequence tests passed")
 
+def _load_phicomp():
+    """Returns the compression package, or None when the C++ extension is missing."""
+    try:
+        import phiresearch_compression
+    except ImportError as e:
+        if "core_bindings" in str(e):
+            print("  (skipped: C++ extension not compiled)")
+            return None
+        raise
+    return phiresearch_compression
+
+def test_compression_roundtrip():
+    """Test that compressed streams decode back to the original data."""
+    print("Testing compression round trip...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+
+    samples = [
+        b"",
+        b"a",
+        bytes(4096),
+        bytes(range(256)) * 8,
+        b"Repetition helps compression. " * 200,
+    ]
+    for sample in samples:
+        compressed = phicomp.compress(sample)
+        assert compressed[:4] == b"PHIC"
+        assert phicomp.decompress(compressed) == sample
+
+    # A tiny memory budget still round-trips (tables clamp to the minimum size)
+    text = b"Mathematical coherence is key. " * 100
+    assert phicomp.decompress(phicomp.compress(text, memory_budget=1)) == text
+    assert len(phicomp.compress(text)) < len(text) // 4
+
+    # Version 2 (256-symbol arithmetic coding) streams still decode
+    from phiresearch_compression import core_bindings
+    legacy = core_bindings.compress_main(text, core_bindings.DEFAULT_MEMORY_BUDGET, core_bindings.METHOD_ARITHMETIC)
+    assert legacy[4] == 2 and phicomp.compress(text)[4] == 3
+    assert phicomp.decompress(legacy) == text
+
+    # The empty version 1 stream written by the original coder decodes; other
+    # version 1 streams used the retired context trees and are rejected
+    empty_v1 = b"PHIC\x01\x01" + bytes(8) + b"\x00"
+    assert phicomp.decompress(empty_v1) == b""
+    assert phicomp.decompressed_size(empty_v1) == 0
+    try:
+        phicomp.decompress(b"PHIC\x01\x01\x05" + bytes(7) + b"\x00")
+        assert False, "Should reject a non-empty version 1 stream"
+    except RuntimeError:
+        pass
+
+    # Inputs larger than one block use the block-parallel container
+    blocked = phicomp.compress(text, block_size=1000, threads=2)
+    assert blocked[4] == 4
+    assert phicomp.decompress(blocked) == text
+    assert phicomp.decompress(blocked, threads=1) == text
+
+    try:
+        phicomp.decompress(blocked[:-1])
+        assert False, "Should reject a truncated block-parallel stream"
+    except RuntimeError:
+        pass
+
+    # Any contiguous buffer is accepted, and output can go to a caller buffer
+    compressed = phicomp.compress(text)
+    assert phicomp.compress(memoryview(text)) == compressed
+    assert phicomp.decompress(bytearray(compressed)) == text
+    out = bytearray(phicomp.decompressed_size(compressed))
+    assert phicomp.decompress_into(compressed, out) == len(text)
+    assert bytes(out) == text
+
+    try:
+        phicomp.compress("not bytes")
+        assert False, "Should raise TypeError for str input"
+    except TypeError:
+        pass
+
+    try:
+        phicomp.decompress(b"NOPE" + bytes(20))
+        assert False, "Should reject data without the PHIC magic number"
+    except RuntimeError:
+        pass
+
+    print("✓ compression round trip tests passed")
+
+def test_streaming_compression():
+    """Test incremental Compressor/Decompressor objects."""
+    print("Testing streaming compression...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+
+    messages = [b'{"price": %d, "amount": 0.5}' % i for i in range(300)]
+    compressor = phicomp.Compressor(memory_budget=1 << 20, frame_size=1024)
+    stream = b"".join(compressor.compress(message) for message in messages)
+    stream += compressor.flush(phicomp.FLUSH_SYNC)
+    stream += compressor.compress(b"tail") + compressor.flush()
+    original = b"".join(messages) + b"tail"
+    assert phicomp.decompress(stream) == original
+
+    # Feed the stream in small pieces with a bounded output size
+    decompressor = phicomp.Decompressor()
+    result = b""
+    for i in range(0, len(stream), 100):
+        result += decompressor.decompress(stream[i:i + 100], max_length=64)
+        while not decompressor.needs_input and not decompressor.eof:
+            result += decompressor.decompress(b"", max_length=64)
+    assert decompressor.eof and result == original
+
+    trailing = phicomp.Decompressor()
+    assert trailing.decompress(stream + b"extra") == original
+    assert trailing.unused_data == b"extra"
+
+    try:
+        compressor.compress(b"more")
+        assert False, "Should reject input after the stream is finished"
+    except ValueError:
+        pass
+
+    try:
+        phicomp.decompressed_size(stream)
+        assert False, "Framed streams have no recorded size"
+    except ValueError:
+        pass
+
+    print("✓ streaming compression tests passed")
+
+def test_stream_frame_limits():
+    """Test that forged frame lengths are rejected instead of decoded."""
+    print("Testing stream frame limits...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import struct
+    import time
+
+    original = b'{"price": 1, "amount": 0.5}' * 100
+    compressor = phicomp.Compressor(frame_size=1024)
+    stream = compressor.compress(original) + compressor.flush()
+    # The header records the frame size after the 15-byte prefix.
+    assert stream[5] & 0x10 and struct.unpack_from("<I", stream, 15) == (1024,)
+    header, body = stream[:19], stream[19:]
+
+    # Streams written before the frame size was recorded still decode.
+    legacy_header = header[:5] + bytes([header[5] & ~0x10]) + header[6:15]
+    assert phicomp.decompress(legacy_header + body) == original
+
+    end = struct.pack("<II", 0, 0)
+    inflated = struct.pack("<II", 167772660, 2) + b"\x00\x01" + end
+    cases = [
+        ("frame larger than the recorded size", header + inflated),
+        ("inflated frame in a legacy stream", legacy_header + inflated),
+        # A frame header that promises more data than its coded bytes hold.
+        ("truncated frame", header + struct.pack("<II", 1024, 12) + body[8:20] + end),
+    ]
+    for name, forged in cases:
+        for decode in (phicomp.decompress,
+                       lambda data: phicomp.Decompressor().decompress(data, max_length=10),
+                       lambda data: phicomp.decompress_many([data])):
+            start = time.perf_counter()
+            try:
+                decode(forged)
+                assert False, f"Should reject a {name}"
+            except (ValueError, RuntimeError):
+                pass
+            assert time.perf_counter() - start < 2, name
+
+    print("✓ stream frame limit tests passed")
+
+def test_compression_levels():
+    """Test level presets and the context orders recorded in the header."""
+    print("Testing compression levels...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    from phiresearch_compression import compressor, core_bindings
+
+    data = b"".join(b"level %d: the quick brown fox jumps over the lazy dog\n" % i for i in range(300))
+    default = phicomp.compress(data)
+    assert phicomp.compress(data, level=compressor.DEFAULT_LEVEL) == default
+    seen = set()
+    for level in range(compressor.MIN_LEVEL, compressor.MAX_LEVEL + 1):
+        for compressed in (phicomp.compress(data, level=level),
+                           phicomp.compress(data, level=level, block_size=4000)):
+            assert phicomp.decompress(compressed) == data
+        seen.add(tuple(core_bindings.context_orders(compressed)))
+        stream = phicomp.Compressor(level=level)
+        assert phicomp.decompress(stream.compress(data) + stream.flush()) == data
+    assert len(seen) == compressor.MAX_LEVEL - compressor.MIN_LEVEL + 1
+    assert core_bindings.context_orders(default) == [2, 3, 5, 8, 13]
+
+    output, offsets = phicomp.compress_many([data, b"x"], level=1)
+    assert phicomp.decompress_many(output, offsets)[0] == data + b"x"
+    dictionary = phicomp.train_dictionary([data[:500]], level=1)
+    assert phicomp.decompress(phicomp.compress(data, dictionary=dictionary), dictionary=dictionary) == data
+
+    for bad in (0, compressor.MAX_LEVEL + 1):
+        try:
+            phicomp.compress(data, level=bad)
+            assert False, "Should reject out-of-range level"
+        except ValueError:
+            pass
+
+    for name in ("level", "block_size", "threads", "memory_budget"):
+        try:
+            phicomp.compress(data, **{name: True})
+            assert False, f"Should reject a bool {name}"
+        except TypeError:
+            pass
+
+    print("✓ compression level tests passed")
+
+def test_dictionary_compression():
+    """Test trained dictionaries for small messages."""
+    print("Testing dictionary compression...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+
+    samples = [b'{"event": "trade", "price": %d.%02d, "amount": 0.%d}' % (30000 + i, i % 100, i * 7)
+               for i in range(400)]
+    message = b'{"event": "trade", "price": 31234.56, "amount": 0.125}'
+    dictionary = phicomp.train_dictionary(samples, memory_budget=1 << 16)
+    assert dictionary.id != 0
+
+    # Serialised dictionaries load back with the same id
+    loaded = phicomp.Dictionary(dictionary.as_bytes())
+    assert loaded.id == dictionary.id
+
+    compressed = phicomp.compress(message, dictionary=dictionary)
+    assert len(compressed) < len(phicomp.compress(message))
+    assert phicomp.dictionary_id(compressed) == dictionary.id
+    assert phicomp.dictionary_id(phicomp.compress(message)) == 0
+    assert phicomp.decompress(compressed, dictionary=loaded) == message
+    assert phicomp.decompress(phicomp.compress(b"", dictionary=dictionary), dictionary=dictionary) == b""
+
+    data = b"".join(samples)
+    blocked = phicomp.compress(data, block_size=2000, dictionary=dictionary)
+    assert phicomp.decompress(blocked, dictionary=dictionary) == data
+
+    compressor = phicomp.Compressor(frame_size=256, dictionary=dictionary)
+    stream = compressor.compress(data) + compressor.flush()
+    assert phicomp.Decompressor(dictionary=loaded).decompress(stream) == data
+
+    other = phicomp.train_dictionary([b"unrelated sample text"] * 10)
+    for wrong in (None, other):
+        try:
+            phicomp.decompress(compressed, dictionary=wrong)
+            assert False, "Should require the matching dictionary"
+        except ValueError:
+            pass
+    try:
+        phicomp.Decompressor().decompress(stream)
+        assert False, "Should require the matching dictionary"
+    except ValueError:
+        pass
+
+    corrupt = bytearray(dictionary.as_bytes())
+    corrupt[-1] ^= 1
+    try:
+        phicomp.Dictionary(bytes(corrupt))
+        assert False, "Should reject a corrupt dictionary"
+    except ValueError:
+        pass
+
+    print("✓ dictionary compression tests passed")
+
+def test_batch_compression():
+    """Test compress_many/decompress_many."""
+    print("Testing batch compression...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+
+    records = [b"", b"x", b"record %d " % 7 * 40] + [b'{"id": %d}' % i for i in range(50)]
+    output, offsets = phicomp.compress_many(records, threads=2)
+    assert len(offsets) == len(records) + 1 and offsets[-1] == len(output)
+    # Each record is an ordinary stream, identical to a single compress call
+    for i, record in enumerate(records):
+        assert output[offsets[i]:offsets[i + 1]] == phicomp.compress(record)
+
+    restored, restored_offsets = phicomp.decompress_many(output, offsets)
+    assert restored == b"".join(records)
+    assert [restored[restored_offsets[i]:restored_offsets[i + 1]] for i in range(len(records))] == records
+
+    # A list of streams, including framed ones, works as well
+    compressor = phicomp.Compressor()
+    framed = compressor.compress(b"framed") + compressor.flush()
+    restored, _ = phicomp.decompress_many([phicomp.compress(b"one"), framed, bytearray(phicomp.compress(b"two"))])
+    assert restored == b"oneframedtwo"
+
+    joined = b"".join(records)
+    starts = [0]
+    for record in records:
+        starts.append(starts[-1] + len(record))
+    assert phicomp.compress_many(joined, starts) == (output, offsets)
+    assert phicomp.compress_many([]) == (b"", [0])
+
+    for bad in ((b"abc", None), (joined, [0, len(joined) + 1]), (joined, [0, 5, 3])):
+        try:
+            phicomp.compress_many(*bad)
+            assert False, "Should reject malformed batch input"
+        except (TypeError, ValueError):
+            pass
+    # Out-of-range offsets fail with a clear error before reaching the core
+    for bad in ([0, -1, len(joined)], [-3, len(joined)], [0, 2 ** 70]):
+        for batch in (phicomp.compress_many, phicomp.decompress_many):
+            try:
+                batch(joined, bad)
+                assert False, "Should reject an out-of-range offset"
+            except ValueError as e:
+                assert "Offsets" in str(e)
+    try:
+        phicomp.decompress_many(output, [0, 1.5, len(output)])
+        assert False, "Should reject a non-integer offset"
+    except TypeError:
+        pass
+    try:
+        phicomp.decompress_many([phicomp.compress(b"ok"), b"garbage"])
+        assert False, "Should reject corrupt data"
+    except RuntimeError:
+        pass
+
+    print("✓ batch compression tests passed")
+
+def test_file_compression():
+    """Test the file object, file helpers and command line interface."""
+    print("Testing file compression...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import io
+    import os
+    import tempfile
+    from phiresearch_compression.__main__ import main as cli_main
+
+    original = b"".join(b"line %d of the archive\n" % i for i in range(5000))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.phic")
+        with phicomp.open(path, "wb", frame_size=4096) as f:
+            f.write(original[:1000])
+            f.write(memoryview(original)[1000:])
+        with phicomp.open(path, "rb") as f:
+            assert f.read(10) == original[:10]
+            assert f.readline() == original[10:original.index(b"\n") + 1]
+            assert f.read() == original[original.index(b"\n") + 1:]
+
+        # Appending adds a second stream that is read back to back
+        with phicomp.open(path, "ab") as f:
+            f.write(b"appended")
+        with phicomp.open(path, "rb") as f:
+            assert f.read() == original + b"appended"
+
+        with phicomp.open(path, "wt", encoding="utf-8") as f:
+            f.write("h\u00e9llo\n")
+        with phicomp.open(path, "rt", encoding="utf-8") as f:
+            assert f.read() == "h\u00e9llo\n"
+
+        src = os.path.join(tmp, "input.bin")
+        with open(src, "wb") as f:
+            f.write(original)
+        packed = phicomp.compress_file(src)
+        assert packed == src + ".phic"
+        restored = phicomp.decompress_file(packed, os.path.join(tmp, "restored.bin"))
+        with open(restored, "rb") as f:
+            assert f.read() == original
+
+        # One-shot streams are decoded into a memory-mapped output file
+        with open(packed, "wb") as f:
+            f.write(phicomp.compress(original, block_size=20000))
+        phicomp.decompress_file(packed, restored)
+        with open(restored, "rb") as f:
+            assert f.read() == original
+
+        empty = os.path.join(tmp, "empty")
+        open(empty, "wb").close()
+        phicomp.decompress_file(phicomp.compress_file(empty), empty + ".out")
+        assert os.path.getsize(empty + ".out") == 0
+
+        # CLI: compress and decompress in place, refusing to overwrite
+        os.remove(packed)
+        assert cli_main([src]) == 0
+        os.remove(src)
+        assert cli_main(["-d", packed]) == 0
+        with open(src, "rb") as f:
+            assert f.read() == original
+        assert cli_main(["-d", packed]) == 1
+
+        try:
+            phicomp.open(path, "rw")
+            assert False, "Should reject invalid mode"
+        except ValueError:
+            pass
+
+        with phicomp.open(io.BytesIO(b"PHIC not a stream"), "rb") as f:
+            try:
+                f.read()
+                assert False, "Should reject corrupt data"
+            except (ValueError, RuntimeError):
+                pass
+
+    print("✓ file compression tests passed")
+
+def test_random_access():
+    """Test range reads from block streams and seekable files."""
+    print("Testing random access...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import io
+    import os
+    import tempfile
+    from phiresearch_compression.__main__ import main as cli_main
+
+    original = b"".join(b"GET /item/%d HTTP/1.1 200\n" % i for i in range(3000)) + bytes(10000)
+    ranges = [(0, 10), (4000, 5000), (len(original) - 7, 7), (12345, 0), (len(original) - 5, 100),
+              (len(original) + 3, 10)]
+    for source in (original, original[:3000]):
+        compressed = phicomp.compress(source, block_size=4096)
+        for offset, length in ranges:
+            assert phicomp.read_range(compressed, offset, length) == source[offset:offset + length]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "access.log")
+        with open(src, "wb") as f:
+            f.write(original)
+        packed = phicomp.compress_file(src, seekable=True, block_size=8192)
+        for offset, length in ranges:
+            assert phicomp.read_file_range(packed, offset, length) == original[offset:offset + length]
+        with open(packed, "rb") as f:
+            seekable = f.read()
+        assert phicomp.decompressed_size(seekable) == len(original)
+        assert phicomp.decompress(seekable) == original
+        phicomp.decompress_file(packed, src + ".out")
+        with open(src + ".out", "rb") as f:
+            assert f.read() == original
+
+        os.remove(packed)
+        assert cli_main(["--seekable", "--block-size", "4096", src]) == 0
+        assert phicomp.read_file_range(packed, 100, 50) == original[100:150]
+
+        # -d -c and stdin decode seekable and one-shot files, not just framed ones
+        with open(packed, "rb") as f:
+            seekable_cli = f.read()
+        for compressed in (seekable_cli, phicomp.compress(original, block_size=4096)):
+            for argv, stdin in ((["-d", "-c", packed], None), (["-d"], compressed)):
+                with open(packed, "wb") as f:
+                    f.write(compressed)
+                saved = sys.stdin, sys.stdout
+                out = io.BytesIO()
+                sys.stdout = wrapper = io.TextIOWrapper(out)
+                if stdin is not None:
+                    sys.stdin = io.TextIOWrapper(io.BytesIO(stdin))
+                try:
+                    assert cli_main(argv) == 0
+                finally:
+                    sys.stdin, sys.stdout = saved
+                assert out.getvalue() == original, argv
+                wrapper.detach()
+
+        # Truncation loses the footer index
+        try:
+            phicomp.read_range(seekable[:-3], 0, 10)
+            assert False, "Should reject a stream without its index"
+        except (ValueError, RuntimeError):
+            pass
+
+    stream = phicomp.Compressor()
+    framed = stream.compress(original) + stream.flush()
+    for bad in ((framed, 0, 10), (phicomp.compress(original), -1, 10)):
+        try:
+            phicomp.read_range(*bad)
+            assert False, "Should reject framed streams and negative offsets"
+        except ValueError:
+            pass
+
+    print("✓ random access tests passed")
+
+def test_block_fast_paths():
+    """Test that incompressible and run-heavy blocks skip the model."""
+    print("Testing block fast paths...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import os
+
+    noise = os.urandom(1 << 16)
+    zeros = bytes(1 << 16)
+    mixed = b"".join(noise[i:i + 4096] + zeros[:8192] for i in range(0, len(noise), 4096))
+    text = b"".join(b"line %d of ordinary text\n" % i for i in range(2000))
+    for data in (noise, zeros, mixed, text, text + zeros):
+        for compressed in (phicomp.compress(data), phicomp.compress(data, block_size=10000)):
+            assert phicomp.decompress(compressed) == data
+        stream = phicomp.Compressor(frame_size=8192)
+        assert phicomp.decompress(stream.compress(data) + stream.flush()) == data
+
+    assert len(phicomp.compress(noise)) <= len(noise) + 32, "Random data should be stored raw"
+    assert len(phicomp.compress(zeros)) < 64, "A zero block should collapse to a run"
+    assert len(phicomp.compress(mixed)) <= len(noise) + 256
+    # Ordinary data keeps the plain format: no block type flag.
+    assert phicomp.compress(text)[5] & 0x20 == 0
+
+    print("✓ block fast path tests passed")
+
+def test_entropy_analytics():
+    """Test native order-0, order-k and streaming entropy."""
+    print("Testing entropy analytics...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import math
+    from phiresearch_compression.utils import FIBONACCI_ORDERS
+
+    data = b"".join(b"entropy sample %d, phi %d\n" % (i, i % 7) for i in range(500))
+    counts = [data.count(bytes([b])) for b in set(data)]
+    expected = -sum(c / len(data) * math.log2(c / len(data)) for c in counts)
+    assert abs(phicomp.calculate_shannon_entropy(data) - expected) < 1e-9
+    assert phicomp.calculate_shannon_entropy(b"") == 0.0
+    assert phicomp.calculate_shannon_entropy(bytearray(b"aaaa")) == 0.0
+
+    # A period-3 sequence is fully predicted by one byte of context.
+    assert abs(phicomp.calculate_context_entropy(b"abc" * 1000, 0) - math.log2(3)) < 1e-9
+    assert phicomp.calculate_context_entropy(b"abc" * 1000, 1) == 0.0
+
+    # Chunked updates see the same contexts as a single call.
+    whole = phicomp.EntropyEstimator(FIBONACCI_ORDERS)
+    whole.update(data)
+    chunked = phicomp.EntropyEstimator(FIBONACCI_ORDERS)
+    for i in range(0, len(data), 777):
+        chunked.update(memoryview(data)[i:i + 777])
+    assert chunked.size == len(data)
+    assert chunked.entropies() == whole.entropies()
+    entropies = whole.entropies()
+    assert entropies[13] < entropies[3] < entropies[0]
+
+    # Concurrent updates are serialised; identical chunks make the result order-independent.
+    import threading
+    chunk = data[:4096]
+    shared = phicomp.EntropyEstimator(FIBONACCI_ORDERS)
+    serial = phicomp.EntropyEstimator(FIBONACCI_ORDERS)
+    for _ in range(4 * 25):
+        serial.update(chunk)
+
+    def feed():
+        for _ in range(25):
+            shared.update(chunk)
+            shared.entropies()
+
+    workers = [threading.Thread(target=feed) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert shared.size == serial.size
+    assert shared.entropies() == serial.entropies()
+
+    compressed = phicomp.compress(data)
+    assert whole.efficiency(len(compressed)) == phicomp.verify_efficiency(data, compressed)
+    assert phicomp.verify_efficiency(data, compressed, order=3)[1] < phicomp.verify_efficiency(data, compressed)[1]
+
+    for bad in ((), (2, 2), (-1,)):
+        try:
+            phicomp.EntropyEstimator(bad)
+            assert False, "Should reject invalid orders"
+        except ValueError:
+            pass
+    try:
+        whole.entropy(4)
+        assert False, "Should reject an order that was not counted"
+    except ValueError:
+        pass
+
+    print("✓ entropy analytics tests passed")
+
+def _determinism_corpus():
+    """Fixed input built without the random module: LCG noise followed by log-like text."""
+    state = 12345
+    noise = bytearray()
+    for _ in range(4096):
+        state = (state * 1103515245 + 12345) & 0x7FFFFFFF
+        noise.append((state >> 16) & 0x3F)
+    text = b"".join(b"record %05d: phi=1.6180339887 status=%s\n" % (i, b"ok" if i % 3 else b"retry")
+                    for i in range(400))
+    return bytes(noise) + text
+
+# SHA-256 of the compressed corpus. Coding is integer-only, so these must
+# match on every platform and compiler; a change means the format changed.
+GOLDEN_DIGESTS = {
+    "level 1": "9939091efe9a85e333df95d43cbb1e498a6db0a20ad3ad58a68bc4bc311ccc53",
+    "level 2": "d9e69f1a5cb9b3727954877e0502fcb8cc5387fe8d4fab6a259c432119d3f702",
+    "level 3": "bb73f32478469dc03e6364d38012f2208c16fdb300897772b35048db3315ec28",
+    "level 4": "9592e1adc2ba5d16f4732a23dfcff331977e8b7aa3f17d0f831a92a402029ed5",
+    "level 5": "b14e3c419ced9925f0edee5c6d14228281394189a55d8c7d81a85de785ec642e",
+    "blocks": "36e113d288b4bc82918674307704647d8def3a09c9cff4650be54bce6bb34b29",
+    "fixed point": "44fa1eca2e7bcf3da81a50d8570a098dbcb1543a7d8180b86feb6d3380bf2bfc",
+    "stream": "86ead4c7c6706becd04ef8a2f7b9b955e09da053aa2eefcd620c465fa2ebc1bd",
+    "dictionary": "8fd2d753cb9e1fea5391107aa3efcadbe9c19d64d345e799e9270eed8a4aae0a",
+}
+
+def test_deterministic_output():
+    """Test that compressed output is bit-exact against golden digests."""
+    print("Testing deterministic output...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import hashlib
+    from phiresearch_compression import core_bindings
+
+    data = _determinism_corpus()
+    outputs = {f"level {level}": phicomp.compress(data, level=level) for level in range(1, 6)}
+    outputs["blocks"] = phicomp.compress(data, block_size=5000)
+    outputs["fixed point"] = phicomp.compress(data, method=phicomp.METHOD_FIXED_POINT)
+    stream = phicomp.Compressor(frame_size=4096)
+    outputs["stream"] = stream.compress(data) + stream.flush()
+    dictionary = phicomp.train_dictionary([data[i:i + 200] for i in range(0, len(data), 997)])
+    outputs["dictionary"] = phicomp.compress(data[-300:], dictionary=dictionary)
+
+    # Block-parallel fixed-point output decodes the same as a single block.
+    blocked = phicomp.compress(data, block_size=5000, method=phicomp.METHOD_FIXED_POINT)
+    assert phicomp.decompress(blocked) == data
+
+    try:
+        phicomp.compress(data, method=phicomp.METHOD_FIXED_POINT, dictionary=dictionary)
+        assert False, "Should reject a dictionary with the fixed-point method"
+    except ValueError:
+        pass
+
+    for name, compressed in outputs.items():
+        if name == "dictionary":
+            assert phicomp.decompress(compressed, dictionary=dictionary) == data[-300:]
+        else:
+            assert phicomp.decompress(compressed) == data, name
+        digest = hashlib.sha256(compressed).hexdigest()
+        assert digest == GOLDEN_DIGESTS[name], f"{name}: output changed ({digest})"
+
+    print("✓ deterministic output tests passed")
+
+def test_codec_benchmark_smoke():
+    """Test that the codec benchmark runs with its default thread setting."""
+    print("Testing codec benchmark smoke run...")
+    phicomp = _load_phicomp()
+    if phicomp is None:
+        return
+    import contextlib
+    import importlib.util
+    import io
+    import os
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "run_codec_benchmark.py")
+    spec = importlib.util.spec_from_file_location("run_codec_benchmark", path)
+    benchmark = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        assert benchmark.main(["--sizes", "100", "--repeat", "1", "--warmup", "0", "--no-isolate"]) == 0
+
+    print("✓ codec benchmark smoke tests passed")
+
 def test_import_structure():
     """Test that import structure is fixed."""
     print("Testing import structure...")
@@ -165,8 +1358,29 @@ def main():
     
     tests = [
         test_phi_balancer,
+        test_batch_routing,
+        test_hash_functions,
+        test_weighted_routing,
+        test_bounded_load_routing,
+        test_resharding,
         test_phi_cache,
+        test_cache_eviction_parity,
+        test_concurrent_cache,
+        test_cache_limits_and_ttl,
+        test_compressed_cache,
         test_modlo_sequence,
+        test_compression_roundtrip,
+        test_streaming_compression,
+        test_stream_frame_limits,
+        test_compression_levels,
+        test_dictionary_compression,
+        test_batch_compression,
+        test_file_compression,
+        test_random_access,
+        test_block_fast_paths,
+        test_entropy_analytics,
+        test_deterministic_output,
+        test_codec_benchmark_smoke,
         test_import_structure,
     ]
     